@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import security
+from backend.services import hashing
+from backend.services.merkle_service import MerkleTree, create_applicant_leaf
+
+# Micro-benchmarks for the Merkle and hashing hot paths, with regression tracking.
+#
+# Record a baseline on the base branch, then compare the change against it on the
+# same machine; the comparison exits non-zero past the threshold:
+#
+#     python backend/benchmark.py --save baseline.json
+#     python backend/benchmark.py --compare baseline.json --threshold 0.10
+#
+# Changes to merkle_service or hashing should quote the comparison output.
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Proofs generated per run; the index lookup dominates past this.
+PROOF_SAMPLE = 10_000
+
+
+def _leaves(n: int) -> list:
+    data = os.urandom(n * hashing.NODE_SIZE)
+    return [data[i:i + hashing.NODE_SIZE] for i in range(0, len(data), hashing.NODE_SIZE)]
+
+
+def _applicant_fields(n: int) -> list:
+    return [(os.urandom(32).hex(), os.urandom(32).hex(), 1_700_000_000 + i, i % 58 + 1) for i in range(n)]
+
+
+def _identifiers(n: int) -> list:
+    return [f"{100000000000000000 + i}" for i in range(n)]
+
+
+def _tree_hashes(n: int) -> int:
+    """Keccak calls needed to build a tree over `n` leaves."""
+    hashes = 0
+    while n > 1:
+        n = (n + 1) // 2
+        hashes += n
+    return hashes
+
+
+# Each case: (name, setup(n) -> state, run(state), operations(n), unit).
+CASES = [
+    (
+        "merkle_build",
+        _leaves,
+        MerkleTree,
+        _tree_hashes,
+        "hashes",
+    ),
+    (
+        "get_proof",
+        lambda n: (MerkleTree(_leaves(n)), random.Random(n).sample(range(n), min(n, PROOF_SAMPLE))),
+        lambda state: [state[0].get_proof(state[0].node(0, i)) for i in state[1]],
+        lambda n: min(n, PROOF_SAMPLE),
+        "proofs",
+    ),
+    (
+        "create_applicant_leaf",
+        _applicant_fields,
+        lambda rows: [create_applicant_leaf(*row) for row in rows],
+        lambda n: n,
+        "hashes",
+    ),
+    (
+        "hash_identifier",
+        _identifiers,
+        lambda identifiers: [security.hash_identifier(identifier) for identifier in identifiers],
+        lambda n: n,
+        "hashes",
+    ),
+]
+
+
+def _measure(setup, run, n: int, repeat: int) -> dict:
+    # Timed without tracemalloc, which slows allocation-heavy code down several times.
+    seconds = float("inf")
+    for _ in range(repeat):
+        state = setup(n)
+        start = time.perf_counter()
+        run(state)
+        seconds = min(seconds, time.perf_counter() - start)
+        del state
+
+    state = setup(n)
+    tracemalloc.start()
+    try:
+        run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat: int = 3, cases=None) -> dict:
+    """
+    Runs every case at every size.
+
+    Returns:
+        A baseline document: the environment it was measured in and one result per
+        `(case, size)` with wall time (best of `repeat`), peak traced memory and rate.
+    """
+    results = []
+    for name, setup, run, operations, unit in CASES:
+        if cases and name not in cases:
+            continue
+        for n in sizes:
+            measured = _measure(setup, run, n, repeat)
+            ops = operations(n)
+            result = {
+                "case": name,
+                "size": n,
+                "operations": ops,
+                "unit": unit,
+                "seconds": measured["seconds"],
+                "peak_bytes": measured["peak_bytes"],
+                "per_second": ops / measured["seconds"] if measured["seconds"] else 0.0,
+            }
+            results.append(result)
+            print(
+                f"  {name:<22} {n:>9,}  {result['seconds'] * 1000:>10.1f} ms"
+                f"  {result['peak_bytes'] / 2**20:>8.1f} MiB  {result['per_second']:>12,.0f} {unit}/s"
+            )
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "keccak_backend": hashing.BACKEND,
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, memory_threshold: float) -> list:
+    """
+    Regressions of `current` against `baseline`: every `(case, size)` measured in
+    both whose time or peak memory grew by more than the threshold (a fraction).
+    """
+    previous = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["case"], result["size"]))
+        if before is None:
+            continue
+        label = f"{result['case']} @ {result['size']:,}"
+        time_change = result["seconds"] / before["seconds"] - 1 if before["seconds"] else 0.0
+        memory_change = result["peak_bytes"] / before["peak_bytes"] - 1 if before["peak_bytes"] else 0.0
+        print(f"  {label:<34} time {time_change:>+7.1%}   memory {memory_change:>+7.1%}")
+        if time_change > threshold:
+            regressions.append(f"{label}: {time_change:+.1%} wall time")
+        if memory_change > memory_threshold:
+            regressions.append(f"{label}: {memory_change:+.1%} peak memory")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merkle and hashing micro-benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Leaf counts to measure.")
+    parser.add_argument("--cases", nargs="+", choices=[case[0] for case in CASES], help="Only run these cases.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per measurement (the best is kept).")
+    parser.add_argument("--save", metavar="PATH", help="Write the results as a JSON baseline.")
+    parser.add_argument("--compare", metavar="PATH", help="Fail on regressions against this JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed wall-time regression (0.10 = 10%%).")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="Allowed peak-memory regression.")
+    args = parser.parse_args()
+
+    print(f"Keccak backend: {hashing.BACKEND}")
+    current = run_benchmarks(args.sizes, args.repeat, args.cases)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["environment"] != current["environment"]:
+            print(f"Warning: baseline was measured on {baseline['environment']}, not {current['environment']}.")
+        print(f"Compared with {args.compare}:")
+        regressions = compare(baseline, current, args.threshold, args.memory_threshold)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The framework every API worker needs anyway: its import time is measured on its
+# own and subtracted, so the budget covers only what the project adds (its own
+# modules and any dependency it pulls in eagerly, such as web3).
+BASELINE_MODULES = "fastapi, pydantic, sqlalchemy, sqlalchemy.ext.asyncio, sqlalchemy.orm"
+# About 0.25s on a developer laptop; the margin absorbs slower CI runners. An
+# eager `import web3` alone adds well over 0.5s, so regressions still fail.
+DEFAULT_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET", "0.5"))
+
+def measure(module: str) -> list:
+    """
+    Imports `module` (or a comma-separated list) in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        `(cumulative_seconds, name)` for every top-level import, slowest first.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; only top-level ones add up to the total.
+        if not name.startswith("  "):
+            timings.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(timings, reverse=True)
+
+def best_total(module: str, runs: int) -> tuple:
+    """`(seconds, timings)` of the fastest of `runs` imports of `module`."""
+    best = None
+    for _ in range(runs):
+        timings = measure(module)
+        total = sum(seconds for seconds, _ in timings)
+        if best is None or total < best[0]:
+            best = (total, timings)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the API's cold import time against a budget.")
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--baseline", default=BASELINE_MODULES, help="Modules whose import time is not counted.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Seconds allowed on top of the baseline.")
+    parser.add_argument("--runs", type=int, default=3, help="Best of this many runs is compared to the budget.")
+    args = parser.parse_args()
+
+    total, timings = best_total(args.module, args.runs)
+    baseline = best_total(args.baseline, args.runs)[0] if args.baseline else 0.0
+    added = total - baseline
+    print(f"import {args.module}: {total:.3f}s, {added:.3f}s over the baseline {baseline:.3f}s (budget {args.budget:.3f}s)")
+    for seconds, name in timings[:10]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+    if added > args.budget:
+        print("Import time budget exceeded.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
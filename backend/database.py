@@ -1,37 +1,215 @@
+import io
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Try to get database URL from environment variable, fall back to SQLite if not set
+# Database URL; without one, a local SQLite file is used (development only).
 SQLALCHEMY_DATABASE_URL = os.getenv(
     "DATABASE_URL",
-    "sqlite:///./aadl_on.db"  # SQLite fallback
+    "sqlite:///./aadl_on.db"
 )
+# Optional read replica of a PostgreSQL primary, for the status reads.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "")
 
-# Create engine with appropriate connection settings
-try:
-    if SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
-        engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    else:
-        # SQLite engine with connection pooling and foreign key support
-        engine = create_engine(
-            SQLALCHEMY_DATABASE_URL,
-            connect_args={"check_same_thread": False}  # Needed for SQLite
+
+# --- Engine profiles ---
+# Named pool/timeout settings, picked with DB_PROFILE and overridable one by one
+# (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+# DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS). Sizes are per process: a pool of
+# 10 + 10 overflow across 8 API workers can open 160 connections.
+#
+# - development: small pool, no statement timeout.
+# - production: API workers; connections are pinged before use and recycled
+#   before server-side idle timeouts, statements are cut off after 15 s.
+# - worker: the indexer and batch builders; few connections, no statement
+#   timeout, since bulk writes of large batches legitimately run long.
+ENGINE_PROFILES = {
+    "development": {
+        "pool_size": 5, "max_overflow": 5, "pool_timeout": 30, "pool_recycle": -1,
+        "pool_pre_ping": False, "statement_timeout_ms": 0,
+    },
+    "production": {
+        "pool_size": 10, "max_overflow": 10, "pool_timeout": 10, "pool_recycle": 1800,
+        "pool_pre_ping": True, "statement_timeout_ms": 15000,
+    },
+    "worker": {
+        "pool_size": 4, "max_overflow": 2, "pool_timeout": 60, "pool_recycle": 1800,
+        "pool_pre_ping": True, "statement_timeout_ms": 0,
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "development")
+
+# SQLite pragmas set on every connection. WAL lets readers run while a writer
+# commits, instead of every request serializing on the database file; NORMAL
+# sync is durable in WAL mode except for the last commits on power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # Negative values are KiB: 64 MiB of page cache per connection.
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),
+    "temp_store": "MEMORY",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+
+def engine_profile(name: str = DB_PROFILE) -> dict:
+    """The named profile with any DB_* environment overrides applied."""
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {name!r}; expected one of {', '.join(ENGINE_PROFILES)}")
+    profile = dict(ENGINE_PROFILES[name])
+    for key, value in profile.items():
+        override = os.getenv(f"DB_{key.upper()}")
+        if override is not None:
+            profile[key] = override.lower() in ("1", "true", "yes") if isinstance(value, bool) else int(override)
+    return profile
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def engine_options(url: str, profile: dict, is_async: bool = False) -> dict:
+    """`create_engine` / `create_async_engine` keyword arguments for `url` under `profile`."""
+    scheme = url.split("://", 1)[0]
+    options = {"pool_pre_ping": profile["pool_pre_ping"]}
+    in_memory = scheme.startswith("sqlite") and (url.endswith(":memory:") or url.endswith("://") or "mode=memory" in url)
+    if not in_memory:
+        options.update(
+            pool_size=profile["pool_size"],
+            max_overflow=profile["max_overflow"],
+            pool_timeout=profile["pool_timeout"],
+            pool_recycle=profile["pool_recycle"],
         )
-except Exception as e:
-    print(f"Failed to connect to {SQLALCHEMY_DATABASE_URL.split('://')[0]}, falling back to SQLite")
-    SQLALCHEMY_DATABASE_URL = "sqlite:///./aadl_on.db"
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
 
+    timeout = profile["statement_timeout_ms"]
+    if scheme.startswith("sqlite"):
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}  # Sessions move between threadpool threads.
+    elif timeout and "asyncpg" in scheme:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+    elif timeout and scheme.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def make_engine(url: str, profile: dict = None):
+    """A synchronous engine for `url` under `profile` (default: DB_PROFILE)."""
+    profile = profile or engine_profile()
+    created = create_engine(url, **engine_options(url, profile))
+    if created.dialect.name == "sqlite":
+        event.listen(created, "connect", _set_sqlite_pragmas)
+    return created
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Status reads go to the replica when there is one. It may lag the primary by a
+# moment; the status cache TTL already allows that much staleness.
+read_engine = make_engine(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 
+# --- Async engines (read-heavy endpoints) ---
+# asyncpg for PostgreSQL, aiosqlite for the SQLite database. Built on first use so
+# the drivers are only needed by processes that serve async endpoints.
 
+def _async_database_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(SQLALCHEMY_DATABASE_URL))
+ASYNC_REPLICA_DATABASE_URL = os.getenv(
+    "ASYNC_REPLICA_DATABASE_URL", _async_database_url(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else ""
+)
+
+_async_engines = {}
+_async_sessionmakers = {}
+
+def get_async_sessionmaker(read_only: bool = False):
+    """
+    Sessions on the async engine; with `read_only`, on the replica when one is
+    configured. Read-only sessions must not write.
+    """
+    url = ASYNC_REPLICA_DATABASE_URL if read_only and ASYNC_REPLICA_DATABASE_URL else ASYNC_DATABASE_URL
+    if url not in _async_sessionmakers:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+        async_engine = create_async_engine(url, **engine_options(url, engine_profile(), is_async=True))
+        if async_engine.dialect.name == "sqlite":
+            event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        _async_engines[url] = async_engine
+        _async_sessionmakers[url] = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return _async_sessionmakers[url]
+
+def has_read_replica() -> bool:
+    return bool(REPLICA_DATABASE_URL)
+
+async def dispose_async_engine():
+    for async_engine in _async_engines.values():
+        await async_engine.dispose()
+    _async_engines.clear()
+    _async_sessionmakers.clear()
+
+
+# Rows per multi-row INSERT when COPY is not available.
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "5000"))
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def bulk_insert(db, model, rows, chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> int:
+    """
+    Inserts a list of column dicts into `model`'s table inside the session's
+    transaction, bypassing the ORM unit of work.
+
+    PostgreSQL (psycopg2) gets a single COPY; other databases get executemany
+    INSERTs of `chunk_size` rows.
+
+    Returns:
+        The number of rows inserted.
+    """
+    if not rows:
+        return 0
+
+    table = model.__table__
+    connection = db.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        columns = list(rows[0].keys())
+        quote = connection.dialect.identifier_preparer.quote
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row[column]) for column in columns))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f'COPY {quote(table.name)} ({", ".join(quote(column) for column in columns)}) FROM STDIN',
+                buffer
+            )
+        finally:
+            cursor.close()
+    else:
+        for start in range(0, len(rows), chunk_size):
+            connection.execute(insert(table), rows[start:start + chunk_size])
+    return len(rows)
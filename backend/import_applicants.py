@@ -0,0 +1,35 @@
+import os
+import sys
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.database import SessionLocal
+from backend.services import import_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import applicants from an NDJSON or CSV export.")
+    parser.add_argument("path", help="Export file (.ndjson/.jsonl or .csv); '-' reads NDJSON from stdin.")
+    parser.add_argument("--format", choices=[import_service.NDJSON, import_service.CSV], help="Override the format guessed from the extension.")
+    parser.add_argument("--chunk-size", type=int, default=import_service.IMPORT_CHUNK_SIZE, help="Rows inserted per round trip.")
+    args = parser.parse_args()
+
+    fmt = args.format or import_service.detect_format(filename=args.path)
+    db = SessionLocal()
+    try:
+        if args.path == "-":
+            result = import_service.import_applicants(db, sys.stdin, fmt, args.chunk_size)
+        else:
+            with open(args.path, "r", encoding="utf-8", newline="") as f:
+                result = import_service.import_applicants(db, f, fmt, args.chunk_size)
+    finally:
+        db.close()
+
+    print(f"Inserted: {result['inserted']}, duplicates: {result['duplicates']}, rejected: {result['rejected']}")
+    for error in result["errors"]:
+        print(f"  line {error['line']}: {error['detail']}")
+
+if __name__ == "__main__":
+    main()
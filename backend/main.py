@@ -1,25 +1,93 @@
+import io
+import os
+import codecs
+import bisect
+import logging
+import time
+import hashlib
 import secrets
-from fastapi import FastAPI, Depends, HTTPException
+import tempfile
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .services import blockchain_service
+from .services import batch_jobs, batch_service, blockchain_service, import_service
 
 from typing import List 
-from .services import merkle_service
+from collections import defaultdict
+from .services import merkle_queue, metrics, proof_codec, proof_files, proof_store, tracing
+from .services.status_cache import status_cache
 
 # Import all the modules we've built
 from . import models, schemas, security
-from .database import SessionLocal, engine
+from .database import ReadSessionLocal, SessionLocal, dispose_async_engine, engine, get_async_sessionmaker, has_read_replica, read_engine
 
-# This line ensures that if the API starts before the DB is initialized,
-# it will create the necessary tables.
-models.Base.metadata.create_all(bind=engine)
+# Most leaves one multi-proof request may ask for.
+MULTIPROOF_MAX_LEAVES = int(os.getenv("MULTIPROOF_MAX_LEAVES", "512"))
+# Most national IDs one batch status request may ask for.
+BATCH_STATUS_MAX_IDS = int(os.getenv("BATCH_STATUS_MAX_IDS", "5000"))
+# Values per `IN (...)` of a batch status lookup, chunked like proof node lookups
+# so a statement stays under SQLite's historical 999-parameter limit.
+STATUS_LOOKUP_CHUNK_SIZE = proof_store.NODE_LOOKUP_CHUNK_SIZE
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work runs here rather than at import time, so importing the app stays
+    # cheap. The blockchain client is not created until a chain call needs it.
+
+    tracing.configure("aadl-api")
+
+    # This ensures that if the API starts before the DB is initialized,
+    # it will create the necessary tables.
+    await run_in_threadpool(models.Base.metadata.create_all, bind=engine)
+    # Jobs queued or in flight when the previous process stopped are picked up again.
+    await run_in_threadpool(batch_jobs.resume_pending_jobs)
+    yield
+    batch_jobs.shutdown()
+    blockchain_service.shutdown()
+    engine.dispose()
+    read_engine.dispose()
+    await dispose_async_engine()
+    tracing.shutdown()
 
 app = FastAPI(
     title="AADL_ON API",
     description="The official API for the AADL_ON housing application system.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+metrics.register_status_cache(status_cache)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Labelled by route template ("/v1/applicants/{national_id}/status"), never by
+    # the raw path, so identifiers stay out of the metrics.
+    queries = metrics.start_query_count()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route = route.path if route is not None else "unmatched"
+        metrics.HTTP_REQUEST_SECONDS.labels(request.method, route, str(status)).observe(time.perf_counter() - start)
+        metrics.HTTP_DB_QUERIES.labels(request.method, route).observe(queries[0])
+
+@app.middleware("http")
+async def request_profiling(request: Request, call_next):
+    # Endpoints wrapped in `tracing.traced_endpoint` are profiled when this allows it.
+    profile = tracing.begin_request(request.headers)
+    response = await call_next(request)
+    if profile["file"]:
+        response.headers["X-Profile-File"] = profile["file"]
+    return response
+
 # --- Dependency for Database Session ---
 # This function provides a database session to our API endpoints and ensures it's
 # always closed after the request is finished. This is a crucial pattern.
@@ -30,6 +98,21 @@ def get_db():
     finally:
         db.close()
 
+# Sessions for read-only endpoints, on the read replica when one is configured.
+# They must not write.
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async counterpart for the read-heavy endpoints, served by the read replica
+# when one is configured.
+async def get_async_read_db():
+    async with get_async_sessionmaker(read_only=True)() as db:
+        yield db
+
 # --- API Endpoints ---
 
 @app.post("/v1/applicants/", response_model=schemas.Applicant, status_code=201, tags=["Applicants"])
@@ -75,119 +158,619 @@ def create_applicant(applicant_data: schemas.ApplicantCreate, db: Session = Depe
 
     return db_applicant
 
+@app.post("/v1/applicants/bulk", response_model=schemas.BulkImportResult, tags=["Applicants"])
+async def bulk_import_applicants(request: Request, db: Session = Depends(get_db)):
+    """
+    Registers many applicants from one NDJSON or CSV upload (raw request body).
+
+    - **Format** comes from the `Content-Type` (`text/csv` or `application/x-ndjson`).
+    - **Hashes** identifiers and **dedupes** them within the upload and against the
+      database with one set-based query per chunk.
+    - **Inserts** valid rows in large multi-row chunks.
+    - **Reports** how many rows were inserted, duplicated or rejected.
+    """
+    fmt = import_service.detect_format(request.headers.get("content-type", ""))
+
+    # Spool the body (to disk past 16 MB) so the import runs off the event loop.
+    upload = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    try:
+        # Checked as it is spooled, so a bad upload is refused before any chunk
+        # of it is inserted.
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            async for chunk in request.stream():
+                decoder.decode(chunk)
+                upload.write(chunk)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"The upload is not valid UTF-8: {e}")
+        upload.seek(0)
+        text = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+        return await run_in_threadpool(import_service.import_applicants, db, text, fmt)
+    finally:
+        upload.close()
+
+@app.post("/v1/applicants/eligibility", response_model=schemas.EligibilityResult, tags=["Applicants"])
+def mark_applicants_eligible(selection: schemas.EligibilityRequest, db: Session = Depends(get_db)):
+    """
+    Moves verified applicants from PENDING to ELIGIBLE: those of a wilaya, of a
+    list of national IDs or applicant ids, or any combination of these.
+
+    - **Set-based**: one read and one `UPDATE` per chunk of applicants, not per row.
+    - **Queues** each applicant and **stores** its Merkle leaf, so batch building
+      and indexing never hash it again.
+    - Applicants in any other status are left alone.
+    """
+    if selection.wilaya_code is None and selection.national_ids is None and selection.applicant_ids is None:
+        raise HTTPException(status_code=400, detail="Give a wilaya_code, national_ids or applicant_ids.")
+    return mark_eligible(db, selection.wilaya_code, selection.national_ids, selection.applicant_ids)
+
+@app.post("/v1/applicants/eligibility/upload", response_model=schemas.EligibilityResult, tags=["Applicants"])
+async def upload_eligible_applicants(request: Request, wilaya_code: int = None, db: Session = Depends(get_db)):
+    """
+    Same as `POST /v1/applicants/eligibility` for the national IDs of an NDJSON or
+    CSV upload (raw request body, the bulk import format; only `national_id` is
+    read), optionally restricted to `wilaya_code`.
+    """
+    fmt = import_service.detect_format(request.headers.get("content-type", ""))
+    # Only IDs are kept, so the upload is read whole rather than spooled.
+    try:
+        text = io.StringIO((await request.body()).decode("utf-8"), newline="")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"The upload is not valid UTF-8: {e}")
+    national_ids = list(import_service.iter_national_ids(text, fmt))
+    return await run_in_threadpool(mark_eligible, db, wilaya_code, national_ids, None)
+
+def mark_eligible(db: Session, wilaya_code: int = None, national_ids: List[str] = None, applicant_ids: List[int] = None) -> dict:
+    try:
+        applicant_hashes = security.hash_identifiers(national_ids) if national_ids is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    changed = merkle_queue.mark_eligible_where(db, wilaya_code, applicant_ids, applicant_hashes)
+    db.commit()
+    status_cache.invalidate(changed)
+    return {"eligible": len(changed)}
+
 @app.get("/", tags=["Status"])
 def read_root():
     return {"status": "ok", "message": "Welcome to the AADL_ON API"}
 
-@app.post("/v1/batches/", status_code=202, tags=["Batches"])
-def trigger_batch_creation(db: Session = Depends(get_db)):
+@app.get("/ready", tags=["Status"])
+def readiness(db: Session = Depends(get_db)):
+    """
+    Readiness probe. The worker is ready when the database answers; the chain is
+    reported but not required, since status reads never touch it.
     """
-    Triggers the creation of a new batch.
+    try:
+        db.execute(text("SELECT 1"))
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "database": str(e)})
+
+    return {"status": "ready", "database": "ok", "chain": blockchain_service.chain_status()}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
 
-    1. Fetches all applicants with 'eligible' status.
-    2. Builds a Merkle Tree and commits the root to the blockchain.
-    3. Updates the status of included applicants to 'batched'.
-    (Note: For simplicity, this POC batches all eligible applicants together)
+@app.get("/cache/stats", tags=["Status"])
+def cache_stats():
+    """Hit, miss and eviction counters of this worker's status cache, for sizing it."""
+    return status_cache.stats()
+
+@app.post("/v1/batches/", status_code=202, tags=["Batches"])
+@tracing.traced_endpoint("batch.trigger")
+def trigger_batch_creation(aggregate: bool = batch_service.BATCH_AGGREGATE, db: Session = Depends(get_db)):
     """
-    # 1. Fetch eligible applicants from the database
-    eligible_applicants = db.query(models.Applicant).filter(models.Applicant.status == models.ApplicantStatus.ELIGIBLE).all()
+    Triggers the creation of new batches.
 
-    if not eligible_applicants:
+    1. Finds the wilayas with 'eligible' applicants.
+    2. Freezes each wilaya's Merkle queue into a snapshot (on a process pool, one
+       wilaya per task). Leaves were hashed as applicants were appended, so this
+       costs the same whatever the batch size; queues seal a snapshot every
+       `BATCH_MAX_SIZE` applicants.
+    3. With `aggregate`, combines the snapshot roots under one aggregate root, so
+       the whole round costs one transaction (`AGGREGATE_MAX_PARTS` wilaya trees
+       at most per root).
+    4. Records one commit job per snapshot (or aggregate) and returns right away;
+       the jobs are submitted in the background and can be followed on
+       `/v1/batches/jobs/{id}`.
+    (The indexer updates the status of included applicants to 'batched'.)
+    """
+    # 1. Find the wilayas that have something to batch.
+    with tracing.span("batch.find_wilayas"):
+        wilaya_codes = batch_service.eligible_wilayas(db)
+    if not wilaya_codes:
         return {"message": "No eligible applicants to batch."}
 
-    try:
-        # For this POC, we'll hardcode wilaya and metadata.
-        # 111revise: make dynamic later
-        tx_hash = blockchain_service.create_and_commit_batch(
-            eligible_applicants=eligible_applicants,
-            wilaya_code=16,
-            metadata=b"Q4_2025_BATCH"
-        )
+    # 2. Freeze the queues in parallel. Eligible applicants never appended to a
+    # queue are appended first.
+    batches = batch_service.build_batches(wilaya_codes)
+    if aggregate and batches:
+        batches = batch_service.aggregate_batches(batches)
 
-        # 3. Update the status of applicants in the DB
-        # for app in eligible_applicants:
-        #     app.status = models.ApplicantStatus.BATCHED
-        
-        # db.commit()
-
-        return {
-            "message": "Batch creation successful.",
-            "transaction_hash": tx_hash,
-            "applicants_batched": len(eligible_applicants)
-        }
-    except Exception as e:
-        # If anything goes wrong (e.g., out of gas), we raise an error
-        # and do NOT change the status of applicants in the DB.
-        raise HTTPException(
-            status_code=500,
-            detail=f"An error occurred during batch creation: {e}"
+    # 4. Queue the on-chain submissions instead of waiting for receipts here.
+    with tracing.span("batch.create_jobs"):
+        jobs = batch_jobs.create_jobs(db, batches)
+    tracing.set_attributes(**{"batch.job_ids": [job.id for job in jobs]})
+    batch_jobs.enqueue([job.id for job in jobs])
+
+    return {
+        "message": "Batch commit jobs queued.",
+        "jobs": [
+            {"job_id": job.id, "wilaya_code": job.wilaya_code, "applicants": job.batch_size}
+            for job in jobs
+        ],
+        "applicants_batched": sum(job.batch_size for job in jobs)
+    }
+
+
+@app.get("/v1/batches/jobs/{job_id}", response_model=schemas.BatchJob, tags=["Batches"])
+def get_batch_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Returns the state of a batch commit job: queued, submitted (with its transaction
+    hash), confirmed (with the gas used) or failed (with the error).
+    """
+    job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    return {
+        "id": job.id,
+        "status": job.status.value, # Convert Enum to string
+        "wilaya_code": job.wilaya_code,
+        "batch_size": job.batch_size,
+        "merkle_root": job.merkle_root,
+        "tx_hash": job.tx_hash,
+        "gas_used": job.gas_used,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
+
+@app.get("/v1/batches/{batch_id}/multiproof", response_model=schemas.MultiProof, tags=["Batches"],
+         responses={200: {"content": {proof_codec.MULTIPROOF_MEDIA_TYPE: {}}}})
+def get_multiproof(
+    batch_id: int,
+    request: Request,
+    offset: List[int] = Query(..., description="Leaf offsets to prove (repeat the parameter)."),
+    wilaya_index: int = Query(None, description="For an aggregated batch, the wilaya tree the offsets are in."),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Proves many leaves of one batch at once: their leaf hashes plus the tree nodes
+    they cannot rebuild themselves, each node once, instead of one full proof per
+    leaf.
+
+    - In an **aggregated** batch the offsets are within one wilaya tree
+      (`wilaya_index`), the nodes lead to its `wilaya_root`, and `root_proof` leads
+      from there to `merkle_root`.
+    - Sent as `application/vnd.aadl-on.multiproof` (see `proof_codec`) when the
+      `Accept` header asks for it.
+    - Committed batches never change, so the response carries an ETag keyed by the
+      batch root and `If-None-Match` revalidates it without a body. They are read
+      from the replica when `REPLICA_DATABASE_URL` is set.
+    """
+    offsets = sorted(set(offset))
+    if len(offsets) > MULTIPROOF_MAX_LEAVES:
+        raise HTTPException(status_code=400, detail=f"At most {MULTIPROOF_MAX_LEAVES} offsets per multi-proof.")
+
+    batch = db.query(models.Batch).filter(models.Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    part_query = db.query(models.AggregatePart).filter(models.AggregatePart.batch_id == batch_id)
+    if wilaya_index is not None:
+        part = part_query.filter(models.AggregatePart.part_index == wilaya_index).first()
+        if not part:
+            raise HTTPException(status_code=404, detail="Wilaya tree not found in this batch")
+        leaf_count, position_base = part.batch_size, part.position_base
+    else:
+        part = None
+        if part_query.first():
+            raise HTTPException(status_code=400, detail="This batch is aggregated; pass the wilaya_index of the offsets.")
+        leaf_count, position_base = batch.batch_size, 0
+        if leaf_count is None:
+            leaf_count = db.query(func.count(models.Leaf.id)).filter(models.Leaf.batch_id == batch_id).scalar()
+
+    if offsets[0] < 0 or offsets[-1] >= leaf_count:
+        raise HTTPException(status_code=400, detail=f"Offsets must be between 0 and {leaf_count - 1}.")
+
+    binary = proof_codec.prefers(request.headers.get("accept"), proof_codec.MULTIPROOF_MEDIA_TYPE)
+    digest = hashlib.blake2b(repr((wilaya_index, offsets)).encode(), digest_size=8).hexdigest()
+    headers = {
+        "ETag": proof_codec.etag(batch.merkle_root, f"multi-{'bin' if binary else 'json'}-{digest}"),
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept",
+    }
+    if proof_codec.etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    leaf_rows = (
+        db.query(models.Leaf.offset, models.Leaf.leaf_hash)
+        .filter(models.Leaf.batch_id == batch_id, models.Leaf.offset.in_([position_base + o for o in offsets]))
+        .all()
+    )
+    leaves = {row.offset - position_base: bytes.fromhex(row.leaf_hash) for row in leaf_rows}
+    positions = proof_codec.multiproof_positions(leaf_count, offsets)
+    nodes = proof_store.get_nodes(db, batch_id, positions, position_base)
+    if nodes is None and part is None and not has_read_replica():
+        # Batch indexed before the proof store existed: build its tree once and
+        # keep it. (A replica is read-only; backfill with `proof_files export`.)
+        proof_store.build_from_leaves(db, batch_id)
+        db.commit()
+        nodes = proof_store.get_nodes(db, batch_id, positions)
+    if nodes is None or len(leaves) != len(offsets):
+        raise HTTPException(status_code=503, detail="The proof data of this batch is incomplete.")
+    leaves = [leaves[o] for o in offsets]
+
+    root_proof = proof_store.decode_path(part.root_proof) if part is not None else None
+    if binary:
+        headers["X-Merkle-Root"] = batch.merkle_root
+        if part is not None:
+            headers["X-Wilaya-Root"] = part.merkle_root
+            headers["X-Root-Proof"] = proof_codec.encode_proof(root_proof, part.part_index).hex()
+        return Response(
+            content=proof_codec.encode_multiproof(leaf_count, offsets, leaves, nodes),
+            media_type=proof_codec.MULTIPROOF_MEDIA_TYPE,
+            headers=headers
         )
 
+    body = {
+        "batch_id": batch_id,
+        "merkle_root": batch.merkle_root,
+        "leaf_count": leaf_count,
+        "offsets": offsets,
+        "leaves": [leaf.hex() for leaf in leaves],
+        "nodes": [node.hex() for node in nodes],
+        "wilaya_root": part.merkle_root if part is not None else None,
+        "wilaya_index": wilaya_index,
+        "root_proof": [node.hex() for node in root_proof] if root_proof is not None else None,
+    }
+    return JSONResponse(content=body, headers=headers)
+
 
 ### Verify Applicant Status Endpoint ###
 
-@app.get("/v1/applicants/{national_id}/status", response_model=schemas.ApplicantStatusResponse, tags=["Applicants"])
-def check_applicant_status(national_id: str, db: Session = Depends(get_db)):
+@app.get("/v1/applicants/{national_id}/status", response_model=schemas.ApplicantStatusResponse, tags=["Applicants"],
+         responses={200: {"content": {proof_codec.PROOF_MEDIA_TYPE: {}}}})
+@tracing.traced_endpoint("applicant.status")
+async def check_applicant_status(national_id: str, request: Request, db: AsyncSession = Depends(get_async_read_db)):
     """
     Checks the status of an applicant. 
-    If they are BATCHED, this calculates and returns their Merkle Proof.
+    If they are BATCHED, this reads and returns their Merkle Proof.
+
+    Runs on the async engine, so a lookup waiting on the database does not hold a
+    threadpool slot, and reads from the replica when `REPLICA_DATABASE_URL` is set.
+    Responses are cached per applicant hash; the indexer
+    invalidates them when it batches the applicant. Without a shared
+    `STATUS_CACHE_BACKEND` that invalidation cannot reach the API workers, so
+    only batched responses with a proof, which never change, are cached.
+
+    A batched applicant's proof never changes: it carries an ETag keyed by the
+    batch root, so `If-None-Match` revalidates it without a body, and is sent as
+    a compact binary proof (`application/vnd.aadl-on.proof`, see `proof_codec`)
+    when the `Accept` header asks for it.
     """
     # 1. Hash the ID to look it up
     applicant_hash = security.hash_identifier(national_id)
 
-    # 2. Find the applicant
-    applicant = db.query(models.Applicant).filter(models.Applicant.applicant_hash == applicant_hash).first()
-    if not applicant:
-        raise HTTPException(status_code=404, detail="Applicant not found")
+    response = status_cache.get(applicant_hash)
+    if response is None:
+        response = await load_applicant_status(db, applicant_hash)
 
-    response = {
-        "national_id": national_id,
-        "status": applicant.status.value, # Convert Enum to string
+        # A batched applicant whose proof could not be read is not cached, so the
+        # next request tries again.
+        if response["status"] != models.ApplicantStatus.BATCHED.value or response["merkle_proof"] is not None:
+            status_cache.set(applicant_hash, response, final=response["merkle_proof"] is not None)
+
+    if response["merkle_proof"] is None:
+        return {**response, "national_id": national_id}
+    return proof_response(request, {**response, "national_id": national_id})
+
+
+def proof_response(request: Request, status: dict) -> Response:
+    """The response for a batched applicant, negotiated and revalidated by ETag."""
+    binary = proof_codec.prefers(request.headers.get("accept"), proof_codec.PROOF_MEDIA_TYPE)
+    headers = {
+        "ETag": proof_codec.etag(status["merkle_root"], "bin" if binary else "json"),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept",
+    }
+    if proof_codec.etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if not binary:
+        return JSONResponse(content=status, headers=headers)
+
+    # One path from the leaf to the committed root, through the wilaya root of an
+    # aggregated batch.
+    nodes = [bytes.fromhex(node) for node in status["merkle_proof"]]
+    index = status["offset"]
+    if status["root_proof"] is not None:
+        index += status["wilaya_index"] << len(nodes)
+        nodes += [bytes.fromhex(node) for node in status["root_proof"]]
+    headers["X-Batch-Id"] = str(status["batch_id"])
+    headers["X-Merkle-Root"] = status["merkle_root"]
+    return Response(content=proof_codec.encode_proof(nodes, index), media_type=proof_codec.PROOF_MEDIA_TYPE, headers=headers)
+
+
+@app.post("/v1/applicants/status", response_model=schemas.BatchStatusResponse, tags=["Applicants"])
+@tracing.traced_endpoint("applicant.status_batch")
+async def check_applicant_statuses(lookup: schemas.BatchStatusRequest, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Checks many applicants at once (up to `BATCH_STATUS_MAX_IDS`), for bulk
+    reconciliations.
+
+    Each result is what `GET /v1/applicants/{national_id}/status` returns as JSON.
+    Answers come from the status cache where it has them; the rest are read with
+    one query per table per `STATUS_LOOKUP_CHUNK_SIZE` IDs, and each batch's
+    proofs are read together, from its proof file or with one query per tree.
+    """
+    national_ids = list(dict.fromkeys(lookup.national_ids))
+    if not national_ids:
+        raise HTTPException(status_code=400, detail="No national IDs given.")
+    if len(national_ids) > BATCH_STATUS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_STATUS_MAX_IDS} national IDs per request.")
+    try:
+        applicant_hashes = security.hash_identifiers(national_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    responses, missing = {}, []
+    for applicant_hash in applicant_hashes:
+        cached = status_cache.get(applicant_hash)
+        if cached is None:
+            missing.append(applicant_hash)
+        else:
+            responses[applicant_hash] = cached
+    if missing:
+        loaded = await load_applicant_statuses(db, missing)
+        for applicant_hash, response in loaded.items():
+            if response["status"] != models.ApplicantStatus.BATCHED.value or response["merkle_proof"] is not None:
+                status_cache.set(applicant_hash, response, final=response["merkle_proof"] is not None)
+        responses.update(loaded)
+
+    results, not_found = [], []
+    for national_id, applicant_hash in zip(national_ids, applicant_hashes):
+        response = responses.get(applicant_hash)
+        if response is None:
+            not_found.append(national_id)
+        else:
+            results.append({**response, "national_id": national_id})
+    # Already in response form; skip re-validating thousands of entries.
+    return JSONResponse(content={"results": results, "not_found": not_found})
+
+
+def empty_status(status: models.ApplicantStatus) -> dict:
+    return {
+        "status": status.value, # Convert Enum to string
         "batch_id": None,
         "offset": None,
         "merkle_root": None,
-        "merkle_proof": None
+        "merkle_proof": None,
+        "wilaya_root": None,
+        "wilaya_index": None,
+        "root_proof": None
     }
 
+
+def fill_from_proof_file(response: dict, proof_file: proof_files.ProofFile, offset: int):
+    """Sets the proof of the leaf at batch `offset` from the batch's proof file."""
+    found = proof_file.proof(offset)
+    response["offset"] = found["offset"]
+    response["merkle_proof"] = [node.hex() for node in found["merkle_proof"]]
+    if proof_file.aggregated:
+        response["wilaya_root"] = found["root"].hex()
+        response["wilaya_index"] = found["part"]
+        response["root_proof"] = [node.hex() for node in found["root_proof"]]
+
+
+def fill_from_part(response: dict, part: models.AggregatePart, offset: int):
+    """Sets the wilaya tree fields of a leaf at `offset` within `part` of an aggregated batch."""
+    response["offset"] = offset
+    response["wilaya_root"] = part.merkle_root
+    response["wilaya_index"] = part.part_index
+    response["root_proof"] = [node.hex() for node in proof_store.decode_path(part.root_proof)]
+
+
+async def load_applicant_status(db: AsyncSession, applicant_hash: str) -> dict:
+    """The status response for one applicant, without its `national_id`."""
+    # 2. Find the applicant
+    applicant = (await db.execute(
+        select(models.Applicant.status).where(models.Applicant.applicant_hash == applicant_hash)
+    )).first()
+    if not applicant:
+        raise HTTPException(status_code=404, detail="Applicant not found")
+
+    response = empty_status(applicant.status)
+
     # 3. If they are not batched, just return the status
 
     if applicant.status != models.ApplicantStatus.BATCHED:
         return response
 
-    # 4. If they ARE batched, we need to fetch the proof data from the 'leaves' and 'batches' tables
-    leaf_record = db.query(models.Leaf).filter(models.Leaf.applicant_hash == applicant_hash).first()
+    # 4. If they ARE batched, fetch the proof data from the 'leaves' and 'batches' tables in one round trip
+    leaf_record = (await db.execute(
+        select(
+            models.Leaf.batch_id,
+            models.Leaf.offset,
+            models.Leaf.leaf_hash,
+            models.Batch.merkle_root,
+            models.Batch.batch_size
+        )
+        .join(models.Batch, models.Batch.id == models.Leaf.batch_id)
+        .where(models.Leaf.applicant_hash == applicant_hash)
+        .limit(1)
+    )).first()
     if not leaf_record:
 
         # This shouldn't happen if the Indexer is working correctly, but good to handle
         return response 
 
-    batch_record = db.query(models.Batch).filter(models.Batch.id == leaf_record.batch_id).first()
-    
     response["batch_id"] = leaf_record.batch_id
     response["offset"] = leaf_record.offset
-    response["merkle_root"] = batch_record.merkle_root
+    response["merkle_root"] = leaf_record.merkle_root
+
+    # --- 5. Read the Merkle Proof ---
+    # From the batch's memory-mapped proof file when the indexer wrote one: offset
+    # arithmetic over pages all workers share, without another query.
+    proof_file = proof_files.open_batch(leaf_record.batch_id)
+    if proof_file is not None:
+        fill_from_proof_file(response, proof_file, leaf_record.offset)
+        return response
+
+    # Otherwise from `merkle_nodes`: the indexer stores every tree level there when
+    # it ingests a batch, so the proof is a single indexed read of ~log2(n) rows,
+    # never a tree rebuild.
+    leaf_count = leaf_record.batch_size
+    offset = leaf_record.offset
+    position_base = 0
+
+    # In an aggregated batch the leaf sits in one wilaya tree (the part starting at
+    # or before its offset); the proof then runs up to that tree's root, and
+    # `root_proof` continues from there to the committed root.
+    part = (await db.execute(
+        select(models.AggregatePart)
+        .where(
+            models.AggregatePart.batch_id == leaf_record.batch_id,
+            models.AggregatePart.position_base <= leaf_record.offset
+        )
+        .order_by(models.AggregatePart.position_base.desc())
+        .limit(1)
+    )).scalars().first()
+    if part is not None:
+        position_base = part.position_base
+        offset = leaf_record.offset - part.position_base
+        leaf_count = part.batch_size
+        fill_from_part(response, part, offset)
+    elif leaf_count is None:
+        leaf_count = await db.scalar(
+            select(func.count()).select_from(models.Leaf).where(models.Leaf.batch_id == leaf_record.batch_id)
+        )
 
-    # --- 5. Generate the Merkle Proof ---
-    # To generate a proof, we need ALL leaves from this batch to rebuild the tree.
-    # In a massive production system, we might store proofs, but rebuilding 
-    # for small batches (<10k) is fast and cheap.
-    
-    # Fetch all leaves for this batch, ordered by offset
-    all_leaves = db.query(models.Leaf).filter(models.Leaf.batch_id == leaf_record.batch_id).order_by(models.Leaf.offset).all()
-    
-    # Extract the hashes (we assume the leaf_hash column is populated)
-    leaf_hashes = [leaf.leaf_hash for leaf in all_leaves]
-    
-    # Rebuild the tree
     try:
-        tree = merkle_service.MerkleTree(leaf_hashes)
-        proof = tree.get_proof(leaf_record.leaf_hash)
-        
+        proof = await db.run_sync(proof_store.get_proof, leaf_record.batch_id, offset, leaf_count, position_base)
+        if proof is None and part is None and not has_read_replica():
+            # Batch indexed before the proof store existed: build its tree once and
+            # keep it. (A replica is read-only; backfill with `proof_files export`.)
+            tree = await db.run_sync(proof_store.build_from_leaves, leaf_record.batch_id)
+            await db.commit()
+            proof = tree.get_proof(leaf_record.leaf_hash)
+
         # Convert proof bytes to hex strings for the API response
-        response["merkle_proof"] = [p.hex() if isinstance(p, bytes) else p for p in proof]
+        response["merkle_proof"] = [p.hex() for p in proof]
     except Exception as e:
+        await db.rollback()
         print(f"Error creating proof: {e}")
         # We don't fail the request, just return no proof
         pass
 
-    return response
\ No newline at end of file
+    return response
+
+
+def _chunks(values: list, size: int = None):
+    size = size or STATUS_LOOKUP_CHUNK_SIZE
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+async def load_applicant_statuses(db: AsyncSession, applicant_hashes: List[str]) -> dict:
+    """
+    Batch form of `load_applicant_status`: `{applicant_hash: response}` for the
+    applicants that exist. Applicants and their leaves are each read with one
+    `IN` query per `STATUS_LOOKUP_CHUNK_SIZE` hashes; proofs are then read per
+    batch (and per wilaya tree of an aggregated batch), never per applicant.
+    """
+    rows = []
+    for chunk in _chunks(applicant_hashes):
+        rows += (await db.execute(
+            select(models.Applicant.applicant_hash, models.Applicant.status)
+            .where(models.Applicant.applicant_hash.in_(chunk))
+        )).all()
+    responses = {row.applicant_hash: empty_status(row.status) for row in rows}
+    batched = [row.applicant_hash for row in rows if row.status == models.ApplicantStatus.BATCHED]
+    if not batched:
+        return responses
+
+    leaf_rows = []
+    for chunk in _chunks(batched):
+        leaf_rows += (await db.execute(
+            select(
+                models.Leaf.applicant_hash,
+                models.Leaf.batch_id,
+                models.Leaf.offset,
+                models.Leaf.leaf_hash,
+                models.Batch.merkle_root,
+                models.Batch.batch_size
+            )
+            .join(models.Batch, models.Batch.id == models.Leaf.batch_id)
+            .where(models.Leaf.applicant_hash.in_(chunk))
+        )).all()
+    by_batch = defaultdict(list)
+    for leaf_record in leaf_rows:
+        response = responses[leaf_record.applicant_hash]
+        if response["batch_id"] is not None:
+            continue
+        response["batch_id"] = leaf_record.batch_id
+        response["offset"] = leaf_record.offset
+        response["merkle_root"] = leaf_record.merkle_root
+        by_batch[leaf_record.batch_id].append(leaf_record)
+
+    # Batches with a proof file need no further query.
+    unfiled = {}
+    for batch_id, records in by_batch.items():
+        proof_file = proof_files.open_batch(batch_id)
+        if proof_file is None:
+            unfiled[batch_id] = records
+            continue
+        for leaf_record in records:
+            fill_from_proof_file(responses[leaf_record.applicant_hash], proof_file, leaf_record.offset)
+    if not unfiled:
+        return responses
+
+    # The wilaya trees of the aggregated ones among the rest.
+    parts = defaultdict(list)
+    for chunk in _chunks(list(unfiled)):
+        for part in (await db.execute(
+            select(models.AggregatePart)
+            .where(models.AggregatePart.batch_id.in_(chunk))
+            .order_by(models.AggregatePart.batch_id, models.AggregatePart.position_base)
+        )).scalars():
+            parts[part.batch_id].append(part)
+
+    for batch_id, records in unfiled.items():
+        # Group the batch's leaves by tree: the whole batch, or one wilaya tree.
+        bases = [part.position_base for part in parts[batch_id]]
+        trees = defaultdict(list)
+        for leaf_record in records:
+            trees[bisect.bisect_right(bases, leaf_record.offset) - 1 if bases else None].append(leaf_record)
+
+        for tree_index, tree_records in trees.items():
+            part = parts[batch_id][tree_index] if tree_index is not None else None
+            position_base = part.position_base if part is not None else 0
+            leaf_count = part.batch_size if part is not None else tree_records[0].batch_size
+            offsets = [leaf_record.offset - position_base for leaf_record in tree_records]
+            if part is not None:
+                for leaf_record, offset in zip(tree_records, offsets):
+                    fill_from_part(responses[leaf_record.applicant_hash], part, offset)
+            elif leaf_count is None:
+                leaf_count = await db.scalar(
+                    select(func.count()).select_from(models.Leaf).where(models.Leaf.batch_id == batch_id)
+                )
+
+            try:
+                proofs = await db.run_sync(proof_store.get_proofs, batch_id, offsets, leaf_count, position_base)
+                if proofs is None and part is None and not has_read_replica():
+                    # Batch indexed before the proof store existed, as in `load_applicant_status`.
+                    tree = await db.run_sync(proof_store.build_from_leaves, batch_id)
+                    await db.commit()
+                    proofs = {leaf_record.offset: tree.get_proof(leaf_record.leaf_hash) for leaf_record in tree_records}
+                if proofs is None:
+                    continue
+                for leaf_record, offset in zip(tree_records, offsets):
+                    responses[leaf_record.applicant_hash]["merkle_proof"] = [p.hex() for p in proofs[offset]]
+            except Exception as e:
+                await db.rollback()
+                logging.error(f"Error creating proofs for batch {batch_id}: {e}")
+
+    return responses
@@ -0,0 +1,51 @@
+import os
+import sys
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend import security
+from backend.database import SessionLocal
+from backend.services import import_service, merkle_queue
+from backend.services.status_cache import status_cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Move verified PENDING applicants to ELIGIBLE and store their Merkle leaves.")
+    parser.add_argument("--wilaya", type=int, help="Only applicants of this wilaya (alone: the whole wilaya).")
+    parser.add_argument("--applicant-id", type=int, action="append", help="An applicant id; repeat for several.")
+    parser.add_argument("--file", help="NDJSON or CSV export whose records carry a national_id; '-' reads NDJSON from stdin.")
+    parser.add_argument("--format", choices=[import_service.NDJSON, import_service.CSV], help="Override the format guessed from the extension.")
+    parser.add_argument("--chunk-size", type=int, default=merkle_queue.QUEUE_CHUNK_SIZE, help="Applicants updated per round trip.")
+    args = parser.parse_args()
+
+    if args.wilaya is None and args.applicant_id is None and args.file is None:
+        parser.error("give --wilaya, --applicant-id or --file")
+
+    applicant_hashes = None
+    if args.file:
+        fmt = args.format or import_service.detect_format(filename=args.file)
+        if args.file == "-":
+            national_ids = list(import_service.iter_national_ids(sys.stdin, fmt))
+        else:
+            with open(args.file, "r", encoding="utf-8", newline="") as f:
+                national_ids = list(import_service.iter_national_ids(f, fmt))
+        applicant_hashes = security.hash_identifiers(national_ids)
+
+    db = SessionLocal()
+    try:
+        changed = merkle_queue.mark_eligible_where(
+            db, args.wilaya, args.applicant_id, applicant_hashes, chunk_size=args.chunk_size
+        )
+        db.commit()
+    finally:
+        db.close()
+    # Only reaches other processes through a shared STATUS_CACHE_BACKEND; without
+    # one, the API caches no status that this can change.
+    status_cache.invalidate(changed)
+
+    print(f"Eligible: {len(changed)}")
+
+if __name__ == "__main__":
+    main()
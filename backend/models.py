@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, DateTime, func, Enum
+from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey, DateTime, func, Enum, SmallInteger, Text, Index, text, LargeBinary
 from sqlalchemy.orm import relationship
 import enum
 
@@ -11,6 +11,12 @@ class ApplicantStatus(enum.Enum):
     SELECTED = "selected"
     REJECTED = "rejected"
 
+class BatchJobStatus(enum.Enum):
+    QUEUED = "queued"
+    SUBMITTED = "submitted"
+    CONFIRMED = "confirmed"
+    FAILED = "failed"
+
 class Applicant(Base):
     __tablename__ = "applicants"
 
@@ -31,12 +37,38 @@ class Applicant(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    # --- Merkle queue slot ---
+    # Set when the applicant's leaf is appended to its wilaya's queue: the batch is
+    # (wilaya_code, queue_epoch) and the leaf offset is queue_position.
+    queue_epoch = Column(Integer, nullable=True)
+    queue_position = Column(Integer, nullable=True)
+    # The applicant's 32-byte Merkle leaf, stored when it enters the queue so batch
+    # building and indexing read it instead of hashing. It only depends on columns
+    # that never change after registration.
+    leaf_hash = Column(LargeBinary(32), nullable=True)
+
+    __table_args__ = (
+        # Any "applicants in status X (of wilaya Y) in id order" scan. It also serves
+        # the eligible queue, so there is no separate partial index on ELIGIBLE rows:
+        # the planner never picked one over this (see query_plans.py).
+        Index("ix_applicants_status_wilaya_id", "status", "wilaya_code", "id"),
+        # The leaves of one queue snapshot, in leaf order. Applicants that never
+        # entered a queue are left out.
+        Index(
+            "ix_applicants_queue", "wilaya_code", "queue_epoch", "queue_position",
+            postgresql_where=text("queue_epoch IS NOT NULL"),
+            sqlite_where=text("queue_epoch IS NOT NULL")
+        ),
+    )
+
 class Batch(Base):
     __tablename__ = "batches"
 
     id = Column(BigInteger, primary_key=True, index=True)
     merkle_root = Column(String(66), unique=True, index=True, nullable=False)
     tx_hash = Column(String(66), unique=True, index=True, nullable=True)
+    # Number of leaves committed on-chain (the `batchSize` of the event).
+    batch_size = Column(Integer, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
     leaves = relationship("Leaf", back_populates="batch")
@@ -53,4 +85,120 @@ class Leaf(Base):
 
     batch = relationship("Batch", back_populates="leaves")
 
+    __table_args__ = (
+        # Leaves of a batch in offset order (proof rebuilds, exports), and one leaf per slot.
+        Index("ux_leaves_batch_offset", "batch_id", "offset", unique=True),
+        # An applicant appears at most once in a given batch.
+        Index("ux_leaves_batch_applicant", "batch_id", "applicant_hash", unique=True),
+    )
+
+class MerkleNode(Base):
+    """
+    One node of a committed batch's Merkle tree, stored once when the batch is
+    indexed so that a proof is a single indexed read instead of a tree rebuild.
+
+    `level` 0 holds the leaves. Odd levels are stored with their padding node
+    (the duplicated last node), so every non-root node has a stored sibling.
+    """
+    __tablename__ = "merkle_nodes"
+
+    batch_id = Column(BigInteger, ForeignKey("batches.id"), primary_key=True)
+    level = Column(SmallInteger, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    node_hash = Column(String(66), nullable=False)
+
+class AggregatePart(Base):
+    """
+    One wilaya tree inside an aggregated batch, whose on-chain root is the root of
+    a top tree over the wilaya roots (in `part_index` order).
+
+    The part's leaves and nodes are stored under the batch id like any other tree,
+    shifted to start at `position_base` (a multiple of a power of two larger than
+    every part), so the parts never share a node position. `root_proof` is the path
+    from the wilaya root to the batch root: concatenated 32-byte hex nodes.
+    """
+    __tablename__ = "aggregate_parts"
 
+    batch_id = Column(BigInteger, ForeignKey("batches.id"), primary_key=True)
+    part_index = Column(Integer, primary_key=True)
+    wilaya_code = Column(Integer, nullable=False)
+    epoch = Column(Integer, nullable=False)
+    merkle_root = Column(String(66), nullable=False)
+    batch_size = Column(Integer, nullable=False)
+    position_base = Column(Integer, nullable=False)
+    root_proof = Column(Text, nullable=False)
+
+    __table_args__ = (
+        # The part holding a leaf: the last part whose base is <= the leaf offset.
+        Index("ix_aggregate_parts_batch_base", "batch_id", "position_base"),
+    )
+
+class BatchJob(Base):
+    """
+    One background `commitBatch` submission, created by `POST /v1/batches/` and
+    advanced by the job runner and the receipt watcher.
+    """
+    __tablename__ = "batch_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(Enum(BatchJobStatus), default=BatchJobStatus.QUEUED, nullable=False)
+
+    # --- What is being committed ---
+    wilaya_code = Column(Integer, nullable=False)
+    batch_size = Column(Integer, nullable=False)
+    merkle_root = Column(String(66), nullable=False)
+    batch_metadata = Column(Text, nullable=False)
+
+    # --- Chain state ---
+    # Recorded once the transaction is signed and before it is sent, so a job
+    # interrupted mid-send can be rebroadcast instead of lost.
+    tx_hash = Column(String(66), index=True, nullable=True)
+    signed_tx = Column(Text, nullable=True)
+    nonce = Column(Integer, nullable=True)
+    gas_used = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class IndexerCursor(Base):
+    """
+    The last block a chain indexer has fully processed, so a restart resumes
+    (and backfills) from there instead of from 'latest'.
+    """
+    __tablename__ = "indexer_cursors"
+
+    name = Column(String(64), primary_key=True)
+    last_block = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class MerkleQueue(Base):
+    """
+    The append-only Merkle accumulator of one wilaya's eligible queue.
+
+    Leaves are appended as applicants become eligible. `frontier` holds the packed
+    `IncrementalMerkleRoot` state of the open epoch, so appending costs O(log n)
+    and the current root can be read, or frozen into a `QueueSnapshot`, without
+    reading any leaf.
+    """
+    __tablename__ = "merkle_queues"
+
+    wilaya_code = Column(Integer, primary_key=True)
+    epoch = Column(Integer, nullable=False, default=0)
+    leaf_count = Column(Integer, nullable=False, default=0)
+    frontier = Column(LargeBinary, nullable=False, default=b"")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class QueueSnapshot(Base):
+    """
+    A frozen epoch of a wilaya queue: the root and size one `commitBatch` commits.
+    `job_id` is the batch job committing it, once one has been created.
+    """
+    __tablename__ = "queue_snapshots"
+
+    wilaya_code = Column(Integer, primary_key=True)
+    epoch = Column(Integer, primary_key=True)
+    merkle_root = Column(String(66), nullable=False)
+    batch_size = Column(Integer, nullable=False)
+    job_id = Column(Integer, ForeignKey("batch_jobs.id"), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
@@ -8,6 +8,27 @@ class ApplicantCreate(BaseModel):
     address: str = Field(..., max_length=255)
     wilaya_code: conint(gt=0) 
 
+class BulkImportError(BaseModel):
+    line: int
+    detail: str
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    duplicates: int
+    rejected: int
+    # Only the first rejections are listed; `rejected` has the full count.
+    errors: List[BulkImportError] = []
+
+class EligibilityRequest(BaseModel):
+    # Filters are combined; at least one is required.
+    wilaya_code: Optional[conint(gt=0)] = None
+    national_ids: Optional[List[str]] = None
+    applicant_ids: Optional[List[int]] = None
+
+class EligibilityResult(BaseModel):
+    # PENDING applicants that matched and are now ELIGIBLE.
+    eligible: int
+
 class Applicant(BaseModel):
     id: int
     applicant_hash: str
@@ -30,6 +51,50 @@ class ApplicantStatusResponse(BaseModel):
     merkle_root: Optional[str] = None
     # The proof is a list of hashes (sibling nodes) needed for verification
     merkle_proof: Optional[List[str]] = None 
+    # Aggregated batches only: `merkle_proof` and `offset` lead to this wilaya
+    # root, which sits at `wilaya_index` in the top tree; `root_proof` leads
+    # from it to `merkle_root`.
+    wilaya_root: Optional[str] = None
+    wilaya_index: Optional[int] = None
+    root_proof: Optional[List[str]] = None
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class BatchStatusRequest(BaseModel):
+    national_ids: List[str] = Field(..., description="Applicants to look up; duplicates are answered once.")
+
+class BatchStatusResponse(BaseModel):
+    # In request order, one per distinct known ID.
+    results: List[ApplicantStatusResponse]
+    # IDs with no applicant.
+    not_found: List[str] = []
+
+class BatchJob(BaseModel):
+    id: int
+    status: str
+    wilaya_code: int
+    batch_size: int
+    merkle_root: str
+    tx_hash: Optional[str] = None
+    gas_used: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class MultiProof(BaseModel):
+    batch_id: int
+    merkle_root: str
+    leaf_count: int
+    # Proven leaves, in ascending offset order, and the other nodes needed to
+    # rebuild the root: each once, level by level from the leaves, by position.
+    offsets: List[int]
+    leaves: List[str]
+    nodes: List[str]
+    # Aggregated batches only, as in ApplicantStatusResponse.
+    wilaya_root: Optional[str] = None
+    wilaya_index: Optional[int] = None
+    root_proof: Optional[List[str]] = None
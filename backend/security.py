@@ -1,8 +1,17 @@
-from web3 import Web3
+from typing import Iterable, List
+
+from .services import hashing
 
 def hash_identifier(identifier: str) -> str:
     if not identifier:
         raise ValueError("Identifier cannot be empty.")
         
-    return Web3.keccak(text=identifier).hex()
+    return hashing.keccak256(identifier.encode("utf-8")).hex()
+
+def hash_identifiers(identifiers: Iterable[str]) -> List[str]:
+    """Batch form of `hash_identifier` for bulk imports and lookups."""
+    identifiers = list(identifiers)
+    if not all(identifiers):
+        raise ValueError("Identifier cannot be empty.")
 
+    return hashing.hash_identifiers(identifiers)
@@ -0,0 +1,217 @@
+# backend/services/batch_jobs.py
+
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal, engine
+from . import batch_service, blockchain_service, merkle_queue, metrics, tracing
+
+# A single submitter thread keeps commitBatch sends in nonce order; it never waits
+# for receipts, so many transactions can be in flight at once.
+_submitter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-submitter")
+# PostgreSQL advisory lock key serializing sends across API workers.
+SUBMISSION_LOCK_KEY = 0x4141444C
+
+
+def create_jobs(db: Session, batches: List[dict]) -> List[models.BatchJob]:
+    """
+    Records one QUEUED job per built batch and commits them. A queue snapshot that
+    another request claimed in the meantime gets no second job; an aggregated
+    batch gets one only if all of its snapshots could be claimed.
+    """
+    jobs = []
+    for batch in batches:
+        job = models.BatchJob(
+            wilaya_code=batch["wilaya_code"],
+            batch_size=batch["batch_size"],
+            merkle_root=batch["merkle_root"].hex(),
+            batch_metadata=batch_service.batch_metadata(batch).decode(),
+        )
+        db.add(job)
+        db.flush()
+        snapshots = [part for part in batch.get("parts", [batch]) if "epoch" in part]
+        claimed = []
+        for part in snapshots:
+            if not merkle_queue.claim_snapshot(db, part["wilaya_code"], part["epoch"], job.id, part.get("previous_job_id")):
+                break
+            claimed.append(part)
+        if len(claimed) < len(snapshots):
+            # Hand the snapshots already claimed back to the job they came from.
+            for part in claimed:
+                merkle_queue.claim_snapshot(db, part["wilaya_code"], part["epoch"], part.get("previous_job_id"), job.id)
+            db.delete(job)
+            continue
+        jobs.append(job)
+    db.commit()
+    return jobs
+
+
+def enqueue(job_ids: List[int]):
+    """Hands the jobs to the background submitter, continuing the caller's trace."""
+    parent = tracing.current_context()
+    for job_id in job_ids:
+        _submitter.submit(_submit_job, job_id, parent)
+
+
+@contextmanager
+def _submission_lock():
+    """
+    Serializes job submission across processes. Each API worker has its own
+    submitter thread and nonce counter, so on PostgreSQL a session-level advisory
+    lock is held from claiming a job until its signed transaction is recorded (or
+    the job failed). Outside the lock, a SUBMITTED job always has a transaction.
+    SQLite deployments are single-process and take no lock.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SUBMISSION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SUBMISSION_LOCK_KEY})
+            connection.commit()
+
+
+def _submit_job(job_id: int, parent=None):
+    db = SessionLocal()
+    try:
+        with _submission_lock():
+            tx_hash, wait_span = _send_job(db, job_id, parent)
+        if tx_hash is not None:
+            blockchain_service.receipt_watcher.watch(tx_hash, lambda receipt: _record_receipt(job_id, receipt, wait_span))
+    finally:
+        db.close()
+
+
+def _send_job(db: Session, job_id: int, parent=None):
+    """Claims and sends one job. Returns `(tx_hash, wait_span)`, or `(None, None)` if nothing was sent."""
+    # Claim the job atomically, so that when several API workers resume the same
+    # queued jobs at startup only one of them sends each transaction.
+    claimed = db.query(models.BatchJob).filter(
+        models.BatchJob.id == job_id,
+        models.BatchJob.status == models.BatchJobStatus.QUEUED
+    ).update({models.BatchJob.status: models.BatchJobStatus.SUBMITTED}, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        return None, None
+
+    job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+
+    def record_signed(tx_hash: str, raw_transaction: str, nonce: int):
+        # Committed before the send: after a crash from here on, the job is
+        # rebroadcast by `resume_pending_jobs` rather than orphaned.
+        job.tx_hash, job.signed_tx, job.nonce = tx_hash, raw_transaction, nonce
+        db.commit()
+
+    with tracing.span("batch.submit", parent=parent, **{
+        "batch.job_id": job_id,
+        "batch.wilaya": job.wilaya_code,
+        "batch.size": job.batch_size,
+        "batch.merkle_root": job.merkle_root,
+    }) as submit_span:
+        try:
+            # Nonces other workers used are above any this one handed out.
+            last_nonce = db.scalar(select(func.max(models.BatchJob.nonce)))
+            tx_hash = blockchain_service.submit_batch_root(
+                merkle_root=bytes.fromhex(job.merkle_root),
+                wilaya_code=job.wilaya_code,
+                batch_size=job.batch_size,
+                metadata=job.batch_metadata.encode(),
+                nonce_floor=0 if last_nonce is None else last_nonce + 1,
+                on_signed=record_signed,
+            )
+        except Exception as e:
+            logging.error(f"Batch job {job_id} failed to submit: {e}")
+            submit_span.record_exception(e)
+            db.rollback()
+            # Nothing was sent: free the nonce and let the snapshot be retried.
+            job.status = models.BatchJobStatus.FAILED
+            job.error = str(e)
+            job.tx_hash = job.signed_tx = job.nonce = None
+            db.commit()
+            return None, None
+
+        # Ended by `_record_receipt`, on the receipt watcher's thread.
+        return tx_hash, tracing.start_span("batch.receipt_wait", **{"batch.job_id": job_id, "tx.hash": tx_hash})
+
+
+def _record_receipt(job_id: int, receipt, wait_span=None):
+    db = SessionLocal()
+    try:
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+        if job is None:
+            return
+        if receipt is None:
+            job.status = models.BatchJobStatus.FAILED
+            job.error = f"No receipt after {blockchain_service.RECEIPT_TIMEOUT:.0f}s."
+        elif receipt["status"] == 1:
+            job.status = models.BatchJobStatus.CONFIRMED
+            job.gas_used = receipt["gasUsed"]
+        else:
+            job.status = models.BatchJobStatus.FAILED
+            job.gas_used = receipt["gasUsed"]
+            job.error = "Transaction reverted."
+        if receipt is not None:
+            metrics.COMMIT_GAS_USED.observe(receipt["gasUsed"])
+        db.commit()
+        logging.info(f"Batch job {job_id} is {job.status.value}.")
+        if wait_span is not None:
+            wait_span.set_attribute("batch.job_status", job.status.value)
+            if job.gas_used is not None:
+                wait_span.set_attribute("tx.gas_used", job.gas_used)
+    finally:
+        db.close()
+        if wait_span is not None:
+            wait_span.end()
+
+
+def shutdown():
+    """Stops accepting submissions; jobs not yet sent stay QUEUED for the next start."""
+    _submitter.shutdown(wait=False, cancel_futures=True)
+
+
+def resume_pending_jobs():
+    """
+    Picks up jobs left behind by a restart: QUEUED jobs are resubmitted, and
+    SUBMITTED jobs have their recorded transaction rebroadcast and their receipt
+    watched again. A SUBMITTED job with no transaction was interrupted before
+    signing, so nothing was sent; it goes back to QUEUED.
+    """
+    db = SessionLocal()
+    try:
+        # Under the lock, so a job another worker is sending right now is left alone.
+        with _submission_lock():
+            db.query(models.BatchJob).filter(
+                models.BatchJob.status == models.BatchJobStatus.SUBMITTED,
+                models.BatchJob.tx_hash.is_(None)
+            ).update({models.BatchJob.status: models.BatchJobStatus.QUEUED}, synchronize_session=False)
+            db.commit()
+        queued = [
+            row.id for row in db.query(models.BatchJob.id)
+            .filter(models.BatchJob.status == models.BatchJobStatus.QUEUED)
+            .order_by(models.BatchJob.id)
+        ]
+        submitted = (
+            db.query(models.BatchJob.id, models.BatchJob.tx_hash, models.BatchJob.signed_tx)
+            .filter(
+                models.BatchJob.status == models.BatchJobStatus.SUBMITTED,
+                models.BatchJob.tx_hash.isnot(None)
+            )
+            .all()
+        )
+    finally:
+        db.close()
+
+    for row in submitted:
+        if row.signed_tx is not None:
+            blockchain_service.rebroadcast(row.signed_tx)
+        blockchain_service.receipt_watcher.watch(row.tx_hash, lambda receipt, job_id=row.id: _record_receipt(job_id, receipt))
+    enqueue(queued)
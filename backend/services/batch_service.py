@@ -0,0 +1,215 @@
+# backend/services/batch_service.py
+
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from . import merkle_queue, metrics, tracing
+from .merkle_service import MerkleTree
+
+# Largest number of applicants committed under a single Merkle root.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "100000"))
+# Processes used to build the per-wilaya trees (defaults to one per core).
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0")) or os.cpu_count() or 1
+# Human-readable round label stored in every batch's on-chain metadata.
+BATCH_LABEL = os.getenv("BATCH_LABEL", "Q4_2025_BATCH")
+# Commit the wilaya roots of a round under one aggregate root by default.
+BATCH_AGGREGATE = os.getenv("BATCH_AGGREGATE", "false").lower() in ("1", "true", "yes")
+# Most wilaya trees under one aggregate root; the metadata grows with each one.
+AGGREGATE_MAX_PARTS = int(os.getenv("AGGREGATE_MAX_PARTS", "64"))
+# The `wilaya` an aggregated batch is committed with, since it spans several.
+AGGREGATE_WILAYA = 0
+
+
+def eligible_wilayas_query(db: Session):
+    """The wilaya codes that currently have at least one eligible applicant, in order."""
+    return (
+        db.query(models.Applicant.wilaya_code)
+        .filter(models.Applicant.status == models.ApplicantStatus.ELIGIBLE)
+        .distinct()
+        .order_by(models.Applicant.wilaya_code)
+    )
+
+
+def eligible_wilayas(db: Session) -> List[int]:
+    """The wilaya codes that currently have at least one eligible applicant."""
+    return [row.wilaya_code for row in eligible_wilayas_query(db)]
+
+
+def applicants_query(db: Session):
+    """The eligible applicants, with the columns a leaf is built from."""
+    return db.query(
+        models.Applicant.id,
+        models.Applicant.applicant_hash,
+        models.Applicant.file_hash,
+        models.Applicant.created_at,
+        models.Applicant.wilaya_code,
+        models.Applicant.leaf_hash,
+    ).filter(
+        models.Applicant.status == models.ApplicantStatus.ELIGIBLE
+    )
+
+
+def queue_epoch_query(db: Session, wilaya_code: int, epoch: int, batch_size: int):
+    """The applicants of one frozen queue epoch, in leaf order: the order they were appended."""
+    return applicants_query(db).filter(
+        models.Applicant.wilaya_code == wilaya_code,
+        models.Applicant.queue_epoch == epoch
+    ).order_by(models.Applicant.queue_position).limit(batch_size)
+
+
+def batch_applicants_query(db: Session, event_args):
+    """
+    Selects the applicants covered by a BatchCommitted event, in leaf order.
+
+    Batches frozen from a wilaya queue carry their queue epoch in the metadata,
+    and batches built from an applicant id range carry that range; older batches
+    fall back to "every eligible applicant". (Aggregated batches are read one
+    wilaya tree at a time, with `queue_epoch_query`.)
+    """
+    query = applicants_query(db)
+    span = parse_batch_metadata(event_args.metadata)
+    if span and "epoch" in span:
+        return queue_epoch_query(db, event_args.wilaya, span["epoch"], event_args.batchSize)
+    if span and "first_applicant_id" in span:
+        query = query.filter(
+            models.Applicant.wilaya_code == event_args.wilaya,
+            models.Applicant.id.between(span["first_applicant_id"], span["last_applicant_id"])
+        )
+    # Ordered by id, the same leaf order the batch root was computed with.
+    return query.order_by(models.Applicant.id).limit(event_args.batchSize)
+
+
+def build_wilaya_batches(wilaya_code: int, max_size: int = BATCH_MAX_SIZE) -> dict:
+    """
+    Freezes one wilaya's Merkle queue and returns the snapshots that need a commit.
+    Leaves are hashed when applicants are appended to the queue, so this only hashes
+    eligible applicants that were never appended. Runs in a worker process, so it
+    opens its own session.
+
+    Returns:
+        `{"wilaya_code", "appended", "started", "seconds", "batches"}`, where each
+        batch has `wilaya_code`, `epoch`, `batch_size`, `merkle_root` and the
+        `previous_job_id` of a failed job it replaces.
+    """
+    started = time.time()
+    db = SessionLocal()
+    try:
+        appended = merkle_queue.append_unqueued(db, wilaya_code, max_size)
+        merkle_queue.freeze(db, wilaya_code)
+        db.commit()
+        batches = [
+            {
+                "wilaya_code": wilaya_code,
+                "epoch": snapshot.epoch,
+                "batch_size": snapshot.batch_size,
+                "merkle_root": bytes.fromhex(snapshot.merkle_root),
+                "previous_job_id": snapshot.job_id,
+            }
+            for snapshot in merkle_queue.uncommitted_snapshots(db, wilaya_code)
+        ]
+    finally:
+        db.close()
+
+    return {
+        "wilaya_code": wilaya_code,
+        "appended": appended,
+        "started": started,
+        "seconds": time.time() - started,
+        "batches": batches,
+    }
+
+
+def build_batches(wilaya_codes: List[int], max_size: int = BATCH_MAX_SIZE, workers: int = BATCH_WORKERS) -> List[dict]:
+    """
+    Freezes the queues of every wilaya in `wilaya_codes`, one wilaya per task on a
+    process pool. The result is ordered by wilaya code, then by epoch.
+    """
+    workers = min(workers, len(wilaya_codes))
+    with tracing.span("batch.build", **{"batch.wilayas": len(wilaya_codes), "batch.workers": workers}):
+        if workers <= 1:
+            results = [build_wilaya_batches(code, max_size) for code in wilaya_codes]
+        else:
+            # "spawn" keeps the workers from inheriting the API's threads and open DB connections.
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = list(pool.map(build_wilaya_batches, wilaya_codes, repeat(max_size)))
+
+        # Recorded here, since the worker processes have no metrics endpoint or tracer.
+        for result in results:
+            metrics.MERKLE_BUILD_SECONDS.labels("batch").observe(result["seconds"])
+            for batch in result["batches"]:
+                metrics.MERKLE_BATCH_SIZE.labels("batch").observe(batch["batch_size"])
+            freeze_span = tracing.start_span("batch.freeze", start_time=result["started"], **{
+                "batch.wilaya": result["wilaya_code"],
+                "batch.appended": result["appended"],
+                "batch.epochs": [batch["epoch"] for batch in result["batches"]],
+            })
+            tracing.end_span(freeze_span, result["started"] + result["seconds"])
+    return [batch for result in results for batch in result["batches"]]
+
+
+def aggregate_batches(batches: List[dict], max_parts: int = AGGREGATE_MAX_PARTS) -> List[dict]:
+    """
+    Combines wilaya batches into aggregated ones: the root of each is the root of
+    a top tree whose leaves are the wilaya roots, in the order given, so one
+    `commitBatch` anchors up to `max_parts` wilaya trees. A leaf's proof is then its
+    path to its wilaya root followed by that root's path to the aggregate root.
+
+    Returns:
+        Batches with `wilaya_code` `AGGREGATE_WILAYA`, the total `batch_size`, the
+        aggregate `merkle_root` and the wilaya batches as `parts`.
+    """
+    aggregated = []
+    for start in range(0, len(batches), max_parts):
+        parts = batches[start:start + max_parts]
+        top = MerkleTree([part["merkle_root"] for part in parts])
+        aggregated.append({
+            "wilaya_code": AGGREGATE_WILAYA,
+            "batch_size": sum(part["batch_size"] for part in parts),
+            "merkle_root": top.get_root(),
+            "parts": parts,
+        })
+    return aggregated
+
+
+def batch_metadata(batch: dict, label: str = BATCH_LABEL) -> bytes:
+    """
+    On-chain metadata for a batch. The queue epoch (or, for batches built from an
+    applicant id range, that range) lets the indexer link the `BatchCommitted`
+    event back to exactly the applicants that were hashed. An aggregated batch
+    lists `[wilaya, epoch, root, size]` for each of its wilaya trees, in top tree
+    order.
+    """
+    if "parts" in batch:
+        return json.dumps({
+            "label": label,
+            "aggregate": [
+                [part["wilaya_code"], part["epoch"], part["merkle_root"].hex(), part["batch_size"]]
+                for part in batch["parts"]
+            ],
+        }, separators=(",", ":")).encode()
+    if "epoch" in batch:
+        return json.dumps({"label": label, "epoch": batch["epoch"]}, separators=(",", ":")).encode()
+    return json.dumps({
+        "label": label,
+        "first_applicant_id": batch["first_applicant_id"],
+        "last_applicant_id": batch["last_applicant_id"],
+    }, separators=(",", ":")).encode()
+
+
+def parse_batch_metadata(metadata: bytes) -> Optional[dict]:
+    """Decodes `batch_metadata` output; returns None for legacy free-form metadata."""
+    try:
+        decoded = json.loads(bytes(metadata).decode())
+    except (UnicodeDecodeError, ValueError):
+        return None
+    return decoded if isinstance(decoded, dict) else None
@@ -1,12 +1,12 @@
 # backend/services/blockchain_service.py
 
 import os
-import json
+import time
+import logging
+import threading
 from dotenv import load_dotenv
-from web3 import Web3
 
-# Import our Merkle Tree logic
-from .merkle_service import MerkleTree, create_applicant_leaf
+from . import rpc_client, tracing
 
 # --- CONFIGURATION ---
 load_dotenv()
@@ -14,89 +14,233 @@ RPC_URL = os.getenv("SEPOLIA_RPC_URL")
 OPERATOR_PRIVATE_KEY = os.getenv("SEPOLIA_PRIVATE_KEY")
 CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS")
 ABI_PATH = os.getenv("ABI_PATH", "out/BatchRegistry.sol/BatchRegistry.json")
+# How often the receipt watcher polls, and how long it waits for a transaction to be mined.
+RECEIPT_POLL_INTERVAL = float(os.getenv("RECEIPT_POLL_INTERVAL", "2"))
+RECEIPT_TIMEOUT = float(os.getenv("RECEIPT_TIMEOUT", "600"))
+
 
 # --- WEB3 SETUP ---
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-if not w3.is_connected():
-    raise ConnectionError(f"Failed to connect to RPC: {RPC_URL}")
+# Nothing touches the network (or even imports web3) until a chain call is made,
+# so API workers boot, and serve reads, while the RPC is slow or down.
+
+class ChainClient:
+    """The shared RPC client, operator account and BatchRegistry contract, built together."""
+
+    def __init__(self):
+        self.rpc = rpc_client.get_client(RPC_URL)
+        self.w3 = self.rpc.w3
+        if not self.w3.is_connected():
+            raise ConnectionError(f"Failed to connect to RPC: {RPC_URL}")
+
+        self.operator_account = self.w3.eth.account.from_key(OPERATOR_PRIVATE_KEY)
+        self.batch_registry_contract = self.rpc.contract(CONTRACT_ADDRESS, ABI_PATH)
+
+
+_client = None
+_client_lock = threading.Lock()
+
 
-operator_account = w3.eth.account.from_key(OPERATOR_PRIVATE_KEY)
+def get_client() -> ChainClient:
+    """The shared ChainClient, connected on first use. Raises ConnectionError if the RPC is down."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ChainClient()
+    return _client
 
-with open(ABI_PATH, "r") as f:
-    contract_abi = json.load(f)["abi"]
 
+def chain_status() -> str:
+    """'connected', 'unreachable' or 'not initialized' -- never opens a connection itself."""
+    client = _client
+    if client is None:
+        return "not initialized"
+    try:
+        return "connected" if client.w3.is_connected() else "unreachable"
+    except Exception:
+        return "unreachable"
 
-batch_registry_contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=contract_abi)
 
+def shutdown():
+    """Stops the receipt watcher and drops the shared client."""
+    global _client
+    receipt_watcher.stop()
+    with _client_lock:
+        _client = None
+    rpc_client.shutdown()
 
-def create_and_commit_batch(eligible_applicants: list, wilaya_code: int, metadata: bytes) -> str:
+
+class NonceManager:
+    """
+    Hands out operator nonces locally so several `commitBatch` transactions can be in
+    flight at once without two of them fetching the same `get_transaction_count`.
+
+    The counter is per process. Submitters in other processes are accounted for
+    through `floor` (see `batch_jobs`, which serializes sends across processes and
+    passes the highest nonce any job recorded).
     """
-    Takes a list of eligible applicants, builds a Merkle tree, and commits the
-    root to the blockchain.
 
-    Args:
-        eligible_applicants: A list of applicant objects from the database.
-        wilaya_code: The wilaya code for this batch.
-        metadata: The metadata for this batch.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_nonce = None
 
-    Returns:
-        The transaction hash of the on-chain commitment as a hex string.
+    def allocate(self, floor: int = 0) -> int:
+        """The next nonce, never below `floor`."""
+        with self._lock:
+            if self._next_nonce is None:
+                client = get_client()
+                # "pending" also counts transactions already in the mempool.
+                self._next_nonce = client.w3.eth.get_transaction_count(client.operator_account.address, "pending")
+            nonce = self._next_nonce = max(self._next_nonce, floor)
+            self._next_nonce += 1
+            return nonce
+
+    def reset(self):
+        """Forget the local counter, e.g. after a send failed, and resync from the node."""
+        with self._lock:
+            self._next_nonce = None
+
+
+class ReceiptWatcher:
+    """
+    A single background thread that polls receipts for every submitted transaction
+    and calls `on_receipt(receipt)` once it is mined, or `on_receipt(None)` on timeout.
     """
-    if not eligible_applicants:
-        raise ValueError("Cannot create a batch with no applicants.")
-
-    print(f"Starting batch creation for {len(eligible_applicants)} applicants...")
-
-    # 1. Prepare leaves from applicant data
-    leaves = []
-    for app in eligible_applicants:
-        # Convert DB datetime to Unix timestamp
-        timestamp = int(app.created_at.timestamp())
-        
-        leaf = create_applicant_leaf(
-            app.applicant_hash,
-            app.file_hash,
-            timestamp,
-            app.wilaya_code
-        )
-        leaves.append(leaf)
-
-    # 2. Build the Merkle Tree
-    tree = MerkleTree(leaves)
-    merkle_root = tree.get_root()
-    batch_size = len(leaves)
 
-    print(f"  - Calculated Merkle Root: {merkle_root.hex()}")
+    def __init__(self, poll_interval: float = RECEIPT_POLL_INTERVAL, timeout: float = RECEIPT_TIMEOUT):
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def watch(self, tx_hash: str, on_receipt):
+        with self._lock:
+            self._pending[tx_hash] = (time.monotonic() + self.timeout, on_receipt)
+            self._stopped.clear()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="receipt-watcher", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                pending = list(self._pending.items())
+            if not pending:
+                with self._lock:
+                    if not self._pending:
+                        self._thread = None
+                        return
+                continue
+
+            # Every pending receipt in one JSON-RPC batch per round.
+            try:
+                receipts = get_client().rpc.raw_batch(*[("eth_getTransactionReceipt", [tx_hash]) for tx_hash, _ in pending])
+            except Exception as e:
+                # RPC trouble says nothing about the transactions; try again next round.
+                logging.warning(f"Receipt lookup for {len(pending)} transactions failed: {e}")
+                pending, receipts = [], []
+
+            for (tx_hash, (deadline, on_receipt)), receipt in zip(pending, receipts):
+                if receipt is None and time.monotonic() < deadline:
+                    # Still in the mempool.
+                    continue
+                if receipt is not None:
+                    try:
+                        # The batch returns raw JSON; fetch the mined receipt formatted, once.
+                        receipt = get_client().w3.eth.get_transaction_receipt(tx_hash)
+                    except Exception as e:
+                        logging.warning(f"Receipt lookup for {tx_hash} failed: {e}")
+                        continue
+                with self._lock:
+                    self._pending.pop(tx_hash, None)
+                try:
+                    on_receipt(receipt)
+                except Exception as e:
+                    logging.error(f"Receipt callback for {tx_hash} failed: {e}")
+
+            self._stopped.wait(self.poll_interval)
+
+
+def rebroadcast(raw_transaction: str):
+    """
+    Sends an already signed transaction again, e.g. one recorded just before a
+    crash. A node that already has it (in the mempool or mined) rejects it, which
+    is logged and otherwise ignored.
+    """
+    try:
+        get_client().w3.eth.send_raw_transaction(bytes.fromhex(raw_transaction.removeprefix("0x")))
+    except Exception as e:
+        logging.info(f"Rebroadcast not accepted: {e}")
 
-    # 3. Build and send the transaction
-    function_call = batch_registry_contract.functions.commitBatch(
-        merkle_root,
-        wilaya_code,
-        batch_size,
-        metadata
-    )
 
-    nonce = w3.eth.get_transaction_count(operator_account.address)
-    tx = function_call.build_transaction({
-        "from": operator_account.address,
-        "nonce": nonce,
-        "maxPriorityFeePerGas": w3.to_wei(2, "gwei"),
-        "maxFeePerGas": w3.to_wei(60, "gwei"),
-        "chainId": w3.eth.chain_id,
-    })
-
-    # Estimate gas and add a 20% buffer
-    gas_estimate = w3.eth.estimate_gas(tx)
-    tx['gas'] = int(gas_estimate * 1.2)
-    
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=operator_account.key)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-
-    print(f"  - Transaction sent! Hash: {tx_hash.hex()}")
-    
-    # Wait for the transaction to be confirmed
-    w3.eth.wait_for_transaction_receipt(tx_hash, timeout=180)
-    print(f"  - Transaction confirmed on-chain.")
+nonce_manager = NonceManager()
+receipt_watcher = ReceiptWatcher()
+
+
+def submit_batch_root(merkle_root: bytes, wilaya_code: int, batch_size: int, metadata: bytes,
+                      nonce_floor: int = 0, on_signed=None) -> str:
+    """
+    Signs and sends `commitBatch` for an already computed root without waiting for
+    it to be mined. The nonce comes from the local `nonce_manager`, at least
+    `nonce_floor`.
+
+    `on_signed(tx_hash, raw_transaction, nonce)` is called between signing and
+    sending, so the caller can record the transaction before it can be mined.
 
+    Returns:
+        The transaction hash as a hex string.
+    """
+    print(f"  - Calculated Merkle Root: {merkle_root.hex()}")
+    client = get_client()
+    w3 = client.w3
+    operator_account = client.operator_account
+    contract = client.batch_registry_contract
+
+    # The commitBatch call; nonce, gas and fees are added below.
+    call = {
+        "from": operator_account.address,
+        "to": contract.address,
+        "data": contract.encode_abi("commitBatch", args=[merkle_root, wilaya_code, batch_size, metadata]),
+    }
+
+    with tracing.span("tx.nonce"):
+        nonce = nonce_manager.allocate(nonce_floor)
+    try:
+        # The gas estimate and, about once a block, the fee history share one round trip.
+        with tracing.span("tx.estimate_gas"):
+            calls = [(w3.eth.estimate_gas, (call,))]
+            if client.rpc.fees_stale():
+                calls.append(client.rpc.fee_history_call())
+            results = client.rpc.batch(*calls)
+        fees = client.rpc.update_fees(results[1]) if len(results) > 1 else client.rpc.fees()
+
+        with tracing.span("tx.build", **{"tx.nonce": nonce}):
+            tx = {
+                **call,
+                "nonce": nonce,
+                "chainId": client.rpc.chain_id,
+                # Estimated gas plus a 20% buffer
+                "gas": int(results[0] * 1.2),
+                **fees,
+            }
+
+        with tracing.span("tx.sign"):
+            signed_tx = w3.eth.account.sign_transaction(tx, private_key=operator_account.key)
+        if on_signed is not None:
+            on_signed(signed_tx.hash.hex(), signed_tx.raw_transaction.hex(), nonce)
+        with tracing.span("tx.send"):
+            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    except Exception:
+        # The allocated nonce was never used; resync before the next submission.
+        nonce_manager.reset()
+        raise
+
+    tracing.set_attributes(**{"tx.hash": tx_hash.hex(), "tx.nonce": nonce, "tx.gas_limit": tx["gas"], "tx.max_fee": tx["maxFeePerGas"]})
+    print(f"  - Transaction sent! Hash: {tx_hash.hex()} (nonce {nonce})")
     return tx_hash.hex()
 
@@ -0,0 +1,177 @@
+# backend/services/hashing.py
+
+"""
+Keccak-256 for the whole backend: identifier hashing, applicant leaves and Merkle
+nodes all go through here instead of `Web3.keccak` / `Web3.solidity_keccak`, which
+pay for type dispatch and HexBytes wrapping on every call.
+
+The implementation is picked once at import time from `KECCAK_BACKEND`
+("auto", "pysha3", "pycryptodome" or "eth-hash"). Outputs are identical whichever
+backend is used. Compare them on this machine with:
+
+    python -m backend.services.hashing --benchmark
+"""
+
+import os
+import time
+import argparse
+from typing import Callable, Dict, Iterable, List
+
+# Every Merkle node and leaf is a 32-byte keccak digest.
+NODE_SIZE = 32
+
+# Fastest first; "auto" takes the first one that imports.
+_PREFERENCE = ["pysha3", "pycryptodome", "eth-hash"]
+
+
+def _load_pysha3() -> Callable[[bytes], bytes]:
+    import sha3
+    keccak_256 = sha3.keccak_256
+    return lambda data: keccak_256(data).digest()
+
+
+def _load_pycryptodome() -> Callable[[bytes], bytes]:
+    from Crypto.Hash import keccak as _keccak
+    new = _keccak.new
+    return lambda data: new(digest_bits=256, data=data).digest()
+
+
+def _load_eth_hash() -> Callable[[bytes], bytes]:
+    from eth_hash.auto import keccak as _keccak
+    return _keccak
+
+
+_LOADERS = {
+    "pysha3": _load_pysha3,
+    "pycryptodome": _load_pycryptodome,
+    "eth-hash": _load_eth_hash,
+}
+
+
+def available_backends() -> Dict[str, Callable[[bytes], bytes]]:
+    """Every backend that can be imported here, keyed by name."""
+    backends = {}
+    for name in _PREFERENCE:
+        try:
+            backends[name] = _LOADERS[name]()
+        except ImportError:
+            continue
+    return backends
+
+
+def set_backend(name: str = "auto") -> str:
+    """
+    Switches the keccak implementation used by this module.
+
+    Returns:
+        The name of the backend now in use.
+    """
+    global BACKEND, _keccak
+    if name == "auto":
+        for candidate in _PREFERENCE:
+            try:
+                _keccak = _LOADERS[candidate]()
+            except ImportError:
+                continue
+            BACKEND = candidate
+            return BACKEND
+        raise ImportError("No keccak backend available; install eth-hash[pycryptodome].")
+
+    if name not in _LOADERS:
+        raise ValueError(f"Unknown keccak backend {name!r}; choose from {', '.join(_LOADERS)} or 'auto'.")
+    _keccak = _LOADERS[name]()
+    BACKEND = name
+    return BACKEND
+
+
+BACKEND = None
+_keccak = None
+set_backend(os.getenv("KECCAK_BACKEND", "auto"))
+
+
+# --- Single-value API ---
+
+def keccak256(data: bytes) -> bytes:
+    """Raw keccak-256 of `data`."""
+    return _keccak(data)
+
+
+def pack_leaf(applicant_id_hash: str, file_hash: str, submission_ts_unix: int, wilaya_code: int) -> bytes:
+    """`abi.encodePacked(bytes32, bytes32, uint64, uint16)` of an applicant's leaf fields."""
+    applicant_id = bytes.fromhex(applicant_id_hash.replace("0x", ""))
+    file_id = bytes.fromhex(file_hash.replace("0x", ""))
+    if len(applicant_id) != 32 or len(file_id) != 32:
+        raise ValueError("Applicant and file hashes must be 32 bytes.")
+    return applicant_id + file_id + submission_ts_unix.to_bytes(8, "big") + wilaya_code.to_bytes(2, "big")
+
+
+# --- Batch API ---
+
+def hash_identifiers(identifiers: Iterable[str]) -> List[str]:
+    """Hex keccak-256 of many UTF-8 identifiers (same output as `Web3.keccak(text=...).hex()`)."""
+    keccak = _keccak
+    return [keccak(identifier.encode("utf-8")).hex() for identifier in identifiers]
+
+
+def encode_leaves(rows: Iterable[tuple]) -> List[bytes]:
+    """
+    Leaf hashes for many `(applicant_hash, file_hash, submission_ts_unix, wilaya_code)`
+    tuples (same output as `Web3.solidity_keccak` over the packed fields).
+    """
+    keccak = _keccak
+    return [keccak(pack_leaf(*row)) for row in rows]
+
+
+def keccak_pairs(level: bytes) -> bytes:
+    """
+    Hashes a packed level of 32-byte nodes pairwise into the packed parent level.
+
+    If the level holds an odd number of nodes, the last one is paired with itself,
+    which matches the padding rule of the original MerkleTree.
+    """
+    keccak = _keccak
+    pair = 2 * NODE_SIZE
+    full = len(level) - len(level) % pair
+    parents = b"".join(map(keccak, (level[i:i + pair] for i in range(0, full, pair))))
+    if full != len(level):
+        last = level[full:]
+        parents += keccak(last + last)
+    return parents
+
+
+# --- Benchmark ---
+
+def benchmark(count: int = 200_000) -> List[dict]:
+    """
+    Times every available backend on `count` single hashes of 64-byte inputs (one
+    Merkle node pair each), and checks they all agree.
+    """
+    payload = os.urandom(count * 2 * NODE_SIZE)
+    results = []
+    reference = None
+    for name, keccak in available_backends().items():
+        start = time.perf_counter()
+        digest = b"".join(map(keccak, (payload[i:i + 64] for i in range(0, len(payload), 64))))
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = digest
+        elif digest != reference:
+            raise AssertionError(f"Backend {name} disagrees with the others.")
+        results.append({"backend": name, "hashes": count, "seconds": elapsed, "hashes_per_second": count / elapsed})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keccak backend information and benchmark.")
+    parser.add_argument("--benchmark", action="store_true", help="Time every available backend.")
+    parser.add_argument("--count", type=int, default=200_000, help="Hashes per backend.")
+    args = parser.parse_args()
+
+    print(f"Active backend: {BACKEND}")
+    if args.benchmark:
+        for result in sorted(benchmark(args.count), key=lambda r: -r["hashes_per_second"]):
+            print(f"  {result['backend']:<13} {result['hashes_per_second']:>12,.0f} hashes/s")
+
+
+if __name__ == "__main__":
+    main()
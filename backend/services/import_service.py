@@ -0,0 +1,157 @@
+# backend/services/import_service.py
+
+import io
+import os
+import csv
+import json
+import secrets
+from typing import Iterator, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from .. import models, schemas, security
+
+# Valid rows hashed, deduplicated and inserted per round trip.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Rejected rows reported back individually; the rest are only counted.
+MAX_REPORTED_ERRORS = 100
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+
+def detect_format(content_type: str = "", filename: str = "") -> str:
+    """Picks NDJSON or CSV from a MIME type or a file extension (NDJSON by default)."""
+    if "csv" in (content_type or "") or (filename or "").lower().endswith(".csv"):
+        return CSV
+    return NDJSON
+
+
+def iter_records(text: io.TextIOBase, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Yields `(line_number, record)` pairs from an NDJSON or CSV stream. A record that
+    cannot be parsed is yielded as the exception instead of a dict.
+    """
+    if fmt == CSV:
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+def iter_national_ids(text: io.TextIOBase, fmt: str) -> Iterator[str]:
+    """
+    Yields the `national_id` of every record in an NDJSON or CSV stream (the import
+    format; other fields are ignored). Records without one are skipped.
+    """
+    for _, record in iter_records(text, fmt):
+        if isinstance(record, dict) and isinstance(record.get("national_id"), str) and record["national_id"]:
+            yield record["national_id"]
+
+
+def _insert_ignoring_duplicates(db: Session, rows: list) -> int:
+    """
+    Multi-row INSERT that leaves rows racing with concurrent registrations alone.
+
+    Returns:
+        The number of rows actually inserted: on PostgreSQL and SQLite the rows
+        `RETURNING` hands back, which leaves out those skipped on conflict.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+        db.execute(insert(models.Applicant), rows)
+        return len(rows)
+    statement = (
+        insert(models.Applicant)
+        .on_conflict_do_nothing(index_elements=["applicant_hash"])
+        .returning(models.Applicant.applicant_hash)
+    )
+    return len(db.execute(statement, rows).all())
+
+
+def _import_chunk(db: Session, chunk: list, seen: set, result: dict):
+    hashes = security.hash_identifiers(applicant.national_id for applicant in chunk)
+
+    # One set-based lookup for the whole chunk instead of a SELECT per applicant.
+    existing = {
+        row.applicant_hash
+        for row in db.query(models.Applicant.applicant_hash).filter(models.Applicant.applicant_hash.in_(set(hashes)))
+    }
+
+    rows = []
+    for applicant, applicant_hash in zip(chunk, hashes):
+        if applicant_hash in existing or applicant_hash in seen:
+            result["duplicates"] += 1
+            continue
+        seen.add(applicant_hash)
+        rows.append({
+            "applicant_hash": applicant_hash,
+            "full_name": applicant.full_name,
+            "address": applicant.address,
+            "wilaya_code": applicant.wilaya_code,
+            # Mock file hash, as in the single-applicant endpoint.
+            "file_hash": "0x" + secrets.token_hex(32),
+            "status": models.ApplicantStatus.PENDING,
+        })
+
+    if rows:
+        inserted = _insert_ignoring_duplicates(db, rows)
+        db.commit()
+        result["inserted"] += inserted
+        # Registered concurrently, between the lookup above and the insert.
+        result["duplicates"] += len(rows) - inserted
+
+
+def import_applicants(db: Session, text: io.TextIOBase, fmt: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Streams applicants from an NDJSON or CSV export into the database.
+
+    Rows are validated with `schemas.ApplicantCreate`, hashed and deduplicated both
+    within the upload and against the database, then inserted in chunks of
+    `chunk_size`, each chunk in its own transaction.
+
+    Returns:
+        A dict with the `inserted`, `duplicates` and `rejected` counts, plus the first
+        `MAX_REPORTED_ERRORS` rejections as `{"line", "detail"}` entries.
+    """
+    result = {"inserted": 0, "duplicates": 0, "rejected": 0, "errors": []}
+    seen = set()
+    chunk = []
+
+    for line_number, record in iter_records(text, fmt):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("Each record must be an object.")
+            applicant = schemas.ApplicantCreate(**record)
+            if not applicant.national_id:
+                raise ValueError("Identifier cannot be empty.")
+            chunk.append(applicant)
+        except (ValidationError, ValueError, TypeError) as e:
+            result["rejected"] += 1
+            if len(result["errors"]) < MAX_REPORTED_ERRORS:
+                result["errors"].append({"line": line_number, "detail": str(e)})
+            continue
+
+        if len(chunk) == chunk_size:
+            _import_chunk(db, chunk, seen, result)
+            chunk = []
+
+    if chunk:
+        _import_chunk(db, chunk, seen, result)
+    return result
@@ -0,0 +1,250 @@
+# backend/services/merkle_queue.py
+
+import os
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from .merkle_service import IncrementalMerkleRoot, applicant_leaves
+
+# A queue epoch is sealed into a snapshot once it holds this many leaves, so no
+# snapshot is bigger than one batch (same setting as batch_service.BATCH_MAX_SIZE).
+QUEUE_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "100000"))
+# Unqueued eligible applicants read and appended per round trip.
+QUEUE_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "5000"))
+
+# Columns a leaf is built from.
+_LEAF_COLUMNS = (
+    models.Applicant.id,
+    models.Applicant.applicant_hash,
+    models.Applicant.file_hash,
+    models.Applicant.created_at,
+    models.Applicant.wilaya_code,
+    models.Applicant.leaf_hash,
+)
+
+_applicants = models.Applicant.__table__
+_SET_SLOT = (
+    update(_applicants)
+    .where(_applicants.c.id == bindparam("applicant_id"))
+    .values(queue_epoch=bindparam("slot_epoch"), queue_position=bindparam("slot_position"), leaf_hash=bindparam("slot_leaf"))
+)
+
+
+def _lock_queue(db: Session, wilaya_code: int) -> models.MerkleQueue:
+    """The wilaya's queue row, locked for the rest of the transaction (created on first use)."""
+    query = db.query(models.MerkleQueue).filter(models.MerkleQueue.wilaya_code == wilaya_code).with_for_update()
+    queue = query.first()
+    if queue is not None:
+        return queue
+    try:
+        with db.begin_nested():
+            db.add(models.MerkleQueue(wilaya_code=wilaya_code, epoch=0, leaf_count=0, frontier=b""))
+    except IntegrityError:
+        # Another process created it first.
+        pass
+    return query.first()
+
+
+def _seal(db: Session, queue: models.MerkleQueue, accumulator: IncrementalMerkleRoot) -> models.QueueSnapshot:
+    """Freezes the open epoch into a snapshot and opens the next, empty one."""
+    snapshot = models.QueueSnapshot(
+        wilaya_code=queue.wilaya_code,
+        epoch=queue.epoch,
+        merkle_root=accumulator.get_root().hex(),
+        batch_size=len(accumulator),
+    )
+    db.add(snapshot)
+    queue.epoch += 1
+    queue.leaf_count = 0
+    queue.frontier = b""
+    return snapshot
+
+
+def append(db: Session, rows, max_size: int = QUEUE_MAX_SIZE) -> int:
+    """
+    Appends applicants to their wilaya queues, in the order given, and records each
+    one's `queue_epoch` / `queue_position` and its `leaf_hash`, so the leaf is never
+    hashed again. Each leaf costs O(log n) hashing and nothing else is read. An epoch
+    reaching `max_size` leaves is sealed.
+
+    `rows` are applicant rows or tuples carrying `id`, `applicant_hash`, `file_hash`,
+    `created_at` and `wilaya_code`. The caller commits.
+
+    Returns:
+        The number of applicants appended.
+    """
+    by_wilaya = OrderedDict()
+    for row in rows:
+        by_wilaya.setdefault(row.wilaya_code, []).append(row)
+
+    # Queues are locked in wilaya order, so concurrent appends cannot deadlock.
+    for wilaya_code in sorted(by_wilaya):
+        wilaya_rows = by_wilaya[wilaya_code]
+        queue = _lock_queue(db, wilaya_code)
+        accumulator = IncrementalMerkleRoot.from_bytes(queue.leaf_count, queue.frontier)
+        slots = []
+        for row, leaf in zip(wilaya_rows, applicant_leaves(wilaya_rows)):
+            if len(accumulator) == max_size:
+                _seal(db, queue, accumulator)
+                accumulator = IncrementalMerkleRoot()
+            slots.append({"applicant_id": row.id, "slot_epoch": queue.epoch, "slot_position": len(accumulator), "slot_leaf": leaf})
+            accumulator.append(leaf)
+        queue.leaf_count = len(accumulator)
+        queue.frontier = accumulator.to_bytes()
+        db.execute(_SET_SLOT, slots)
+    db.flush()
+    return sum(len(wilaya_rows) for wilaya_rows in by_wilaya.values())
+
+
+def pending_query(
+    db: Session,
+    wilaya_code: Optional[int] = None,
+    applicant_ids: Optional[List[int]] = None,
+    applicant_hashes: Optional[List[str]] = None,
+    after_id: int = 0,
+    chunk_size: int = QUEUE_CHUNK_SIZE
+):
+    """The next `chunk_size` PENDING applicants matching all the given filters, after `after_id` in id order."""
+    filters = [models.Applicant.status == models.ApplicantStatus.PENDING, models.Applicant.id > after_id]
+    if wilaya_code is not None:
+        filters.append(models.Applicant.wilaya_code == wilaya_code)
+    if applicant_ids is not None:
+        filters.append(models.Applicant.id.in_(applicant_ids))
+    if applicant_hashes is not None:
+        filters.append(models.Applicant.applicant_hash.in_(applicant_hashes))
+    return db.query(*_LEAF_COLUMNS).filter(*filters).order_by(models.Applicant.id).limit(chunk_size)
+
+
+def mark_eligible_where(
+    db: Session,
+    wilaya_code: Optional[int] = None,
+    applicant_ids: Optional[List[int]] = None,
+    applicant_hashes: Optional[List[str]] = None,
+    max_size: int = QUEUE_MAX_SIZE,
+    chunk_size: int = QUEUE_CHUNK_SIZE
+) -> List[str]:
+    """
+    Moves every PENDING applicant matching all the given filters to ELIGIBLE and
+    appends it to its queue, storing its leaf. Works in chunks of `chunk_size`
+    applicants in id order: per chunk, one read, one `UPDATE ... WHERE id IN` and
+    one executemany of the queue slots. The caller commits.
+
+    Returns:
+        The hashes of the applicants that became eligible (e.g. to invalidate
+        cached statuses).
+    """
+    # Long id or hash lists are matched a slice at a time, to keep `IN` lists bounded.
+    if applicant_ids is not None and len(applicant_ids) > chunk_size:
+        return [
+            changed
+            for start in range(0, len(applicant_ids), chunk_size)
+            for changed in mark_eligible_where(db, wilaya_code, applicant_ids[start:start + chunk_size], applicant_hashes, max_size, chunk_size)
+        ]
+    if applicant_hashes is not None and len(applicant_hashes) > chunk_size:
+        return [
+            changed
+            for start in range(0, len(applicant_hashes), chunk_size)
+            for changed in mark_eligible_where(db, wilaya_code, applicant_ids, applicant_hashes[start:start + chunk_size], max_size, chunk_size)
+        ]
+
+    changed = []
+    last_id = 0
+    while True:
+        rows = pending_query(db, wilaya_code, applicant_ids, applicant_hashes, last_id, chunk_size).all()
+        if not rows:
+            return changed
+        db.query(models.Applicant).filter(models.Applicant.id.in_([row.id for row in rows])).update(
+            {models.Applicant.status: models.ApplicantStatus.ELIGIBLE}, synchronize_session=False
+        )
+        append(db, rows, max_size)
+        changed += [row.applicant_hash for row in rows]
+        last_id = rows[-1].id
+
+
+def unqueued_query(db: Session, wilaya_code: int, after_id: int = 0, chunk_size: int = QUEUE_CHUNK_SIZE):
+    """The next `chunk_size` eligible applicants of the wilaya not in its queue yet, after `after_id` in id order."""
+    return (
+        db.query(*_LEAF_COLUMNS)
+        .filter(
+            models.Applicant.status == models.ApplicantStatus.ELIGIBLE,
+            models.Applicant.wilaya_code == wilaya_code,
+            models.Applicant.queue_epoch.is_(None),
+            models.Applicant.id > after_id
+        )
+        .order_by(models.Applicant.id)
+        .limit(chunk_size)
+    )
+
+
+def append_unqueued(db: Session, wilaya_code: int, max_size: int = QUEUE_MAX_SIZE, chunk_size: int = QUEUE_CHUNK_SIZE) -> int:
+    """
+    Appends the wilaya's eligible applicants that are not in its queue yet (made
+    eligible before the queue existed, or outside `mark_eligible_where`), in id order.
+    """
+    appended = 0
+    last_id = 0
+    while True:
+        rows = unqueued_query(db, wilaya_code, last_id, chunk_size).all()
+        if not rows:
+            return appended
+        appended += append(db, rows, max_size)
+        last_id = rows[-1].id
+
+
+def current_root(db: Session, wilaya_code: int) -> Optional[bytes]:
+    """The root of the wilaya's open epoch, or None if it is empty. Reads one row."""
+    queue = db.query(models.MerkleQueue).filter(models.MerkleQueue.wilaya_code == wilaya_code).first()
+    if queue is None or queue.leaf_count == 0:
+        return None
+    return IncrementalMerkleRoot.from_bytes(queue.leaf_count, queue.frontier).get_root()
+
+
+def freeze(db: Session, wilaya_code: int) -> Optional[models.QueueSnapshot]:
+    """Seals the wilaya's open epoch, if it has any leaves. The caller commits."""
+    queue = _lock_queue(db, wilaya_code)
+    if queue.leaf_count == 0:
+        return None
+    accumulator = IncrementalMerkleRoot.from_bytes(queue.leaf_count, queue.frontier)
+    return _seal(db, queue, accumulator)
+
+
+def uncommitted_snapshots(db: Session, wilaya_code: int) -> List[models.QueueSnapshot]:
+    """
+    The wilaya's snapshots that still need a commit job: those without one, and
+    those whose job failed before its transaction was sent or reverted. A job that
+    timed out waiting for its receipt is not retried, since its transaction may
+    still be mined.
+    """
+    return (
+        db.query(models.QueueSnapshot)
+        .outerjoin(models.BatchJob, models.BatchJob.id == models.QueueSnapshot.job_id)
+        .filter(
+            models.QueueSnapshot.wilaya_code == wilaya_code,
+            or_(
+                models.QueueSnapshot.job_id.is_(None),
+                (models.BatchJob.status == models.BatchJobStatus.FAILED)
+                & (models.BatchJob.tx_hash.is_(None) | models.BatchJob.gas_used.isnot(None))
+            )
+        )
+        .order_by(models.QueueSnapshot.epoch)
+        .all()
+    )
+
+
+def claim_snapshot(db: Session, wilaya_code: int, epoch: int, job_id: Optional[int], previous_job_id: Optional[int]) -> bool:
+    """
+    Points a snapshot at a new job, unless another request already did. Returns
+    False if the snapshot was claimed concurrently.
+    """
+    current = models.QueueSnapshot.job_id.is_(None) if previous_job_id is None else models.QueueSnapshot.job_id == previous_job_id
+    claimed = db.query(models.QueueSnapshot).filter(
+        models.QueueSnapshot.wilaya_code == wilaya_code,
+        models.QueueSnapshot.epoch == epoch,
+        current
+    ).update({models.QueueSnapshot.job_id: job_id}, synchronize_session=False)
+    return bool(claimed)
@@ -1,63 +1,187 @@
-from web3 import Web3
+from .hashing import NODE_SIZE, keccak256, keccak_pairs, pack_leaf
+
+
+def _to_node(value) -> bytes:
+    node = bytes(value) if isinstance(value, (bytes, bytearray)) else bytes.fromhex(value.replace('0x', ''))
+    if len(node) != NODE_SIZE:
+        raise ValueError(f"Merkle nodes must be {NODE_SIZE} bytes, got {len(node)}")
+    return node
+
 
 class MerkleTree:
+    """
+    Merkle tree over 32-byte leaves.
+
+    Each level is kept as one packed `bytes` buffer with a 32-byte stride
+    (`levels[0]` holds the leaves, the last level holds the root). An odd level is
+    padded by pairing its last node with itself, without copying the level.
+    """
+
     def __init__(self, leaves, hash_alg='keccak_256'):
-        
-        # leaves expected as bytes-like objects
 
-        self.leaves = [bytes(l) if isinstance(l, (bytes, bytearray)) else bytes.fromhex(l.replace('0x','')) for l in leaves]
-        self.levels = []
+        # leaves expected as bytes-like objects or hex strings
+        self.levels = [b''.join(_to_node(l) for l in leaves)]
+        self._index = None
         self._build_tree()
 
     def _build_tree(self):
-        cur = self.leaves[:]
-        if not cur:
-            self.levels = [[b'']]
-            return
-        self.levels = [cur]
-        while len(cur) > 1:
-            if len(cur) % 2 == 1:
-                cur = cur + [cur[-1]]
-            nxt = []
-            for i in range(0, len(cur), 2):
-                a = cur[i]
-                b = cur[i+1]
-                node = Web3.keccak(a + b)
-                nxt.append(node)
-            cur = nxt
-            self.levels.insert(0, cur)
+        cur = self.levels[0]
+        while len(cur) > NODE_SIZE:
+            cur = keccak_pairs(cur)
+            self.levels.append(cur)
+
+    def __len__(self):
+        return len(self.levels[0]) // NODE_SIZE
+
+    @property
+    def depth(self):
+        """Number of sibling nodes in a proof."""
+        return len(self.levels) - 1
+
+    def level_size(self, level):
+        return len(self.levels[level]) // NODE_SIZE
+
+    def node(self, level, position):
+        start = position * NODE_SIZE
+        return self.levels[level][start:start + NODE_SIZE]
 
     def get_root(self):
-        root_level = self.levels[0]
-        return root_level[0] if root_level else b''
+        root_level = self.levels[-1]
+        return root_level[:NODE_SIZE] if root_level else b''
 
-    def get_proof(self, leaf):
-        target = bytes(leaf) if isinstance(leaf, (bytes, bytearray)) else bytes.fromhex(leaf.replace('0x',''))
+    def index_of(self, leaf):
+        """Offset of `leaf` in the tree (first occurrence), via a lazily built hash-to-index map."""
+        if self._index is None:
+            leaves = self.levels[0]
+            # Walk backwards so the first occurrence of a duplicate leaf wins.
+            self._index = {
+                leaves[i:i + NODE_SIZE]: i // NODE_SIZE
+                for i in range(len(leaves) - NODE_SIZE, -1, -NODE_SIZE)
+            }
         try:
-            index = self.leaves.index(target)
-        except ValueError:
+            return self._index[_to_node(leaf)]
+        except KeyError:
+            raise ValueError("Leaf not in tree")
+
+    def get_proof(self, leaf):
+        return self.get_proof_by_index(self.index_of(leaf))
+
+    def get_proof_by_index(self, index):
+        if not 0 <= index < len(self):
             raise ValueError("Leaf not in tree")
         proof = []
         idx = index
         # traverse from leaves up to root (skip root level)
-        for level in reversed(self.levels[1:]):
+        for level in range(self.depth):
             sibling_index = idx ^ 1
-            if sibling_index < len(level):
-                proof.append(level[sibling_index])
-            else:
-                proof.append(level[idx])
+            if sibling_index >= self.level_size(level):
+                # Odd level: the last node is paired with itself.
+                sibling_index = idx
+            proof.append(self.node(level, sibling_index))
             idx = idx // 2
         return proof
 
 
+class IncrementalMerkleRoot:
+    """
+    Computes the same root as `MerkleTree` from a stream of leaves while keeping only
+    an O(log n) frontier: `frontier[level]` holds the left node still waiting for its
+    right sibling at that level (bit `level` of the leaf count is set).
+    """
+
+    def __init__(self):
+        self.frontier = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, leaf):
+        node = _to_node(leaf)
+        level = 0
+        count = self.count
+        while count & 1:
+            node = keccak256(self.frontier[level] + node)
+            self.frontier[level] = None
+            count >>= 1
+            level += 1
+        if level == len(self.frontier):
+            self.frontier.append(node)
+        else:
+            self.frontier[level] = node
+        self.count += 1
+
+    def extend(self, leaves):
+        for leaf in leaves:
+            self.append(leaf)
+
+    def to_bytes(self):
+        """The pending frontier nodes, packed in level order (the count says which levels)."""
+        return b''.join(node for node in self.frontier if node is not None)
+
+    @classmethod
+    def from_bytes(cls, count, data):
+        """Restores an accumulator of `count` leaves from `to_bytes` output."""
+        accumulator = cls()
+        accumulator.count = count
+        offset = 0
+        for level in range(count.bit_length()):
+            if (count >> level) & 1:
+                accumulator.frontier.append(bytes(data[offset:offset + NODE_SIZE]))
+                offset += NODE_SIZE
+            else:
+                accumulator.frontier.append(None)
+        if offset != len(data):
+            raise ValueError(f"Frontier of {len(data)} bytes does not match a count of {count}")
+        return accumulator
+
+    def get_root(self):
+        if self.count == 0:
+            return b''
+        # Close the partial right edge of the tree, applying MerkleTree's padding rule:
+        # a level with an odd number of nodes pairs its last node with itself.
+        carry = None
+        level = 0
+        size = self.count
+        while size > 1:
+            pending = self.frontier[level] if (self.count >> level) & 1 else None
+            if pending is not None and carry is not None:
+                carry = keccak256(pending + carry)
+            elif pending is not None:
+                carry = keccak256(pending + pending)
+            elif carry is not None:
+                carry = keccak256(carry + carry)
+            size = (size + 1) // 2
+            level += 1
+        return carry if carry is not None else self.frontier[level]
+
+
 def create_applicant_leaf(applicant_id_hash, file_hash, submission_ts_unix, wilaya_code):
-    leaf_hash = Web3.solidity_keccak(
-        ['bytes32', 'bytes32', 'uint64', 'uint16'],
-        [
-        bytes.fromhex(applicant_id_hash.replace("0x", "")),
-        bytes.fromhex(file_hash.replace("0x", "")),
-        submission_ts_unix,
-        wilaya_code
-        ]
-    )
-    return leaf_hash
\ No newline at end of file
+    # keccak256(abi.encodePacked(bytes32, bytes32, uint64, uint16)), as Web3.solidity_keccak computed it.
+    leaf_hash = keccak256(pack_leaf(applicant_id_hash, file_hash, submission_ts_unix, wilaya_code))
+    return leaf_hash
+
+
+def applicant_leaves(applicants):
+    """
+    Lazily turns applicant rows (ORM objects or column tuples carrying `applicant_hash`,
+    `file_hash`, `created_at` and `wilaya_code`) into Merkle leaves.
+
+    Rows that also carry the `leaf_hash` stored when the applicant entered its queue
+    yield it as is, without hashing.
+    """
+    for app in applicants:
+        leaf_hash = getattr(app, "leaf_hash", None)
+        if leaf_hash is not None:
+            yield leaf_hash
+            continue
+
+        # Convert DB datetime to Unix timestamp
+        timestamp = int(app.created_at.timestamp())
+
+        yield create_applicant_leaf(
+            app.applicant_hash,
+            app.file_hash,
+            timestamp,
+            app.wilaya_code
+        )
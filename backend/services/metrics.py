@@ -0,0 +1,186 @@
+# backend/services/metrics.py
+
+"""
+Prometheus metrics shared by the API, the batch pipeline and the indexer.
+
+The API serves them on `GET /metrics`; the indexer on its own port
+(`INDEXER_METRICS_PORT`). With several API worker processes, point
+`PROMETHEUS_MULTIPROC_DIR` at an empty directory so every worker's samples are
+aggregated into one scrape.
+"""
+
+import os
+import time
+import contextvars
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# --- API ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "aadl_http_request_duration_seconds",
+    "API request latency, by route template.",
+    ["method", "route", "status"],
+)
+HTTP_DB_QUERIES = Histogram(
+    "aadl_http_db_queries_per_request",
+    "SQL statements executed while serving one API request.",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+
+# --- Batch pipeline ---
+
+MERKLE_BUILD_SECONDS = Histogram(
+    "aadl_merkle_build_duration_seconds",
+    "Time to hash a batch's leaves and build its Merkle root or tree.",
+    ["source"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+MERKLE_BATCH_SIZE = Histogram(
+    "aadl_merkle_batch_size_leaves",
+    "Leaves per Merkle tree built.",
+    ["source"],
+    buckets=(1, 10, 100, 1_000, 10_000, 50_000, 100_000, 250_000, 1_000_000),
+)
+RPC_REQUEST_SECONDS = Histogram(
+    "aadl_rpc_request_duration_seconds",
+    "JSON-RPC call latency, by RPC method.",
+    ["method"],
+)
+RPC_ERRORS = Counter(
+    "aadl_rpc_errors_total",
+    "JSON-RPC calls that raised or returned an error, by RPC method.",
+    ["method"],
+)
+COMMIT_GAS_USED = Histogram(
+    "aadl_commit_batch_gas_used",
+    "gasUsed of mined commitBatch transactions.",
+    buckets=(50_000, 75_000, 100_000, 150_000, 200_000, 300_000, 500_000, 1_000_000),
+)
+
+# --- Indexer ---
+
+INDEXER_HEAD_BLOCK = Gauge("aadl_indexer_head_block", "Latest chain block seen by the indexer.")
+INDEXER_CURSOR_BLOCK = Gauge("aadl_indexer_cursor_block", "Last block the indexer has fully committed.")
+INDEXER_LAG_BLOCKS = Gauge("aadl_indexer_lag_blocks", "Blocks between the chain head and the indexer cursor.")
+INDEXER_BATCHES = Counter("aadl_indexer_batches_indexed_total", "BatchCommitted events written to the database.")
+
+_indexer_position = {"head": None, "cursor": None}
+
+
+def set_indexer_position(head: int = None, cursor: int = None):
+    """Records the chain head and/or the committed cursor and updates the lag."""
+    if head is not None:
+        _indexer_position["head"] = head
+        INDEXER_HEAD_BLOCK.set(head)
+    if cursor is not None:
+        _indexer_position["cursor"] = cursor
+        INDEXER_CURSOR_BLOCK.set(cursor)
+    if _indexer_position["head"] is not None and _indexer_position["cursor"] is not None:
+        INDEXER_LAG_BLOCKS.set(max(0, _indexer_position["head"] - _indexer_position["cursor"]))
+
+
+# --- DB queries per request ---
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def _count_query(*_):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+# Every engine, sync or async (an AsyncEngine runs on a sync Engine underneath).
+event.listen(Engine, "before_cursor_execute", _count_query)
+
+
+def start_query_count() -> list:
+    """
+    Starts counting the SQL statements of the current request. The returned one-item
+    list is shared with the threads and tasks the request spawns, and holds the count.
+    """
+    counter = [0]
+    _request_queries.set(counter)
+    return counter
+
+
+# --- RPC ---
+
+_rpc_middleware = None
+
+
+def instrument_web3(w3):
+    """Adds a middleware timing every JSON-RPC call `w3` makes, labelled by method (batches as "batch")."""
+    global _rpc_middleware
+    if _rpc_middleware is None:
+        from web3.middleware import Web3Middleware
+
+        class RPCMetricsMiddleware(Web3Middleware):
+            def wrap_make_request(self, make_request):
+                def middleware(method, params):
+                    start = time.perf_counter()
+                    try:
+                        response = make_request(method, params)
+                    except Exception:
+                        RPC_ERRORS.labels(method).inc()
+                        raise
+                    finally:
+                        RPC_REQUEST_SECONDS.labels(method).observe(time.perf_counter() - start)
+                    if isinstance(response, dict) and response.get("error"):
+                        RPC_ERRORS.labels(method).inc()
+                    return response
+                return middleware
+
+            def wrap_make_batch_request(self, make_batch_request):
+                # A JSON-RPC batch is one round trip, timed under the method "batch".
+                def middleware(requests_info):
+                    start = time.perf_counter()
+                    try:
+                        return make_batch_request(requests_info)
+                    except Exception:
+                        RPC_ERRORS.labels("batch").inc()
+                        raise
+                    finally:
+                        RPC_REQUEST_SECONDS.labels("batch").observe(time.perf_counter() - start)
+                return middleware
+
+        _rpc_middleware = RPCMetricsMiddleware
+    w3.middleware_onion.add(_rpc_middleware, name="metrics")
+    return w3
+
+
+# --- Status cache ---
+
+class StatusCacheCollector:
+    """Exports a `StatusCache`'s counters at scrape time."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        yield GaugeMetricFamily("aadl_status_cache_entries", "Entries in this process's status cache.", value=stats["size"])
+        for name in ("hits", "shared_hits", "misses", "evictions"):
+            yield CounterMetricFamily(f"aadl_status_cache_{name}", f"Status cache {name.replace('_', ' ')}.", value=stats[name])
+
+
+def register_status_cache(cache):
+    REGISTRY.register(StatusCacheCollector(cache))
+
+
+# --- Exposition ---
+
+def render() -> bytes:
+    """The scrape payload, aggregated across processes when `PROMETHEUS_MULTIPROC_DIR` is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
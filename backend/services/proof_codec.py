@@ -0,0 +1,194 @@
+# backend/services/proof_codec.py
+
+"""
+Compact encodings of Merkle proofs, for clients that ask for them with `Accept`.
+
+Single proof (`PROOF_MEDIA_TYPE`)::
+
+    version   1 byte   (1)
+    depth     1 byte   number of sibling nodes
+    path      ceil(depth / 8) bytes, little-endian: bit l is set when the proven
+              node is the right child at level l (the leaf index, in binary)
+    nodes     depth * 32 bytes, leaf level first
+
+For an aggregated batch the wilaya path and the top tree path are one proof: the
+path bitmap is `offset + (wilaya_index << len(merkle_proof))`, and the proof leads
+straight to the committed root.
+
+Multi-proof (`MULTIPROOF_MEDIA_TYPE`), the leaves of one tree and the nodes they
+cannot rebuild themselves, each node once::
+
+    version     1 byte   (1)
+    leaf_count  4 bytes  big-endian, leaves in the tree
+    count       4 bytes  big-endian, leaves proven
+    offsets     count * 4 bytes, big-endian, ascending
+    leaves      count * 32 bytes
+    nodes       32-byte nodes in `multiproof_positions` order, to the end
+
+`process_proof` and `process_multiproof` are reference verifiers.
+"""
+
+import struct
+from typing import Iterable, List, Tuple
+
+from .hashing import NODE_SIZE, keccak256
+
+PROOF_MEDIA_TYPE = "application/vnd.aadl-on.proof"
+MULTIPROOF_MEDIA_TYPE = "application/vnd.aadl-on.multiproof"
+FORMAT_VERSION = 1
+
+
+def prefers(accept: str, media_type: str, default: str = "application/json") -> bool:
+    """
+    True when the `Accept` header ranks `media_type` at least as high as
+    `default` (or `*/*`). A missing header means `default`.
+    """
+    weights = {}
+    for item in (accept or "").split(","):
+        fields = [field.strip() for field in item.split(";")]
+        if not fields[0]:
+            continue
+        quality = 1.0
+        for field in fields[1:]:
+            if field.startswith("q="):
+                try:
+                    quality = float(field[2:])
+                except ValueError:
+                    quality = 0.0
+        weights[fields[0].lower()] = quality
+    wanted = weights.get(media_type, 0.0)
+    return wanted > 0 and wanted >= weights.get(default, weights.get("*/*", 0.0))
+
+
+def etag(merkle_root: str, variant: str) -> str:
+    """
+    An entity tag for a proof of the batch with `merkle_root`. Batches are
+    immutable once committed, so the root and the representation (`variant`)
+    identify the body.
+    """
+    return f'"{merkle_root}.{variant}"'
+
+
+def etag_matches(if_none_match: str, tag: str) -> bool:
+    """Whether an `If-None-Match` header already names `tag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+def encode_proof(nodes: List[bytes], index: int) -> bytes:
+    """Packs a proof of the leaf at `index`; see the module docstring for the layout."""
+    depth = len(nodes)
+    if depth > 255:
+        raise ValueError("Proofs deeper than 255 levels cannot be encoded")
+    path = index.to_bytes((depth + 7) // 8, "little")
+    return bytes((FORMAT_VERSION, depth)) + path + b"".join(nodes)
+
+
+def decode_proof(data: bytes) -> Tuple[List[bytes], int]:
+    """Inverse of `encode_proof`: `(nodes, index)`."""
+    if len(data) < 2 or data[0] != FORMAT_VERSION:
+        raise ValueError("Not a version 1 proof")
+    depth = data[1]
+    path_size = (depth + 7) // 8
+    nodes = data[2 + path_size:]
+    if len(nodes) != depth * NODE_SIZE:
+        raise ValueError("Truncated proof")
+    index = int.from_bytes(data[2:2 + path_size], "little")
+    return [nodes[i:i + NODE_SIZE] for i in range(0, len(nodes), NODE_SIZE)], index
+
+
+def process_proof(leaf: bytes, nodes: List[bytes], index: int) -> bytes:
+    """The root a proof leads to from `leaf`."""
+    node = leaf
+    for sibling in nodes:
+        node = keccak256(sibling + node) if index & 1 else keccak256(node + sibling)
+        index >>= 1
+    return node
+
+
+def _level_sizes(leaf_count: int) -> List[int]:
+    sizes = [leaf_count]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def multiproof_positions(leaf_count: int, offsets: Iterable[int]) -> List[Tuple[int, int]]:
+    """
+    The `(level, position)` of every node a multi-proof of `offsets` carries:
+    the siblings on the leaves' paths that are not themselves on a path, level by
+    level. A last node paired with itself needs no sibling.
+    """
+    known = sorted(set(offsets))
+    if known and not (0 <= known[0] and known[-1] < leaf_count):
+        raise ValueError("Offset outside the tree")
+    positions = []
+    for level, size in enumerate(_level_sizes(leaf_count)[:-1]):
+        present = set(known)
+        for position in known:
+            sibling = position ^ 1
+            if sibling < size and sibling not in present:
+                positions.append((level, sibling))
+        known = sorted({position >> 1 for position in known})
+    return positions
+
+
+def _check_offsets(leaf_count: int, offsets: List[int]) -> None:
+    if any(later <= earlier for earlier, later in zip(offsets, offsets[1:])):
+        raise ValueError("Offsets must be ascending and distinct")
+    if offsets and not (0 <= offsets[0] and offsets[-1] < leaf_count):
+        raise ValueError("Offset outside the tree")
+
+
+def encode_multiproof(leaf_count: int, offsets: List[int], leaves: List[bytes], nodes: List[bytes]) -> bytes:
+    """Packs a multi-proof; `offsets` ascending and `nodes` in `multiproof_positions` order."""
+    header = struct.pack(f">BII{len(offsets)}I", FORMAT_VERSION, leaf_count, len(offsets), *offsets)
+    return header + b"".join(leaves) + b"".join(nodes)
+
+
+def decode_multiproof(data: bytes) -> Tuple[int, List[int], List[bytes], List[bytes]]:
+    """Inverse of `encode_multiproof`: `(leaf_count, offsets, leaves, nodes)`."""
+    if len(data) < 9 or data[0] != FORMAT_VERSION:
+        raise ValueError("Not a version 1 multi-proof")
+    leaf_count, count = struct.unpack_from(">II", data, 1)
+    if len(data) < 9 + 4 * count:
+        raise ValueError("Truncated multi-proof")
+    offsets = list(struct.unpack_from(f">{count}I", data, 9))
+    _check_offsets(leaf_count, offsets)
+    body = data[9 + 4 * count:]
+    if len(body) % NODE_SIZE or len(body) < count * NODE_SIZE:
+        raise ValueError("Truncated multi-proof")
+    chunks = [body[i:i + NODE_SIZE] for i in range(0, len(body), NODE_SIZE)]
+    return leaf_count, offsets, chunks[:count], chunks[count:]
+
+
+def process_multiproof(leaf_count: int, offsets: List[int], leaves: List[bytes], nodes: List[bytes]) -> bytes:
+    """The root a multi-proof leads to; raises ValueError if it is malformed."""
+    if len(offsets) != len(leaves) or not offsets:
+        raise ValueError("Every proven offset needs its leaf")
+    _check_offsets(leaf_count, offsets)
+    layer = dict(zip(offsets, leaves))
+    supplied = iter(nodes)
+    for level, size in enumerate(_level_sizes(leaf_count)[:-1]):
+        for position in sorted(layer):
+            sibling = position ^ 1
+            if sibling < size and sibling not in layer:
+                try:
+                    layer[sibling] = next(supplied)
+                except StopIteration:
+                    raise ValueError("Multi-proof is missing nodes")
+        parents = {}
+        for position in sorted(layer):
+            parent = position >> 1
+            if parent in parents:
+                continue
+            left = layer[parent * 2]
+            right = layer.get(parent * 2 + 1, left)
+            parents[parent] = keccak256(left + right)
+        layer = parents
+    if next(supplied, None) is not None:
+        raise ValueError("Multi-proof has unused nodes")
+    return layer[0]
@@ -0,0 +1,295 @@
+# backend/services/proof_files.py
+
+"""
+Immutable per-batch proof files, memory-mapped by the API.
+
+The indexer writes one file per committed batch. Every API worker maps the same
+files read-only, so the trees sit once in the OS page cache instead of once per
+worker, and a proof is offset arithmetic over slices of the mapping: no query,
+no tree rebuild, the same few microseconds whatever the batch size.
+
+Layout (little-endian)::
+
+    header      32 bytes  magic, part_count u32, top_depth u32,
+                          index_offset u64, index_count u32, flags u32
+                          (bit 0: aggregated batch)
+    part table  part_count * 48 bytes: position_base u32, leaf_count u32,
+                          data_offset u64, root 32 bytes
+    per part    its tree levels from the leaves up (root excluded), 32-byte
+                records; odd levels carry their padding node so every level
+                has an even size. Then its `top_depth` root proof nodes.
+    leaf index  index_count * 36 bytes, sorted: applicant hash 32 bytes,
+                leaf offset u32
+
+A plain batch has one part at position 0 and `top_depth` 0. The parts of an
+aggregated batch are its wilaya trees (see `models.AggregatePart`), whose root
+proofs lead to the batch root.
+
+Files are written to `PROOF_FILE_DIR`, shared by the indexer and the API. The
+database stays the source of truth: a missing file only means the proof is read
+from `merkle_nodes`. Backfill files for batches indexed before this existed with:
+
+    python -m backend.services.proof_files export
+"""
+
+import os
+import mmap
+import struct
+import bisect
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from .hashing import NODE_SIZE
+from .merkle_service import MerkleTree
+
+PROOF_FILE_DIR = os.getenv("PROOF_FILE_DIR", "proof_files")
+# Batches whose mapping stays open per process; a mapping costs address space,
+# not memory, so this only bounds open descriptors and map entries.
+PROOF_FILE_CACHE_SIZE = int(os.getenv("PROOF_FILE_CACHE_SIZE", "4096"))
+
+MAGIC = b"AADLPF\x00\x01"
+_HEADER = struct.Struct("<8sIIQII")
+_PART = struct.Struct("<IIQ32s")
+_INDEX_ENTRY = struct.Struct("<32sI")
+_AGGREGATED = 1
+
+
+def path_for(batch_id: int, directory: str = None) -> str:
+    return os.path.join(directory or PROOF_FILE_DIR, f"batch-{batch_id}.proofs")
+
+
+def _padded_level_sizes(leaf_count: int) -> List[int]:
+    sizes = []
+    while leaf_count > 1:
+        sizes.append(leaf_count + (leaf_count & 1))
+        leaf_count = (leaf_count + 1) // 2
+    return sizes
+
+
+def write(batch_id: int, parts: List[dict], aggregated: bool = False, directory: str = None) -> str:
+    """
+    Writes a batch's proof file atomically (a temporary file renamed into place).
+
+    Args:
+        parts: In part order, each with `position_base`, `tree` (a `MerkleTree`),
+            `root_proof` (nodes from its root to the batch root, `[]` for a plain
+            batch) and `applicant_hashes` (hex, in leaf order).
+        aggregated: Whether the parts are the wilaya trees of an aggregated batch.
+
+    Returns:
+        The file's path.
+    """
+    top_depth = len(parts[0]["root_proof"])
+    index = sorted(
+        (bytes.fromhex(applicant_hash), part["position_base"] + offset)
+        for part in parts
+        for offset, applicant_hash in enumerate(part["applicant_hashes"])
+    )
+
+    data_offset = _HEADER.size + _PART.size * len(parts)
+    table, blobs = [], []
+    for part in parts:
+        tree = part["tree"]
+        table.append(_PART.pack(part["position_base"], len(tree), data_offset, tree.get_root()))
+        for level in range(tree.depth):
+            blobs.append(tree.levels[level])
+            if tree.level_size(level) % 2 == 1:
+                blobs.append(tree.node(level, tree.level_size(level) - 1))
+        blobs.append(b"".join(part["root_proof"]))
+        data_offset += sum(_padded_level_sizes(len(tree))) * NODE_SIZE + top_depth * NODE_SIZE
+
+    header = _HEADER.pack(MAGIC, len(parts), top_depth, data_offset, len(index), _AGGREGATED if aggregated else 0)
+    path = path_for(batch_id, directory)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(header)
+        f.writelines(table)
+        f.writelines(blobs)
+        f.writelines(_INDEX_ENTRY.pack(applicant_hash, offset) for applicant_hash, offset in index)
+    os.replace(temporary, path)
+    return path
+
+
+class ProofFile:
+    """A read-only mapping of one batch's proof file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if len(self._map) < _HEADER.size or self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a proof file")
+        _, part_count, self.top_depth, self._index_offset, self.index_count, flags = _HEADER.unpack_from(self._map, 0)
+        # A short file (e.g. copied in part) would otherwise hand out short slices
+        # as proof nodes.
+        if len(self._map) != self._index_offset + self.index_count * _INDEX_ENTRY.size:
+            raise ValueError(f"{path} is truncated")
+        self.aggregated = bool(flags & _AGGREGATED)
+
+        self.bases, self.leaf_counts, self.roots, self._levels, self._root_proofs = [], [], [], [], []
+        for part in range(part_count):
+            base, leaf_count, data_offset, root = _PART.unpack_from(self._map, _HEADER.size + part * _PART.size)
+            starts = []
+            for size in _padded_level_sizes(leaf_count):
+                starts.append(data_offset)
+                data_offset += size * NODE_SIZE
+            self.bases.append(base)
+            self.leaf_counts.append(leaf_count)
+            self.roots.append(root)
+            self._levels.append(starts)
+            self._root_proofs.append(data_offset)
+            if data_offset + self.top_depth * NODE_SIZE > self._index_offset:
+                raise ValueError(f"{path} is truncated")
+
+    def _node(self, start: int) -> memoryview:
+        return self._view[start:start + NODE_SIZE]
+
+    def part_of(self, offset: int) -> int:
+        """The part holding the leaf at batch `offset`."""
+        return bisect.bisect_right(self.bases, offset) - 1
+
+    def proof(self, offset: int) -> dict:
+        """
+        The proof of the leaf at batch `offset` (as stored in `leaves.offset`):
+        `part`, `offset` within the part, the part `root`, `merkle_proof` up to
+        it and `root_proof` from it to the batch root. Nodes are zero-copy slices
+        of the mapping.
+        """
+        part = self.part_of(offset)
+        local = offset - self.bases[part]
+        if not 0 <= local < self.leaf_counts[part]:
+            raise ValueError(f"No leaf at offset {offset}")
+        nodes = [self._node(start + ((local >> level) ^ 1) * NODE_SIZE) for level, start in enumerate(self._levels[part])]
+        top = self._root_proofs[part]
+        return {
+            "part": part,
+            "offset": local,
+            "root": self.roots[part],
+            "merkle_proof": nodes,
+            "root_proof": [self._node(top + i * NODE_SIZE) for i in range(self.top_depth)],
+        }
+
+    def offset_of(self, applicant_hash: str) -> Optional[int]:
+        """Binary search of the leaf index: the batch offset of an applicant's leaf."""
+        key = bytes.fromhex(applicant_hash)
+        lo, hi = 0, self.index_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._index_offset + mid * _INDEX_ENTRY.size
+            if self._map[start:start + NODE_SIZE] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.index_count:
+            return None
+        found, offset = _INDEX_ENTRY.unpack_from(self._map, self._index_offset + lo * _INDEX_ENTRY.size)
+        return offset if found == key else None
+
+
+_open_files = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def open_batch(batch_id: int) -> Optional[ProofFile]:
+    """The batch's mapped proof file, or None if it has none. Mappings are kept open (LRU)."""
+    with _open_lock:
+        proof_file = _open_files.get(batch_id)
+        if proof_file is not None:
+            _open_files.move_to_end(batch_id)
+            return proof_file
+    try:
+        proof_file = ProofFile(path_for(batch_id))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring proof file of batch {batch_id}: {e}")
+        return None
+    with _open_lock:
+        _open_files[batch_id] = proof_file
+        # Dropped mappings are unmapped once no slice of them is referenced.
+        while len(_open_files) > PROOF_FILE_CACHE_SIZE:
+            _open_files.popitem(last=False)
+    return proof_file
+
+
+# --- Backfill ---
+
+def export_batch(db, batch_id: int, directory: str = None) -> Optional[str]:
+    """Rebuilds a committed batch's trees from its stored leaves and writes its file."""
+    from .. import models
+    from .proof_store import decode_path
+
+    leaves = (
+        db.query(models.Leaf.offset, models.Leaf.leaf_hash, models.Leaf.applicant_hash)
+        .filter(models.Leaf.batch_id == batch_id)
+        .order_by(models.Leaf.offset)
+        .all()
+    )
+    if not leaves:
+        return None
+    aggregate_parts = (
+        db.query(models.AggregatePart)
+        .filter(models.AggregatePart.batch_id == batch_id)
+        .order_by(models.AggregatePart.part_index)
+        .all()
+    )
+    listed = [(part.position_base, decode_path(part.root_proof)) for part in aggregate_parts] or [(0, [])]
+
+    parts = []
+    bases = [base for base, _ in listed]
+    for number, (base, root_proof) in enumerate(listed):
+        end = bases[number + 1] if number + 1 < len(bases) else None
+        rows = [row for row in leaves if row.offset >= base and (end is None or row.offset < end)]
+        parts.append({
+            "position_base": base,
+            "tree": MerkleTree([row.leaf_hash for row in rows]),
+            "root_proof": root_proof,
+            "applicant_hashes": [row.applicant_hash for row in rows],
+        })
+    return write(batch_id, parts, aggregated=bool(aggregate_parts), directory=directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-batch proof files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write the proof files of committed batches.")
+    export.add_argument("batch_ids", type=int, nargs="*", help="Batches to export (default: those without a file).")
+    export.add_argument("--directory", default=PROOF_FILE_DIR)
+    proof = commands.add_parser("proof", help="Print an applicant's proof from a batch file.")
+    proof.add_argument("batch_id", type=int)
+    proof.add_argument("applicant_hash")
+    args = parser.parse_args()
+
+    if args.command == "proof":
+        proof_file = open_batch(args.batch_id)
+        offset = proof_file.offset_of(args.applicant_hash) if proof_file else None
+        if offset is None:
+            raise SystemExit("Applicant not found in this batch's proof file.")
+        found = proof_file.proof(offset)
+        print(f"offset {found['offset']} in part {found['part']} (root {found['root'].hex()})")
+        for node in found["merkle_proof"] + found["root_proof"]:
+            print(node.hex())
+        return
+
+    from .. import models
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        batch_ids = args.batch_ids or [
+            row.id for row in db.query(models.Batch.id).order_by(models.Batch.id)
+            if not os.path.exists(path_for(row.id, args.directory))
+        ]
+        for batch_id in batch_ids:
+            path = export_batch(db, batch_id, args.directory)
+            print(f"batch {batch_id}: {path or 'no leaves, skipped'}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# backend/services/proof_store.py
+
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy import and_, bindparam, or_, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import bulk_insert
+from .merkle_service import MerkleTree
+
+# Nodes read per query: three bound parameters each, so a query stays under
+# SQLite's historical 999-parameter limit.
+NODE_LOOKUP_CHUNK_SIZE = 300
+
+
+def tree_rows(batch_id: int, tree: MerkleTree, position_base: int = 0) -> List[dict]:
+    """
+    The `merkle_nodes` rows of every level of `tree` except the root. The parts of
+    an aggregated batch pass their `position_base`; level `l` then starts at
+    position `position_base >> l`.
+    """
+    rows = []
+    for level in range(tree.depth):
+        size = tree.level_size(level)
+        start = position_base >> level
+        for position in range(size):
+            rows.append({"batch_id": batch_id, "level": level, "position": start + position, "node_hash": tree.node(level, position).hex()})
+        if size % 2 == 1:
+            # Store the padding node so every sibling lookup hits a real row.
+            rows.append({"batch_id": batch_id, "level": level, "position": start + size, "node_hash": tree.node(level, size - 1).hex()})
+    return rows
+
+
+def save_tree(db: Session, batch_id: int, tree: MerkleTree, position_base: int = 0) -> int:
+    """
+    Persists every level of `tree` (except the root) into the `merkle_nodes` table,
+    laid out as in `tree_rows`.
+
+    The rows are written in the session's transaction; committing is left to the caller
+    so the proof store lands atomically with the batch and its leaves.
+
+    Returns:
+        The number of node rows written.
+    """
+    return bulk_insert(db, models.MerkleNode, tree_rows(batch_id, tree, position_base))
+
+
+def proof_depth(leaf_count: int) -> int:
+    """Number of sibling nodes in a proof for a tree of `leaf_count` leaves."""
+    depth = 0
+    while leaf_count > 1:
+        leaf_count = (leaf_count + 1) // 2
+        depth += 1
+    return depth
+
+
+def part_bases(part_sizes: List[int]) -> List[int]:
+    """
+    Where each part of an aggregated batch starts in the batch's leaf and node
+    positions: part `k` starts at `k << d`, with `2 ** d` the smallest power of two
+    holding the largest part. Since every base is a multiple of `2 ** d`, a part's
+    nodes and siblings at any level stay inside its own position range.
+    """
+    shift = proof_depth(max(part_sizes, default=1))
+    return [index << shift for index in range(len(part_sizes))]
+
+
+def encode_path(nodes: List[bytes]) -> str:
+    """Packs proof nodes into one hex string (an `AggregatePart.root_proof`)."""
+    return b"".join(nodes).hex()
+
+
+def decode_path(packed: str) -> List[bytes]:
+    """Inverse of `encode_path`."""
+    data = bytes.fromhex(packed)
+    return [data[i:i + 32] for i in range(0, len(data), 32)]
+
+
+@lru_cache(maxsize=None)
+def nodes_statement(count: int):
+    """
+    Reads `count` stored nodes of a batch, each a full primary key lookup: an `OR`
+    of `batch_id = :batch_id AND level = :level_i AND position = :position_i` terms
+    (see `node_params`). A row-value `(level, position) IN (...)`, or `batch_id`
+    factored out of the `OR`, lets SQLite fall back to the `batch_id` prefix and
+    read every node of the batch. Cached per size, so a lookup skips rebuilding
+    and recompiling the statement.
+    """
+    node = models.MerkleNode
+    return select(node.level, node.position, node.node_hash).where(or_(*(
+        and_(
+            node.batch_id == bindparam("batch_id"),
+            node.level == bindparam(f"level_{i}"),
+            node.position == bindparam(f"position_{i}")
+        )
+        for i in range(count)
+    )))
+
+
+def node_params(batch_id: int, wanted: List[tuple]) -> dict:
+    """Bound parameters of `nodes_statement(len(wanted))`."""
+    params = {"batch_id": batch_id}
+    for i, (level, position) in enumerate(wanted):
+        params[f"level_{i}"] = level
+        params[f"position_{i}"] = position
+    return params
+
+
+def _read_nodes(db: Session, batch_id: int, wanted: List[tuple]) -> dict:
+    """`{(level, position): node}` for the stored nodes among `wanted`."""
+    found = {}
+    for start in range(0, len(wanted), NODE_LOOKUP_CHUNK_SIZE):
+        chunk = wanted[start:start + NODE_LOOKUP_CHUNK_SIZE]
+        rows = db.execute(nodes_statement(len(chunk)), node_params(batch_id, chunk))
+        found.update({(row.level, row.position): bytes.fromhex(row.node_hash) for row in rows})
+    return found
+
+
+def get_proof(db: Session, batch_id: int, offset: int, leaf_count: int, position_base: int = 0) -> Optional[List[bytes]]:
+    """
+    Reads the Merkle proof of the leaf at `offset`: one query of log2(n) primary
+    key lookups. For a part of an aggregated batch, `offset` and `leaf_count` are
+    within the part and `position_base` is where the part starts; the proof ends at
+    the part's root.
+
+    Returns:
+        The sibling nodes ordered from the leaf level up, or None if this batch has
+        no stored tree (e.g. it was indexed before the proof store existed).
+    """
+    depth = proof_depth(leaf_count)
+    if depth == 0:
+        # A single-leaf tree: the leaf is the root and the proof is empty.
+        return []
+
+    wanted = [(level, (position_base >> level) + ((offset >> level) ^ 1)) for level in range(depth)]
+    found = _read_nodes(db, batch_id, wanted)
+    if len(found) != depth:
+        return None
+    return [found[key] for key in wanted]
+
+
+def get_nodes(db: Session, batch_id: int, positions: List[tuple], position_base: int = 0) -> Optional[List[bytes]]:
+    """
+    Reads the nodes at `(level, position)` pairs (e.g. `proof_codec.multiproof_positions`),
+    positions taken within the tree starting at `position_base`, with primary key
+    lookups (one query per `NODE_LOOKUP_CHUNK_SIZE` nodes).
+
+    Returns:
+        The nodes in the order asked for, or None if any of them is not stored.
+    """
+    if not positions:
+        return []
+    wanted = [(level, (position_base >> level) + position) for level, position in positions]
+    found = _read_nodes(db, batch_id, wanted)
+    if len(found) != len(wanted):
+        return None
+    return [found[key] for key in wanted]
+
+
+def get_proofs(db: Session, batch_id: int, offsets: List[int], leaf_count: int, position_base: int = 0) -> Optional[dict]:
+    """
+    Batch form of `get_proof` for many leaves of one tree: the siblings of every
+    path, each read once (see `get_nodes`).
+
+    Returns:
+        `{offset: proof}`, or None if this batch has no stored tree.
+    """
+    depth = proof_depth(leaf_count)
+    paths = {offset: [(level, (offset >> level) ^ 1) for level in range(depth)] for offset in offsets}
+    wanted = sorted({position for path in paths.values() for position in path})
+    nodes = get_nodes(db, batch_id, wanted, position_base)
+    if nodes is None:
+        return None
+    found = dict(zip(wanted, nodes))
+    return {offset: [found[position] for position in path] for offset, path in paths.items()}
+
+
+def build_from_leaves(db: Session, batch_id: int) -> Optional[MerkleTree]:
+    """
+    One-off backfill for batches indexed before the proof store existed: rebuilds the
+    tree from the stored leaves and persists it. Returns None if the batch has no leaves.
+    """
+    leaf_hashes = [
+        row.leaf_hash
+        for row in db.query(models.Leaf.leaf_hash)
+        .filter(models.Leaf.batch_id == batch_id)
+        .order_by(models.Leaf.offset)
+    ]
+    if not leaf_hashes:
+        return None
+
+    tree = MerkleTree(leaf_hashes)
+    save_tree(db, batch_id, tree)
+    return tree
@@ -0,0 +1,232 @@
+# backend/services/rpc_client.py
+
+"""
+The JSON-RPC client shared by `blockchain_service` (the API's commit path) and
+the indexer.
+
+- HTTP endpoints go through one pooled keep-alive `requests` session per
+  process; `ws://` endpoints keep one socket open.
+- Independent calls are sent as one JSON-RPC batch (`RpcClient.batch`), e.g.
+  the gas estimate and fee history of a commit, or every pending receipt of a
+  polling round.
+- Values that never change for a node (the chain id, contract objects) are
+  fetched or built once.
+- Fees are derived from `eth_feeHistory`, cached for about a block.
+- Read-only calls (and `eth_feeHistory`) are retried with exponential backoff
+  by web3's HTTP provider; batches, which it does not retry, use `with_retry`.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from typing import Optional
+
+from . import metrics
+
+# Seconds before one HTTP request or socket read gives up.
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+# Keep-alive connections held per endpoint.
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "10"))
+# Attempts after the first, and the base of the exponential backoff (seconds).
+RPC_RETRIES = int(os.getenv("RPC_RETRIES", "5"))
+RPC_BACKOFF = float(os.getenv("RPC_BACKOFF", "0.25"))
+
+# Fee estimate: the next block's base fee (doubled, to survive several full
+# blocks) plus a priority fee at this percentile of the last blocks' tips.
+FEE_HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", "10"))
+FEE_PRIORITY_PERCENTILE = float(os.getenv("FEE_PRIORITY_PERCENTILE", "50"))
+FEE_CACHE_SECONDS = float(os.getenv("FEE_CACHE_SECONDS", "12"))
+FEE_MIN_PRIORITY_GWEI = float(os.getenv("FEE_MIN_PRIORITY_GWEI", "1"))
+# Ceiling on maxFeePerGas, so a fee spike cannot drain the operator account.
+FEE_MAX_GWEI = float(os.getenv("FEE_MAX_GWEI", "60"))
+
+GWEI = 10 ** 9
+
+
+def _retryable_errors() -> tuple:
+    import requests
+    return (requests.ConnectionError, requests.Timeout, requests.HTTPError, TimeoutError, ConnectionError)
+
+
+def with_retry(call, retries: int = None, backoff: float = None):
+    """
+    Runs `call()`, retrying transport errors (connection, timeout, HTTP status)
+    with exponential backoff and jitter. JSON-RPC errors are not retried.
+    """
+    retries = RPC_RETRIES if retries is None else retries
+    backoff = RPC_BACKOFF if backoff is None else backoff
+    errors = _retryable_errors()
+    for attempt in range(retries + 1):
+        try:
+            return call()
+        except errors as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * (0.5 + random.random())
+            logging.warning(f"RPC call failed ({e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def fees_from_history(history) -> dict:
+    """`maxFeePerGas` / `maxPriorityFeePerGas` (wei) from an `eth_feeHistory` result."""
+    next_base_fee = history["baseFeePerGas"][-1]
+    tips = sorted(reward[0] for reward in history.get("reward") or [] if reward)
+    priority = max(tips[len(tips) // 2] if tips else 0, int(FEE_MIN_PRIORITY_GWEI * GWEI))
+    max_fee = 2 * next_base_fee + priority
+    ceiling = int(FEE_MAX_GWEI * GWEI)
+    if max_fee > ceiling:
+        logging.warning(f"Estimated max fee {max_fee / GWEI:.1f} gwei capped at FEE_MAX_GWEI={FEE_MAX_GWEI:g}")
+        max_fee = ceiling
+        priority = min(priority, max_fee)
+    return {"maxFeePerGas": max_fee, "maxPriorityFeePerGas": priority}
+
+
+class RpcClient:
+    """A Web3 connection with pooling, batching and cached chain constants."""
+
+    def __init__(self, url: str):
+        from web3 import Web3
+
+        self._session = None
+        if url.startswith(("ws://", "wss://")):
+            provider = Web3.LegacyWebSocketProvider(url, websocket_timeout=RPC_TIMEOUT)
+        else:
+            import requests
+            from web3.providers.rpc.utils import REQUEST_RETRY_ALLOWLIST, ExceptionRetryConfiguration
+
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=RPC_POOL_SIZE)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            provider = Web3.HTTPProvider(
+                url,
+                request_kwargs={"timeout": RPC_TIMEOUT},
+                session=self._session,
+                exception_retry_configuration=ExceptionRetryConfiguration(
+                    errors=_retryable_errors(), retries=RPC_RETRIES, backoff_factor=RPC_BACKOFF,
+                    method_allowlist=[*REQUEST_RETRY_ALLOWLIST, "eth_feeHistory"],
+                ),
+            )
+        self.url = url
+        self.w3 = metrics.instrument_web3(Web3(provider))
+        self._lock = threading.Lock()
+        self._chain_id = None
+        self._contracts = {}
+        self._fees = None
+        self._fees_at = 0.0
+
+    @property
+    def chain_id(self) -> int:
+        """The node's chain id, fetched once."""
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def contract(self, address: str, abi_path: str):
+        """The contract at `address` with the ABI of a Foundry artifact, built once."""
+        key = (address, abi_path)
+        with self._lock:
+            if key not in self._contracts:
+                with open(abi_path, "r") as f:
+                    abi = json.load(f)["abi"]
+                self._contracts[key] = self.w3.eth.contract(address=address, abi=abi)
+            return self._contracts[key]
+
+    def batch(self, *calls) -> list:
+        """
+        Sends independent calls in one JSON-RPC batch, retried as a whole.
+
+        Args:
+            calls: `(method, args)` pairs, e.g. `(w3.eth.get_block, ("latest",))`.
+
+        Returns:
+            The formatted results, in the order of `calls`.
+        """
+        def send():
+            with self.w3.batch_requests() as batch:
+                for method, args in calls:
+                    batch.add(method(*args))
+                return batch.execute()
+        return with_retry(send)
+
+    def raw_batch(self, *calls) -> list:
+        """
+        Like `batch`, for `(rpc_method, params)` pairs, returning the raw `result`
+        of each (None for a JSON-RPC error, which is logged). Unlike `batch`, a
+        null result, such as the receipt of a pending transaction, does not fail
+        the other calls.
+        """
+        def send():
+            start = time.perf_counter()
+            try:
+                return self.w3.provider.make_batch_request(list(calls))
+            finally:
+                metrics.RPC_REQUEST_SECONDS.labels("batch").observe(time.perf_counter() - start)
+
+        responses = with_retry(send)
+        if not isinstance(responses, list):
+            metrics.RPC_ERRORS.labels("batch").inc()
+            raise ValueError(f"JSON-RPC batch rejected: {responses.get('error')}")
+        results = []
+        for (method, _), response in zip(calls, responses):
+            if response.get("error"):
+                metrics.RPC_ERRORS.labels(method).inc()
+                logging.warning(f"{method} failed in a batch: {response['error']}")
+            results.append(response.get("result"))
+        return results
+
+    # --- Fees ---
+
+    def fee_history_call(self) -> tuple:
+        """The `eth_feeHistory` call behind `fees`, to put in a `batch`."""
+        return (self.w3.eth.fee_history, (FEE_HISTORY_BLOCKS, "latest", [FEE_PRIORITY_PERCENTILE]))
+
+    def fees_stale(self) -> bool:
+        return self._fees is None or time.monotonic() - self._fees_at > FEE_CACHE_SECONDS
+
+    def update_fees(self, history) -> dict:
+        """Caches the fees of a fee history fetched elsewhere (e.g. in a batch)."""
+        fees = fees_from_history(history)
+        self._fees, self._fees_at = fees, time.monotonic()
+        return fees
+
+    def fees(self) -> dict:
+        """EIP-1559 fee fields for a transaction, from a fee history at most FEE_CACHE_SECONDS old."""
+        if self.fees_stale():
+            method, args = self.fee_history_call()
+            return self.update_fees(method(*args))
+        return self._fees
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url: Optional[str] = None) -> RpcClient:
+    """
+    The process's shared client for `url` (default: SEPOLIA_RPC_URL, read on each
+    call so a `.env` loaded after this module was imported still applies).
+    """
+    url = url or os.getenv("SEPOLIA_RPC_URL")
+    if not url:
+        raise ConnectionError("No RPC URL configured (SEPOLIA_RPC_URL).")
+    client = _clients.get(url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(url)
+            if client is None:
+                client = _clients[url] = RpcClient(url)
+    return client
+
+
+def shutdown():
+    """Drops the shared clients and closes their connections."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        if client._session is not None:
+            client._session.close()
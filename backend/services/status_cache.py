@@ -0,0 +1,234 @@
+# backend/services/status_cache.py
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+# Entries kept per process, and how long one may be served before it is re-read.
+# With a shared backend, invalidations reach every process at once; without one,
+# only final statuses (batched, with a proof) are cached.
+STATUS_CACHE_SIZE = int(os.getenv("STATUS_CACHE_SIZE", "100000"))
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "30"))
+# Optional cache shared by every worker and the indexer: "redis://..." or "memory".
+STATUS_CACHE_BACKEND = os.getenv("STATUS_CACHE_BACKEND", "")
+
+
+class MemorySharedBackend:
+    """In-process stand-in for the shared backend, for development and tests."""
+
+    # Writes between sweeps of expired keys.
+    SWEEP_INTERVAL = 1024
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def get_many(self, keys: list) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [self._get(key, now) for key in keys]
+
+    def set(self, key: str, value: str, ttl: float):
+        self.set_many({key: value}, ttl)
+
+    def delete(self, keys: list):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def set_many(self, values: dict, ttl: float):
+        now = time.monotonic()
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = (now + ttl, value)
+            self._writes += len(values)
+            if self._writes >= self.SWEEP_INTERVAL:
+                # Keys nobody reads again would otherwise stay forever.
+                self._writes = 0
+                for key in [key for key, (expires, _) in self._data.items() if expires <= now]:
+                    del self._data[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class RedisSharedBackend:
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(key)
+        return value.decode() if value is not None else None
+
+    def get_many(self, keys: list) -> list:
+        return [value.decode() if value is not None else None for value in self._client.mget(keys)]
+
+    def set(self, key: str, value: str, ttl: float):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def delete(self, keys: list):
+        if keys:
+            self._client.delete(*keys)
+
+    def set_many(self, values: dict, ttl: float):
+        pipeline = self._client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipeline.set(key, value, ex=max(1, int(ttl)))
+        pipeline.execute()
+
+
+def _make_shared_backend(spec: str):
+    if not spec:
+        return None
+    if spec == "memory":
+        return MemorySharedBackend()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedBackend(spec)
+    raise ValueError(f"Unsupported STATUS_CACHE_BACKEND {spec!r}")
+
+
+class StatusCache:
+    """
+    Read-through cache of applicant status responses keyed by `applicant_hash`.
+
+    A bounded LRU in front of an optional shared backend. Values are the
+    `ApplicantStatusResponse` fields without `national_id`, so no raw identifier is
+    ever written to the shared backend; the caller adds it back on a hit.
+
+    With a shared backend, `invalidate` also writes a new per-hash version there. A
+    local entry remembers the version it was stored under and `get` only serves it
+    while that is still the current one, so an invalidation by the indexer or
+    another worker reaches every process's LRU immediately. `get` reads the
+    version and the shared value in one round trip.
+    """
+
+    KEY_PREFIX = "status:"
+    VERSION_PREFIX = "status-version:"
+
+    def __init__(self, maxsize: int = STATUS_CACHE_SIZE, ttl: float = STATUS_CACHE_TTL, shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, applicant_hash: str) -> Optional[dict]:
+        version, raw = None, None
+        if self.shared is not None:
+            try:
+                version, raw = self.shared.get_many([self.VERSION_PREFIX + applicant_hash, self.KEY_PREFIX + applicant_hash])
+            except Exception:
+                # Backend down: fall back to the local entries as they are.
+                version = self._local_version(applicant_hash)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(applicant_hash)
+            if entry is not None and entry[0] > now and entry[2] == version:
+                self._entries.move_to_end(applicant_hash)
+                self.hits += 1
+                return entry[1]
+
+        if raw is not None:
+            value = json.loads(raw)
+            self._store_local(applicant_hash, value, version)
+            with self._lock:
+                self.shared_hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, applicant_hash: str, value: dict, final: bool = False):
+        """
+        Caches `value`. Unless it is `final` (a batched status with its proof,
+        which never changes), it is only cached with a shared backend: without
+        one, an invalidation by the indexer or another worker never reaches this
+        process.
+        """
+        if not final and self.shared is None:
+            return
+        version = None
+        if self.shared is not None:
+            try:
+                version = self.shared.get(self.VERSION_PREFIX + applicant_hash)
+                self.shared.set(self.KEY_PREFIX + applicant_hash, json.dumps(value), self.ttl)
+            except Exception:
+                pass
+        self._store_local(applicant_hash, value, version)
+
+    def invalidate(self, applicant_hashes: Iterable[str]):
+        """Drops entries whose status, leaf or proof just changed, in every process."""
+        applicant_hashes = list(applicant_hashes)
+        with self._lock:
+            for applicant_hash in applicant_hashes:
+                self._entries.pop(applicant_hash, None)
+        if self.shared is not None and applicant_hashes:
+            try:
+                self.shared.delete([self.KEY_PREFIX + applicant_hash for applicant_hash in applicant_hashes])
+                # A fresh token, never reused, that outlives every local entry
+                # stored under the previous version.
+                version = uuid.uuid4().hex
+                self.shared.set_many({self.VERSION_PREFIX + applicant_hash: version for applicant_hash in applicant_hashes}, 2 * self.ttl)
+            except Exception:
+                # Entries elsewhere expire after the TTL anyway.
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+    def _local_version(self, applicant_hash: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(applicant_hash)
+            return entry[2] if entry is not None else None
+
+    def _store_local(self, applicant_hash: str, value: dict, version: Optional[str] = None):
+        with self._lock:
+            self._entries[applicant_hash] = (time.monotonic() + self.ttl, value, version)
+            self._entries.move_to_end(applicant_hash)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+status_cache = StatusCache(shared=_make_shared_backend(STATUS_CACHE_BACKEND))
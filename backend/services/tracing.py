@@ -0,0 +1,224 @@
+# backend/services/tracing.py
+
+"""
+Span tracing for the batch lifecycle, plus an opt-in sampling profiler for slow
+requests.
+
+A batch is traced from `POST /v1/batches/` through leaf hashing, tree builds,
+transaction build/sign/send and the receipt wait; the indexer traces its ingest of
+the `BatchCommitted` event. Spans carry `batch.id`, `batch.job_id` and `tx.hash`
+attributes, so the API and indexer sides of one batch can be joined.
+
+Tracing is off unless `TRACING_EXPORTER` is set:
+
+- "file": one JSON span per line, appended to `TRACING_FILE`;
+- "otlp": an OpenTelemetry collector, configured with the standard
+  `OTEL_EXPORTER_OTLP_*` variables;
+- "console": stdout.
+
+When it is off, OpenTelemetry is not imported and every span is a no-op.
+
+Request profiling (pyinstrument) is off unless `REQUEST_PROFILING` is set:
+
+- "header": profiles requests sent with `X-Profile: 1`;
+- "always": profiles every traced request and keeps those slower than
+  `PROFILE_SLOW_MS`.
+
+Profiles are written as speedscope flame graphs to `PROFILE_DIR`. The file name
+is set on the request's span (`profile.file`) and returned in the
+`X-Profile-File` response header.
+"""
+
+import os
+import time
+import inspect
+import functools
+import contextvars
+import logging
+from contextlib import contextmanager
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "off")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+PROFILE_HEADER = "X-Profile"
+
+_tracer = None
+_provider = None
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self, end_time=None):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def configure(service_name: str):
+    """Sets up the exporter chosen by `TRACING_EXPORTER`. Does nothing if it is unset."""
+    global _tracer, _provider
+    if not TRACING_EXPORTER or _tracer is not None:
+        return
+
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if TRACING_EXPORTER == "file":
+        trace_file = open(TRACING_FILE, "a")
+        exporter = ConsoleSpanExporter(out=trace_file, formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    elif TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unsupported TRACING_EXPORTER {TRACING_EXPORTER!r}")
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = trace.get_tracer("aadl_on", tracer_provider=_provider)
+
+
+def shutdown():
+    """Flushes the spans still buffered."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def _attributes(attributes: dict) -> dict:
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name: str, parent=None, **attributes):
+    """
+    Opens a span as the current one. `attributes` use dotted names, so they are
+    usually passed as `**{"batch.id": ...}`; None values are dropped.
+    """
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+    with _tracer.start_as_current_span(name, context=parent, attributes=_attributes(attributes)) as current:
+        yield current
+
+
+def start_span(name: str, parent=None, start_time: float = None, **attributes):
+    """
+    Starts a span that the caller ends itself, e.g. from another thread, with
+    `span.end()`. `start_time` is a `time.time()` value, for work timed elsewhere.
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    start_ns = int(start_time * 1e9) if start_time is not None else None
+    return _tracer.start_span(name, context=parent, attributes=_attributes(attributes), start_time=start_ns)
+
+
+def end_span(started, end_time: float):
+    """Ends a span from `start_span` at a `time.time()` value."""
+    started.end(end_time=int(end_time * 1e9))
+
+
+def current_context():
+    """The active trace context, to hand to work continuing on another thread."""
+    if _tracer is None:
+        return None
+    from opentelemetry import context
+    return context.get_current()
+
+
+def set_attributes(**attributes):
+    """Adds attributes to the current span."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_attributes(_attributes(attributes))
+
+
+# --- Request profiling ---
+
+_profile_request = contextvars.ContextVar("profile_request", default=None)
+
+
+def begin_request(headers) -> dict:
+    """
+    Decides whether the current request may be profiled. Returns the per-request
+    state that `traced_endpoint` fills in (`file` once a profile is written).
+    """
+    if REQUEST_PROFILING == "header":
+        wanted = headers.get(PROFILE_HEADER) == "1"
+    else:
+        wanted = REQUEST_PROFILING == "always"
+    state = {"profile": wanted, "keep_all": REQUEST_PROFILING == "header", "file": None}
+    _profile_request.set(state)
+    return state
+
+
+def _save_profile(profiler, name: str, elapsed: float, state: dict, current_span):
+    if not state["keep_all"] and elapsed * 1000 < PROFILE_SLOW_MS:
+        return
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    file_name = f"{time.strftime('%Y%m%dT%H%M%S')}-{name}-{int(elapsed * 1000)}ms-{os.getpid()}-{id(state):x}.speedscope.json"
+    with open(os.path.join(PROFILE_DIR, file_name), "w") as f:
+        f.write(profiler.output(renderer=SpeedscopeRenderer()))
+    state["file"] = file_name
+    current_span.set_attribute("profile.file", file_name)
+    logging.info(f"Profiled {name} ({elapsed * 1000:.0f} ms): {file_name}")
+
+
+@contextmanager
+def _endpoint_span(name: str, async_mode: str):
+    state = _profile_request.get()
+    with span(name) as current:
+        if not state or not state["profile"]:
+            yield
+            return
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode=async_mode)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            _save_profile(profiler, name, time.perf_counter() - started, state, current)
+
+
+def traced_endpoint(name: str):
+    """
+    Wraps an endpoint (sync or async) in a span named `name` and, when
+    `begin_request` allowed it, in a sampling profiler.
+    """
+    def decorator(endpoint):
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                with _endpoint_span(name, "enabled"):
+                    return await endpoint(*args, **kwargs)
+        else:
+            # Sync endpoints run on a threadpool thread, which the profiler samples.
+            @functools.wraps(endpoint)
+            def wrapper(*args, **kwargs):
+                with _endpoint_span(name, "disabled"):
+                    return endpoint(*args, **kwargs)
+        return wrapper
+    return decorator
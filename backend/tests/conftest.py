@@ -0,0 +1,69 @@
+# backend/tests/conftest.py
+
+"""
+Test configuration. The backend reads its settings at import time, so they are
+pointed at a scratch SQLite database and proof file directory before anything
+from `backend` or `indexer` is imported.
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+_SCRATCH = tempfile.mkdtemp(prefix="aadl-tests-")
+FORGE_ARTIFACT = os.path.join(PROJECT_ROOT, "out", "BatchRegistry.sol", "BatchRegistry.json")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{_SCRATCH}/test.db"
+os.environ.pop("REPLICA_DATABASE_URL", None)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("STATUS_CACHE_BACKEND", None)
+os.environ["PROOF_FILE_DIR"] = os.path.join(_SCRATCH, "proof_files")
+# The indexer builds its RPC client at import; nothing connects until a call is made.
+os.environ.setdefault("SEPOLIA_RPC_URL", "http://127.0.0.1:8545")
+os.environ["INDEXER_METRICS_PORT"] = "0"
+
+if os.path.exists(FORGE_ARTIFACT):
+    os.environ["ABI_PATH"] = FORGE_ARTIFACT
+else:
+    # Without a Forge build, the parts of the ABI the backend uses.
+    os.environ["ABI_PATH"] = os.path.join(_SCRATCH, "BatchRegistry.json")
+    with open(os.environ["ABI_PATH"], "w") as f:
+        json.dump({"abi": [
+            {"type": "function", "name": "commitBatch", "stateMutability": "nonpayable",
+             "inputs": [{"name": "_merkleRoot", "type": "bytes32"}, {"name": "_wilaya", "type": "uint16"},
+                        {"name": "_batchSize", "type": "uint256"}, {"name": "_metadata", "type": "bytes"}],
+             "outputs": [{"name": "", "type": "uint256"}]},
+            {"type": "event", "name": "BatchCommitted", "anonymous": False,
+             "inputs": [{"name": "batchId", "type": "uint256", "indexed": True},
+                        {"name": "merkleRoot", "type": "bytes32", "indexed": True},
+                        {"name": "operator", "type": "address", "indexed": True},
+                        {"name": "wilaya", "type": "uint16", "indexed": False},
+                        {"name": "batchSize", "type": "uint256", "indexed": False},
+                        {"name": "metadata", "type": "bytes", "indexed": False}]},
+        ]}, f)
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables, with the process caches emptied."""
+    from backend import models
+    from backend.database import SessionLocal, engine
+    from backend.services import proof_files
+    from backend.services.status_cache import status_cache
+
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    status_cache.clear()
+    proof_files._open_files.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
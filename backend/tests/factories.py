@@ -0,0 +1,49 @@
+# backend/tests/factories.py
+
+"""Builders for the rows and chain events the tests need."""
+
+import secrets
+import types
+
+from hexbytes import HexBytes
+
+from backend import models, security
+
+
+def national_id(wilaya_code: int, number: int) -> str:
+    return f"{wilaya_code:02d}{number:016d}"
+
+
+def add_applicants(db, counts: dict) -> dict:
+    """Registers `counts[wilaya_code]` PENDING applicants per wilaya. Returns `{national_id: applicant_hash}`."""
+    applicants = {}
+    for wilaya_code, count in counts.items():
+        for number in range(count):
+            identifier = national_id(wilaya_code, number)
+            applicants[identifier] = security.hash_identifier(identifier)
+            db.add(models.Applicant(
+                applicant_hash=applicants[identifier],
+                full_name="Test Applicant",
+                address="Test Address",
+                wilaya_code=wilaya_code,
+                file_hash="0x" + secrets.token_hex(32),
+            ))
+    db.commit()
+    return applicants
+
+
+def batch_event(job: models.BatchJob, batch_id: int, block_number: int = 1):
+    """The BatchCommitted event `commitBatch` would emit for a batch job."""
+    return types.SimpleNamespace(
+        args=types.SimpleNamespace(
+            batchId=batch_id,
+            merkleRoot=HexBytes(job.merkle_root),
+            operator="0x" + "00" * 20,
+            wilaya=job.wilaya_code,
+            batchSize=job.batch_size,
+            metadata=job.batch_metadata.encode(),
+        ),
+        transactionHash=HexBytes(secrets.token_bytes(32)),
+        blockNumber=block_number,
+        logIndex=0,
+    )
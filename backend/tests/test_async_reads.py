@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend import database, main, models
+from backend.tests.factories import add_applicants, national_id
+
+
+def test_async_urls_and_options():
+    assert database._async_database_url("postgresql://user:secret@db/aadl") == "postgresql+asyncpg://user:secret@db/aadl"
+    assert database._async_database_url("postgresql+psycopg2://db/aadl") == "postgresql+asyncpg://db/aadl"
+    assert database._async_database_url("sqlite:///./aadl_on.db") == "sqlite+aiosqlite:///./aadl_on.db"
+
+    production = database.engine_profile("production")
+    options = database.engine_options("postgresql+asyncpg://db/aadl", production, is_async=True)
+    assert options["connect_args"] == {"server_settings": {"statement_timeout": "15000"}}
+    # aiosqlite connections are not bound to a thread.
+    assert "connect_args" not in database.engine_options("sqlite+aiosqlite:///./aadl_on.db", production, is_async=True)
+
+
+def test_status_read_on_the_async_engine(db):
+    add_applicants(db, {16: 1})
+    async_engine = database.get_async_sessionmaker(read_only=True).kw["bind"]
+    assert async_engine.dialect.driver == "aiosqlite"
+    assert event.contains(async_engine.sync_engine, "connect", database._set_sqlite_pragmas)
+    reads = {"sync": [], "async": []}
+
+    def capture(name):
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            if "FROM applicants" in statement:
+                reads[name].append(statement)
+        return listener
+
+    sync_listener, async_listener = capture("sync"), capture("async")
+    event.listen(database.engine, "before_cursor_execute", sync_listener)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", async_listener)
+    try:
+        response = TestClient(main.app).get(f"/v1/applicants/{national_id(16, 0)}/status")
+    finally:
+        event.remove(database.engine, "before_cursor_execute", sync_listener)
+        event.remove(async_engine.sync_engine, "before_cursor_execute", async_listener)
+
+    assert response.json()["status"] == models.ApplicantStatus.PENDING.value
+    assert reads["sync"] == [] and reads["async"]
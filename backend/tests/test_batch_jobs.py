@@ -0,0 +1,97 @@
+from backend import models
+from backend.database import SessionLocal
+from backend.services import batch_jobs, batch_service, blockchain_service, merkle_queue
+from backend.tests.factories import add_applicants
+
+
+def _job(db) -> models.BatchJob:
+    add_applicants(db, {16: 3})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    job, = batch_jobs.create_jobs(db, batch_service.build_batches([16], workers=1))
+    return job
+
+
+def _reload(job_id: int) -> models.BatchJob:
+    with SessionLocal() as session:
+        return session.get(models.BatchJob, job_id)
+
+
+def test_transaction_recorded_before_it_is_sent(db, monkeypatch):
+    job = _job(db)
+    watched, seen_at_send = [], []
+
+    def fake_submit(merkle_root, wilaya_code, batch_size, metadata, nonce_floor, on_signed):
+        on_signed("ab" * 32, "f8" * 40, max(nonce_floor, 7))
+        # What a restart would find if the process died during the send.
+        seen_at_send.append(_reload(job.id))
+        return "ab" * 32
+
+    monkeypatch.setattr(blockchain_service, "submit_batch_root", fake_submit)
+    monkeypatch.setattr(blockchain_service.receipt_watcher, "watch", lambda tx_hash, callback: watched.append(tx_hash))
+    batch_jobs._submit_job(job.id)
+
+    recorded, = seen_at_send
+    assert (recorded.status, recorded.tx_hash, recorded.signed_tx, recorded.nonce) == (
+        models.BatchJobStatus.SUBMITTED, "ab" * 32, "f8" * 40, 7
+    )
+    assert watched == ["ab" * 32]
+
+
+def test_failed_send_frees_the_snapshot(db, monkeypatch):
+    job = _job(db)
+
+    def failing_submit(merkle_root, wilaya_code, batch_size, metadata, nonce_floor, on_signed):
+        on_signed("ab" * 32, "f8" * 40, 0)
+        raise ConnectionError("RPC node unreachable")
+
+    monkeypatch.setattr(blockchain_service, "submit_batch_root", failing_submit)
+    batch_jobs._submit_job(job.id)
+
+    failed = _reload(job.id)
+    assert failed.status == models.BatchJobStatus.FAILED
+    assert (failed.tx_hash, failed.signed_tx, failed.nonce) == (None, None, None)
+    assert [snapshot.epoch for snapshot in merkle_queue.uncommitted_snapshots(db, 16)] == [0]
+
+
+def test_nonce_floor_follows_other_workers(db, monkeypatch):
+    job = _job(db)
+    # A job another worker already sent with nonce 11.
+    db.add(models.BatchJob(wilaya_code=16, batch_size=1, merkle_root="00" * 32, batch_metadata="{}",
+                           status=models.BatchJobStatus.CONFIRMED, tx_hash="cd" * 32, nonce=11))
+    db.commit()
+    floors = []
+
+    def fake_submit(merkle_root, wilaya_code, batch_size, metadata, nonce_floor, on_signed):
+        floors.append(nonce_floor)
+        return "ab" * 32
+
+    monkeypatch.setattr(blockchain_service, "submit_batch_root", fake_submit)
+    monkeypatch.setattr(blockchain_service.receipt_watcher, "watch", lambda tx_hash, callback: None)
+    batch_jobs._submit_job(job.id)
+
+    assert floors == [12]
+
+    manager = blockchain_service.NonceManager()
+    manager._next_nonce = 5
+    assert [manager.allocate(), manager.allocate(12), manager.allocate()] == [5, 12, 13]
+
+
+def test_resume_requeues_unsent_and_rebroadcasts_signed(db, monkeypatch):
+    unsent = _job(db)
+    unsent.status = models.BatchJobStatus.SUBMITTED
+    signed = models.BatchJob(wilaya_code=16, batch_size=1, merkle_root="00" * 32, batch_metadata="{}",
+                             status=models.BatchJobStatus.SUBMITTED, tx_hash="cd" * 32, signed_tx="f8" * 40, nonce=3)
+    db.add(signed)
+    db.commit()
+    rebroadcast, watched, enqueued = [], [], []
+    monkeypatch.setattr(blockchain_service, "rebroadcast", rebroadcast.append)
+    monkeypatch.setattr(blockchain_service.receipt_watcher, "watch", lambda tx_hash, callback: watched.append(tx_hash))
+    monkeypatch.setattr(batch_jobs, "enqueue", enqueued.extend)
+
+    batch_jobs.resume_pending_jobs()
+
+    assert _reload(unsent.id).status == models.BatchJobStatus.QUEUED
+    assert enqueued == [unsent.id]
+    assert rebroadcast == ["f8" * 40]
+    assert watched == ["cd" * 32]
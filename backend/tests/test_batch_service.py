@@ -0,0 +1,90 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from backend import main, models
+from backend.services import batch_jobs, batch_service, merkle_queue, proof_store
+from backend.services.merkle_service import MerkleTree, applicant_leaves
+from backend.tests.factories import add_applicants, batch_event
+from indexer import listener
+
+
+def _leaves(db, wilaya_code: int) -> list:
+    rows = batch_service.applicants_query(db).filter(models.Applicant.wilaya_code == wilaya_code).order_by(models.Applicant.id)
+    return list(applicant_leaves(rows))
+
+
+def test_batches_split_by_wilaya_and_capped(db):
+    add_applicants(db, {16: 7, 31: 2, 9: 1})
+    # Eligible but never appended to a queue: the workers hash and append them.
+    db.query(models.Applicant).filter(models.Applicant.wilaya_code != 9).update(
+        {models.Applicant.status: models.ApplicantStatus.ELIGIBLE}
+    )
+    db.commit()
+    assert batch_service.eligible_wilayas(db) == [16, 31]
+
+    batches = batch_service.build_batches([16, 31], max_size=3, workers=2)
+
+    assert [(batch["wilaya_code"], batch["epoch"], batch["batch_size"]) for batch in batches] == [
+        (16, 0, 3), (16, 1, 3), (16, 2, 1), (31, 0, 2)
+    ]
+    leaves = _leaves(db, 16)
+    for batch, start in zip(batches, (0, 3, 6)):
+        assert batch["merkle_root"] == MerkleTree(leaves[start:start + batch["batch_size"]]).get_root()
+    assert batches[3]["merkle_root"] == MerkleTree(_leaves(db, 31)).get_root()
+
+
+def test_endpoint_queues_one_job_per_wilaya(db, monkeypatch):
+    add_applicants(db, {16: 3, 31: 2, 9: 1})
+    for wilaya_code in (16, 31):
+        merkle_queue.mark_eligible_where(db, wilaya_code=wilaya_code)
+    db.commit()
+    enqueued = []
+    monkeypatch.setattr(batch_jobs, "enqueue", enqueued.extend)
+
+    body = TestClient(main.app).post("/v1/batches/", params={"aggregate": False}).json()
+
+    assert [(job["wilaya_code"], job["applicants"]) for job in body["jobs"]] == [(16, 3), (31, 2)]
+    assert body["applicants_batched"] == 5
+    assert enqueued == [job["job_id"] for job in body["jobs"]]
+    # Still eligible until indexed, but their snapshots already have jobs.
+    assert TestClient(main.app).post("/v1/batches/", params={"aggregate": False}).json()["jobs"] == []
+
+
+def _aggregated_job(db, max_parts: int):
+    add_applicants(db, {9: 2, 16: 3, 31: 1})
+    for wilaya_code in (9, 16, 31):
+        merkle_queue.mark_eligible_where(db, wilaya_code=wilaya_code)
+    db.commit()
+    batches = batch_service.build_batches([9, 16, 31], workers=1)
+    return batches, batch_service.aggregate_batches(batches, max_parts=max_parts)
+
+
+def test_wilaya_roots_combined_under_aggregate_roots(db):
+    batches, aggregated = _aggregated_job(db, max_parts=2)
+
+    assert [len(batch["parts"]) for batch in aggregated] == [2, 1]
+    first = aggregated[0]
+    assert (first["wilaya_code"], first["batch_size"]) == (batch_service.AGGREGATE_WILAYA, 5)
+    assert first["merkle_root"] == MerkleTree([batches[0]["merkle_root"], batches[1]["merkle_root"]]).get_root()
+    metadata = batch_service.parse_batch_metadata(batch_service.batch_metadata(first))
+    assert metadata["aggregate"] == [[9, 0, batches[0]["merkle_root"].hex(), 2], [16, 0, batches[1]["merkle_root"].hex(), 3]]
+
+
+def test_indexer_stores_parts_and_rejects_mismatched_roots(db):
+    _, aggregated = _aggregated_job(db, max_parts=3)
+    job, = batch_jobs.create_jobs(db, aggregated)
+    forged = batch_event(job, batch_id=1)
+    # A listed wilaya root that the aggregate root does not commit to.
+    metadata = batch_service.parse_batch_metadata(forged.args.metadata)
+    metadata["aggregate"][1][2] = "00" * 32
+    forged.args.metadata = json.dumps(metadata).encode()
+
+    listener.handle_event(forged)
+    assert db.query(models.Batch).count() == 0
+
+    listener.handle_event(batch_event(job, batch_id=1))
+    parts = db.query(models.AggregatePart).order_by(models.AggregatePart.part_index).all()
+    assert [(part.wilaya_code, part.batch_size) for part in parts] == [(9, 2), (16, 3), (31, 1)]
+    assert [part.position_base for part in parts] == list(proof_store.part_bases([2, 3, 1]))
+    assert {applicant.status for applicant in db.query(models.Applicant)} == {models.ApplicantStatus.BATCHED}
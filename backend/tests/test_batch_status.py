@@ -0,0 +1,138 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, models, security
+from backend.services import batch_jobs, batch_service, merkle_queue, proof_codec, proof_files, proof_store
+from backend.services.status_cache import status_cache
+from backend.tests.factories import add_applicants, batch_event, national_id
+from indexer import listener
+
+
+@pytest.fixture(params=["proof_file", "merkle_nodes"])
+def batches(request, db):
+    """
+    Batch 1 holds wilaya 16 alone; batch 2 aggregates wilayas 9 and 31. Two
+    wilaya 17 applicants are registered but never batched. Parametrized over
+    where proofs are read from.
+    """
+    add_applicants(db, {16: 5, 9: 3, 31: 6})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    job, = batch_jobs.create_jobs(db, batch_service.build_batches([16], workers=1))
+    listener.handle_event(batch_event(job, batch_id=1))
+
+    for wilaya_code in (9, 31):
+        merkle_queue.mark_eligible_where(db, wilaya_code=wilaya_code)
+    db.commit()
+    aggregated, = batch_jobs.create_jobs(db, batch_service.aggregate_batches(batch_service.build_batches([9, 31], workers=1)))
+    listener.handle_event(batch_event(aggregated, batch_id=2, block_number=2))
+    add_applicants(db, {17: 2})
+
+    if request.param == "merkle_nodes":
+        for batch_id in (1, 2):
+            os.remove(proof_files.path_for(batch_id))
+        proof_files._open_files.clear()
+    status_cache.clear()
+    return request.param
+
+
+def _lookup(national_ids):
+    response = TestClient(main.app).post("/v1/applicants/status", json={"national_ids": national_ids})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _root(db, result) -> str:
+    """The root a result's proof leads to, through the wilaya root if aggregated."""
+    leaf = db.query(models.Leaf).filter(
+        models.Leaf.applicant_hash == security.hash_identifier(result["national_id"])
+    ).one()
+    nodes = [bytes.fromhex(node) for node in result["merkle_proof"]]
+    index = result["offset"]
+    if result["root_proof"] is not None:
+        index += result["wilaya_index"] << len(nodes)
+        nodes += [bytes.fromhex(node) for node in result["root_proof"]]
+    return proof_codec.process_proof(bytes.fromhex(leaf.leaf_hash.removeprefix("0x")), nodes, index).hex()
+
+
+def test_not_found_and_pending(db, batches):
+    body = _lookup([national_id(16, 0), "99000000000000000000", national_id(17, 1), national_id(16, 0)])
+
+    assert body["not_found"] == ["99000000000000000000"]
+    assert [result["national_id"] for result in body["results"]] == [national_id(16, 0), national_id(17, 1)]
+    pending = body["results"][1]
+    assert pending["status"] == models.ApplicantStatus.PENDING.value
+    assert (pending["batch_id"], pending["merkle_proof"]) == (None, None)
+
+
+def test_plain_and_aggregated_proofs(db, batches):
+    ids = [national_id(16, n) for n in range(5)] + [national_id(9, n) for n in range(3)] + [national_id(31, n) for n in range(6)]
+    body = _lookup(ids)
+
+    assert body["not_found"] == []
+    results = {result["national_id"]: result for result in body["results"]}
+    for result in results.values():
+        assert result["status"] == models.ApplicantStatus.BATCHED.value
+        assert _root(db, result) == result["merkle_root"].removeprefix("0x")
+    assert {result["batch_id"] for result in results.values()} == {1, 2}
+
+    plain = results[national_id(16, 2)]
+    assert (plain["batch_id"], plain["wilaya_index"], plain["wilaya_root"], plain["root_proof"]) == (1, None, None, None)
+    # The two wilaya trees of batch 2, each one step below the aggregate root.
+    assert {results[national_id(code, 0)]["wilaya_index"] for code in (9, 31)} == {0, 1}
+    for code in (9, 31):
+        result = results[national_id(code, 0)]
+        assert result["batch_id"] == 2 and len(result["root_proof"]) == 1
+
+
+def test_proofs_read_per_tree_not_per_applicant(batches, monkeypatch):
+    calls = []
+    real_get_proofs = proof_store.get_proofs
+
+    def counting_get_proofs(db, batch_id, offsets, leaf_count, position_base=0):
+        calls.append((batch_id, position_base, len(offsets)))
+        return real_get_proofs(db, batch_id, offsets, leaf_count, position_base)
+
+    monkeypatch.setattr(proof_store, "get_proofs", counting_get_proofs)
+    _lookup([national_id(16, n) for n in range(5)] + [national_id(9, n) for n in range(3)] + [national_id(31, n) for n in range(6)])
+
+    if batches == "proof_file":
+        assert calls == []
+    else:
+        # One read for batch 1 and one per wilaya tree of batch 2.
+        assert sorted((batch_id, count) for batch_id, _, count in calls) == [(1, 5), (2, 3), (2, 6)]
+        assert len({base for batch_id, base, _ in calls if batch_id == 2}) == 2
+
+
+def test_cache_hits_and_misses_mixed(batches, monkeypatch):
+    ids = [national_id(16, n) for n in range(3)] + [national_id(31, 0), national_id(17, 0)]
+    first = _lookup(ids[:2])
+    loaded = []
+    real_load = main.load_applicant_statuses
+
+    async def spying_load(db, applicant_hashes):
+        loaded.append(len(applicant_hashes))
+        return await real_load(db, applicant_hashes)
+
+    monkeypatch.setattr(main, "load_applicant_statuses", spying_load)
+    hits = status_cache.hits + status_cache.shared_hits
+    second = _lookup(ids)
+
+    assert loaded == [3]
+    assert status_cache.hits + status_cache.shared_hits - hits == 2
+    assert second["results"][:2] == first["results"]
+    # The batched ones just loaded are now cached too; without a shared backend
+    # the pending applicant is read again every time.
+    assert _lookup(ids) == second
+    assert loaded == [3, 1]
+
+
+def test_lookups_are_chunked(batches, monkeypatch):
+    ids = [national_id(16, n) for n in range(5)] + [national_id(31, n) for n in range(6)] + [national_id(17, 0)]
+    expected = _lookup(ids)
+    status_cache.clear()
+    monkeypatch.setattr(main, "STATUS_LOOKUP_CHUNK_SIZE", 2)
+
+    assert _lookup(ids) == expected
@@ -0,0 +1,129 @@
+"""
+End to end against an in-process chain: a batch is committed to BatchRegistry on
+eth-tester through the real submitter, the indexer ingests the emitted event, and
+a stored proof is checked against the root the contract holds.
+
+Needs eth-tester and the Forge build of the contract (`forge build`); skipped
+without either.
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend import models
+from backend.services import batch_jobs, batch_service, blockchain_service, merkle_queue, proof_codec, proof_store, rpc_client
+from backend.tests.conftest import FORGE_ARTIFACT
+from backend.tests.factories import add_applicants
+from indexer import listener
+
+pytest.importorskip("eth_tester")
+if not os.path.exists(FORGE_ARTIFACT):
+    pytest.skip("needs the BatchRegistry Forge artifact (forge build)", allow_module_level=True)
+
+from web3 import EthereumTesterProvider, Web3  # noqa: E402
+
+
+def _serve_json_rpc(provider) -> ThreadingHTTPServer:
+    """
+    Serves `provider` over HTTP, single and batch requests, so the backend talks
+    to it through the same pooled, batching client it uses in production.
+    """
+    w3 = Web3(provider)
+    request = provider.request_func(w3, w3.middleware_onion)
+    lock = threading.Lock()
+
+    def answer(call):
+        with lock:
+            response = request(call["method"], call.get("params", []))
+        return {"jsonrpc": "2.0", "id": call["id"], **{key: response[key] for key in ("result", "error") if key in response}}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            reply = [answer(call) for call in body] if isinstance(body, list) else answer(body)
+            data = Web3.to_json(reply).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """A deployed BatchRegistry, with the backend and the indexer pointed at it."""
+    provider = EthereumTesterProvider()
+    server = _serve_json_rpc(provider)
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    client = rpc_client.get_client(url)
+    with open(FORGE_ARTIFACT) as f:
+        artifact = json.load(f)
+    operator = client.w3.eth.accounts[0]
+    factory = client.w3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"]["object"])
+    address = client.w3.eth.get_transaction_receipt(factory.constructor().transact({"from": operator}))["contractAddress"]
+
+    monkeypatch.setattr(blockchain_service, "RPC_URL", url)
+    monkeypatch.setattr(blockchain_service, "CONTRACT_ADDRESS", address)
+    monkeypatch.setattr(blockchain_service, "ABI_PATH", FORGE_ARTIFACT)
+    monkeypatch.setattr(blockchain_service, "OPERATOR_PRIVATE_KEY", provider.ethereum_tester.backend.account_keys[0].to_hex())
+    monkeypatch.setattr(blockchain_service.receipt_watcher, "poll_interval", 0.05)
+    blockchain_service.nonce_manager.reset()
+
+    contract = client.contract(address, FORGE_ARTIFACT)
+    monkeypatch.setattr(listener, "rpc", client)
+    monkeypatch.setattr(listener, "w3", client.w3)
+    monkeypatch.setattr(listener, "batch_registry_contract", contract)
+    try:
+        yield contract
+    finally:
+        blockchain_service.shutdown()
+        blockchain_service.nonce_manager.reset()
+        server.shutdown()
+        server.server_close()
+
+
+def _wait_for_job(db, job_id: int, timeout: float = 10.0) -> models.BatchJob:
+    deadline = time.monotonic() + timeout
+    while True:
+        db.expire_all()
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).one()
+        if job.status not in (models.BatchJobStatus.QUEUED, models.BatchJobStatus.SUBMITTED) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_committed_batch_is_indexed_and_provable(db, chain):
+    applicants = add_applicants(db, {16: 7})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    job, = batch_jobs.create_jobs(db, batch_service.build_batches([16], workers=1))
+
+    batch_jobs._submit_job(job.id)
+    job = _wait_for_job(db, job.id)
+    assert job.status == models.BatchJobStatus.CONFIRMED, job.error
+
+    events, _, _ = listener.fetch_events(0, listener.w3.eth.block_number, listener.LOG_CHUNK_SIZE)
+    assert [event.args.batchId for event in events] == [1]
+    listener.handle_event(events[0])
+
+    on_chain_root = bytes(chain.functions.merkleRoots(1).call())
+    assert on_chain_root.hex() == job.merkle_root
+    batch = db.query(models.Batch).filter(models.Batch.id == 1).one()
+    assert batch.tx_hash.removeprefix("0x") == events[0].transactionHash.hex().removeprefix("0x")
+    for applicant_hash in applicants.values():
+        leaf = db.query(models.Leaf).filter(models.Leaf.applicant_hash == applicant_hash).one()
+        proof = proof_store.get_proof(db, leaf.batch_id, leaf.offset, batch.batch_size)
+        assert proof_codec.process_proof(bytes.fromhex(leaf.leaf_hash.removeprefix("0x")), proof, leaf.offset) == on_chain_root
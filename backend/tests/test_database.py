@@ -0,0 +1,41 @@
+import pytest
+
+from backend import database
+
+
+def test_profiles_and_overrides(monkeypatch):
+    assert database.engine_profile("production")["statement_timeout_ms"] == 15000
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "no")
+
+    worker = database.engine_profile("worker")
+
+    assert (worker["pool_size"], worker["pool_pre_ping"], worker["max_overflow"]) == (3, False, 2)
+    with pytest.raises(ValueError):
+        database.engine_profile("staging")
+
+
+def test_engine_options_per_driver():
+    production = database.engine_profile("production")
+
+    postgresql = database.engine_options("postgresql://db/aadl", production)
+    assert postgresql["connect_args"] == {"options": "-c statement_timeout=15000"}
+    assert (postgresql["pool_size"], postgresql["pool_recycle"], postgresql["pool_pre_ping"]) == (10, 1800, True)
+    assert "connect_args" not in database.engine_options("postgresql://db/aadl", database.engine_profile("worker"))
+    # An in-memory SQLite database has a single-connection pool, without sizes.
+    assert "pool_size" not in database.engine_options("sqlite://", production)
+
+
+def test_sqlite_pragmas_on_every_connection(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path}/pragmas.db", database.engine_profile("development"))
+    try:
+        with engine.connect() as connection:
+            pragmas = {
+                name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout", "temp_store")
+            }
+    finally:
+        engine.dispose()
+
+    # synchronous 1 is NORMAL, temp_store 2 is MEMORY.
+    assert pragmas == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": database.SQLITE_PRAGMAS["busy_timeout"], "temp_store": 2}
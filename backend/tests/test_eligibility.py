@@ -0,0 +1,110 @@
+import sys
+import types
+
+from fastapi.testclient import TestClient
+
+from backend import main, mark_eligible, models, security
+from backend.services.merkle_service import applicant_leaves
+from backend.services.status_cache import MemorySharedBackend, status_cache
+from backend.tests.factories import add_applicants, national_id
+
+
+def _applicant(db, identifier: str) -> models.Applicant:
+    db.expire_all()
+    return db.query(models.Applicant).filter(models.Applicant.applicant_hash == security.hash_identifier(identifier)).one()
+
+
+def _expected_leaf(applicant: models.Applicant) -> bytes:
+    columns = types.SimpleNamespace(
+        applicant_hash=applicant.applicant_hash,
+        file_hash=applicant.file_hash,
+        created_at=applicant.created_at,
+        wilaya_code=applicant.wilaya_code,
+    )
+    return next(applicant_leaves([columns]))
+
+
+def test_filters_combine_and_only_pending_moves(db):
+    add_applicants(db, {16: 4, 31: 2})
+    rejected = _applicant(db, national_id(16, 3))
+    rejected.status = models.ApplicantStatus.BATCHED
+    db.commit()
+    client = TestClient(main.app)
+
+    response = client.post("/v1/applicants/eligibility", json={
+        "wilaya_code": 16, "national_ids": [national_id(16, 0), national_id(16, 3), national_id(31, 0)]
+    })
+    assert response.json() == {"eligible": 1}
+    assert _applicant(db, national_id(16, 0)).status == models.ApplicantStatus.ELIGIBLE
+    assert _applicant(db, national_id(31, 0)).status == models.ApplicantStatus.PENDING
+    assert _applicant(db, national_id(16, 3)).status == models.ApplicantStatus.BATCHED
+
+    applicant_id = _applicant(db, national_id(31, 1)).id
+    assert client.post("/v1/applicants/eligibility", json={"applicant_ids": [applicant_id]}).json() == {"eligible": 1}
+    assert client.post("/v1/applicants/eligibility", json={"wilaya_code": 16}).json() == {"eligible": 2}
+    assert client.post("/v1/applicants/eligibility", json={"wilaya_code": 16}).json() == {"eligible": 0}
+    assert client.post("/v1/applicants/eligibility", json={}).status_code == 400
+
+
+def test_leaf_stored_and_queue_slots_assigned(db):
+    add_applicants(db, {16: 5})
+    client = TestClient(main.app)
+    client.post("/v1/applicants/eligibility", json={"national_ids": [national_id(16, 3), national_id(16, 1)]})
+    client.post("/v1/applicants/eligibility", json={"wilaya_code": 16})
+
+    applicants = [_applicant(db, national_id(16, number)) for number in range(5)]
+    for applicant in applicants:
+        assert applicant.leaf_hash == _expected_leaf(applicant)
+    # Queued in id order within each call, continuing the same open epoch.
+    slots = {number: (applicant.queue_epoch, applicant.queue_position) for number, applicant in enumerate(applicants)}
+    assert slots == {1: (0, 0), 3: (0, 1), 0: (0, 2), 2: (0, 3), 4: (0, 4)}
+
+
+def test_cached_status_invalidated(db, monkeypatch):
+    # Pending statuses are only cached with a shared backend.
+    monkeypatch.setattr(status_cache, "shared", MemorySharedBackend())
+    add_applicants(db, {16: 1})
+    client = TestClient(main.app)
+    identifier = national_id(16, 0)
+    assert client.get(f"/v1/applicants/{identifier}/status").json()["status"] == models.ApplicantStatus.PENDING.value
+    assert status_cache.get(security.hash_identifier(identifier)) is not None
+
+    client.post("/v1/applicants/eligibility", json={"national_ids": [identifier]})
+
+    assert client.get(f"/v1/applicants/{identifier}/status").json()["status"] == models.ApplicantStatus.ELIGIBLE.value
+
+
+def test_upload(db):
+    add_applicants(db, {16: 3, 31: 1})
+    client = TestClient(main.app)
+    body = "national_id,full_name\n" + "".join(f"{identifier},x\n" for identifier in (national_id(16, 0), national_id(16, 2), national_id(31, 0)))
+
+    response = client.post("/v1/applicants/eligibility/upload", params={"wilaya_code": 16}, content=body,
+                           headers={"Content-Type": "text/csv"})
+
+    assert response.json() == {"eligible": 2}
+    assert _applicant(db, national_id(16, 2)).status == models.ApplicantStatus.ELIGIBLE
+    assert _applicant(db, national_id(31, 0)).status == models.ApplicantStatus.PENDING
+
+
+def test_upload_not_utf8(db):
+    response = TestClient(main.app).post("/v1/applicants/eligibility/upload", content=b'{"national_id": "\xff"}\n')
+    assert response.status_code == 400
+
+
+def test_cli(db, tmp_path, monkeypatch, capsys):
+    add_applicants(db, {16: 3, 31: 2})
+    export = tmp_path / "verified.ndjson"
+    export.write_text("".join(f'{{"national_id": "{identifier}"}}\n' for identifier in (national_id(16, 1), national_id(31, 0))))
+    monkeypatch.setattr(sys, "argv", ["mark_eligible.py", "--file", str(export), "--chunk-size", "1"])
+
+    mark_eligible.main()
+
+    assert capsys.readouterr().out.strip() == "Eligible: 2"
+    assert _applicant(db, national_id(16, 1)).queue_position == 0
+    assert _applicant(db, national_id(31, 0)).leaf_hash == _expected_leaf(_applicant(db, national_id(31, 0)))
+    assert _applicant(db, national_id(16, 0)).status == models.ApplicantStatus.PENDING
+
+    monkeypatch.setattr(sys, "argv", ["mark_eligible.py", "--wilaya", "16"])
+    mark_eligible.main()
+    assert capsys.readouterr().out.strip() == "Eligible: 2"
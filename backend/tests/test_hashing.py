@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from backend.services import hashing
+
+BACKENDS = ["pysha3", "pycryptodome", "eth-hash"]
+
+# keccak-256 test vectors (the Ethereum variant, not NIST SHA3-256).
+VECTORS = [
+    (b"", "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"),
+    (b"abc", "4e03657aea45a94fc7d47ba826c8d667c0d1e6e33a64a036ec44f58fa12d6c45"),
+    (bytes(64), "ad3228b676f7d3cd4284a5443f17f1962b36e491b30a40b2405849e597ba5fb5"),
+]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    """Switches the module to one backend for the test, skipping it if not installed."""
+    if request.param not in hashing.available_backends():
+        pytest.skip(f"{request.param} is not installed")
+    previous = hashing.BACKEND
+    hashing.set_backend(request.param)
+    try:
+        yield request.param
+    finally:
+        hashing.set_backend(previous)
+
+
+@pytest.mark.parametrize("data, digest", VECTORS)
+def test_keccak256_vectors(backend, data, digest):
+    assert hashing.keccak256(data).hex() == digest
+
+
+def test_keccak_pairs_vectors(backend):
+    odd = b"\x01" * 32
+    level = bytes(64) + odd
+
+    assert hashing.keccak_pairs(bytes(64)).hex() == VECTORS[2][1]
+    assert hashing.keccak_pairs(level).hex() == (
+        VECTORS[2][1] + "401617bc4f769381f86be40df0207a0a3e31ae0839497a5ac6d4252dfc35577f"
+    )
+    assert hashing.keccak_pairs(b"") == b""
+
+
+def test_hash_identifiers_vector(backend):
+    assert hashing.hash_identifiers(["16000000000000000001"]) == [
+        "c4e938ef7fdb4bb1ad0051be2f5450d653ed85f848a65519e724d1a814e53830"
+    ]
+
+
+def test_backends_agree():
+    backends = hashing.available_backends()
+    inputs = [os.urandom(size) for size in (0, 1, 31, 32, 64, 65, 136, 1000)]
+    reference = [hashing.keccak256(data) for data in inputs]
+    level = os.urandom(7 * hashing.NODE_SIZE)
+    expected_pairs = hashing.keccak_pairs(level)
+
+    previous = hashing.BACKEND
+    try:
+        for name, keccak in backends.items():
+            assert [keccak(data) for data in inputs] == reference, name
+            hashing.set_backend(name)
+            assert hashing.keccak_pairs(level) == expected_pairs, name
+    finally:
+        hashing.set_backend(previous)
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        hashing.set_backend("md5")
@@ -0,0 +1,50 @@
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+from backend import main, models
+from backend.services import import_service
+from backend.tests.factories import add_applicants, national_id
+
+
+def _ndjson(identifiers) -> io.StringIO:
+    return io.StringIO("".join(
+        json.dumps({"national_id": identifier, "full_name": "Test Applicant", "address": "Test Address", "wilaya_code": 16}) + "\n"
+        for identifier in identifiers
+    ))
+
+
+def test_counts(db):
+    add_applicants(db, {16: 2})
+    identifiers = [national_id(16, number) for number in range(5)] + [national_id(16, 4)]
+    text = io.StringIO(_ndjson(identifiers).getvalue() + "not json\n")
+
+    result = import_service.import_applicants(db, text, import_service.NDJSON, chunk_size=2)
+
+    assert (result["inserted"], result["duplicates"], result["rejected"]) == (3, 3, 1)
+    assert db.query(models.Applicant).count() == 5
+
+
+def test_concurrent_registration_counted_as_duplicate(db, monkeypatch):
+    real_insert = import_service._insert_ignoring_duplicates
+
+    def racing_insert(session, rows):
+        # Another request registers the first applicant after the existence check.
+        add_applicants(db, {16: 1})
+        return real_insert(session, rows)
+
+    monkeypatch.setattr(import_service, "_insert_ignoring_duplicates", racing_insert)
+    result = import_service.import_applicants(db, _ndjson([national_id(16, number) for number in range(3)]), import_service.NDJSON)
+
+    assert (result["inserted"], result["duplicates"]) == (2, 1)
+    assert db.query(models.Applicant).count() == 3
+
+
+def test_upload_not_utf8_refused_before_inserting(db):
+    body = _ndjson([national_id(16, 0)]).getvalue().encode() + b'{"national_id": "\xff"}\n'
+
+    response = TestClient(main.app).post("/v1/applicants/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 400
+    assert db.query(models.Applicant).count() == 0
@@ -0,0 +1,189 @@
+import asyncio
+import types
+
+import pytest
+from sqlalchemy import event as sa_event
+
+from backend import models
+from backend.database import engine
+from backend.services import batch_jobs, batch_service, merkle_queue
+from backend.services.merkle_service import applicant_leaves
+from backend.tests.factories import add_applicants, batch_event
+from indexer import listener
+
+
+def _run_pipeline(items, until, timeout=5.0):
+    """Feeds `items` through the worker and committer until `until()` holds (or times out)."""
+    pipeline = listener.IndexerPipeline(poll_interval=0.01, workers=1)
+
+    async def run():
+        tasks = [asyncio.create_task(pipeline.commit()), asyncio.create_task(pipeline.work())]
+        seq = 0
+        for item in items:
+            seq = await pipeline._emit(seq, item)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not until() and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        asyncio.run(run())
+    finally:
+        pipeline.prepare_pool.shutdown(wait=True)
+        pipeline.commit_pool.shutdown(wait=True)
+
+
+def _committed_event(db):
+    add_applicants(db, {16: 5})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    job, = batch_jobs.create_jobs(db, batch_service.build_batches([16], workers=1))
+    return batch_event(job, batch_id=1, block_number=10)
+
+
+def test_failed_save_is_retried_not_skipped(db, monkeypatch):
+    event = _committed_event(db)
+    real_save_batch = listener.save_batch
+    calls = []
+
+    def flaky_save_batch(session, prepared):
+        calls.append(prepared["event"].args.batchId)
+        if len(calls) == 1:
+            raise RuntimeError("database connection lost")
+        return real_save_batch(session, prepared)
+
+    monkeypatch.setattr(listener, "save_batch", flaky_save_batch)
+    _run_pipeline([event, listener.CursorMark(12)], until=lambda: listener.load_cursor() == 12)
+
+    assert calls == [1, 1]
+    assert db.query(models.Batch).filter(models.Batch.id == 1).count() == 1
+    assert db.query(models.Leaf).filter(models.Leaf.batch_id == 1).count() == 5
+    assert listener.load_cursor() == 12
+
+
+def test_cursor_stays_before_an_event_that_keeps_failing(db, monkeypatch):
+    event = _committed_event(db)
+    before = listener.load_cursor()
+
+    def failing_prepare(session, prepared_event):
+        raise RuntimeError("RPC node unreachable")
+
+    monkeypatch.setattr(listener, "prepare_batch", failing_prepare)
+    _run_pipeline([event, listener.CursorMark(12)], until=lambda: False, timeout=0.3)
+
+    assert listener.load_cursor() == before
+    assert db.query(models.Batch).count() == 0
+
+
+def test_skipped_event_advances_the_cursor(db):
+    event = _committed_event(db)
+    # A root that does not match the applicants is deliberately skipped.
+    event.args.merkleRoot = bytes(32)
+    _run_pipeline([event, listener.CursorMark(12)], until=lambda: listener.load_cursor() == 12)
+
+    assert listener.load_cursor() == 12
+    assert db.query(models.Batch).count() == 0
+
+
+class _RangeLimitedLogs:
+    """A BatchCommitted log source that, like many nodes, rejects ranges over `limit` blocks."""
+
+    def __init__(self, blocks: list, limit: int):
+        self.blocks = blocks
+        self.limit = limit
+        self.ranges = []
+
+    def BatchCommitted(self):
+        return self
+
+    def get_logs(self, from_block, to_block):
+        self.ranges.append((from_block, to_block))
+        if to_block - from_block + 1 > self.limit:
+            raise ValueError("query returned more than 10000 results")
+        matched = [block for block in self.blocks if from_block <= block <= to_block]
+        return [types.SimpleNamespace(blockNumber=block, logIndex=index) for index, block in reversed(list(enumerate(matched)))]
+
+
+def test_log_range_halves_until_the_node_accepts_it(monkeypatch):
+    logs = _RangeLimitedLogs(blocks=[3, 40, 41, 90], limit=30)
+    monkeypatch.setattr(listener, "batch_registry_contract", types.SimpleNamespace(events=logs))
+
+    events, end, chunk_size = listener.fetch_events(1, 500, 100)
+
+    assert logs.ranges == [(1, 100), (1, 50), (1, 25)]
+    assert (end, chunk_size) == (25, 25)
+    assert [event.blockNumber for event in events] == [3]
+
+    logs.limit = 0
+    with pytest.raises(ValueError):
+        listener.fetch_events(1, 500, 4)
+
+
+def test_backfill_grows_the_range_back_after_a_rejection(db, monkeypatch):
+    logs = _RangeLimitedLogs(blocks=[3, 40, 41, 90], limit=30)
+    monkeypatch.setattr(listener, "batch_registry_contract", types.SimpleNamespace(events=logs))
+    monkeypatch.setattr(listener, "w3", types.SimpleNamespace(eth=types.SimpleNamespace(block_number=100)))
+    monkeypatch.setattr(listener, "LOG_CHUNK_SIZE", 40)
+    monkeypatch.setattr(listener, "START_BLOCK", 1)
+    pipeline = listener.IndexerPipeline(poll_interval=0.01, workers=1, max_in_flight=1000)
+
+    async def run():
+        producer = asyncio.create_task(pipeline.produce())
+        items = []
+        while not items or not isinstance(items[-1], listener.CursorMark) or items[-1].block_number < 100:
+            items.append((await pipeline.queue.get())[1])
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        return items
+
+    try:
+        items = asyncio.run(run())
+    finally:
+        pipeline.prepare_pool.shutdown(wait=True)
+        pipeline.commit_pool.shutdown(wait=True)
+
+    # Rejected at 40 blocks, then 20, 40 (rejected, 20), 40 (rejected, 20)...
+    accepted = [(start, end) for start, end in logs.ranges if end - start + 1 <= 30]
+    assert accepted[0] == (1, 20)
+    assert all(end == start_next - 1 for (_, end), (start_next, _) in zip(accepted, accepted[1:]))
+    assert accepted[-1][1] == 100
+    # Every event once, in block order, each before the cursor mark covering it.
+    assert [item.blockNumber for item in items if not isinstance(item, listener.CursorMark)] == [3, 40, 41, 90]
+    marks = [item.block_number for item in items if isinstance(item, listener.CursorMark)]
+    assert marks == [end for _, end in accepted]
+
+
+def test_leaves_and_statuses_written_set_based(db, monkeypatch):
+    event = _committed_event(db)
+    applicants = db.query(models.Applicant).order_by(models.Applicant.queue_position).all()
+    # Hashed from the columns again, not copied from the leaf stored at queue time.
+    columns = [
+        types.SimpleNamespace(applicant_hash=a.applicant_hash, file_hash=a.file_hash, created_at=a.created_at, wilaya_code=a.wilaya_code)
+        for a in applicants
+    ]
+    expected_leaves = [leaf.hex() for leaf in applicant_leaves(columns)]
+    monkeypatch.setattr(listener, "STATUS_UPDATE_CHUNK_SIZE", 2)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((" ".join(statement.split()[:3]), executemany))
+
+    sa_event.listen(engine, "before_cursor_execute", capture)
+    try:
+        listener.handle_event(event)
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", capture)
+
+    db.expire_all()
+    leaves = db.query(models.Leaf).filter(models.Leaf.batch_id == 1).order_by(models.Leaf.offset).all()
+    # The real leaves the root was built from, not placeholders.
+    assert [(leaf.applicant_hash, leaf.leaf_hash, leaf.offset) for leaf in leaves] == [
+        (applicant.applicant_hash, leaf_hash, offset) for offset, (applicant, leaf_hash) in enumerate(zip(applicants, expected_leaves))
+    ]
+    assert {applicant.status for applicant in db.query(models.Applicant)} == {models.ApplicantStatus.BATCHED}
+    # One executemany for the five leaves, and one UPDATE per chunk of two applicants.
+    assert [executemany for start, executemany in statements if start == "INSERT INTO leaves"] == [True]
+    assert len([start for start, _ in statements if start == "UPDATE applicants SET"]) == 3
@@ -0,0 +1,102 @@
+from backend import models
+from backend.database import SessionLocal
+from backend.services import merkle_queue
+from backend.services.merkle_service import MerkleTree
+from backend.tests.factories import add_applicants
+
+
+def _queued_leaves(db, wilaya_code: int, epoch: int) -> list:
+    db.expire_all()
+    return [
+        row.leaf_hash
+        for row in db.query(models.Applicant.leaf_hash)
+        .filter(models.Applicant.wilaya_code == wilaya_code, models.Applicant.queue_epoch == epoch)
+        .order_by(models.Applicant.queue_position)
+    ]
+
+
+def _job(db) -> int:
+    job = models.BatchJob(wilaya_code=16, batch_size=1, merkle_root="00" * 32, batch_metadata="{}")
+    db.add(job)
+    db.flush()
+    return job.id
+
+
+def test_root_persists_across_sessions(db):
+    add_applicants(db, {16: 13})
+    ids = [row.id for row in db.query(models.Applicant.id).order_by(models.Applicant.id)]
+
+    for start in (0, 1, 4, 5, 12):
+        # Each append restores the frontier another session stored.
+        with SessionLocal() as session:
+            merkle_queue.mark_eligible_where(session, applicant_ids=ids[:start + 1], chunk_size=2)
+            session.commit()
+        leaves = _queued_leaves(db, 16, 0)
+        assert len(leaves) == start + 1
+        assert merkle_queue.current_root(db, 16) == MerkleTree(leaves).get_root()
+
+
+def test_epoch_sealed_at_the_size_limit(db):
+    add_applicants(db, {16: 9})
+    ids = [row.id for row in db.query(models.Applicant.id).order_by(models.Applicant.id)]
+
+    merkle_queue.mark_eligible_where(db, applicant_ids=ids[:4], max_size=4)
+    db.commit()
+    # Full, but sealed only when the next leaf needs room.
+    assert db.query(models.QueueSnapshot).count() == 0
+    full_root = merkle_queue.current_root(db, 16)
+
+    merkle_queue.mark_eligible_where(db, applicant_ids=ids[4:], max_size=4)
+    db.commit()
+
+    snapshots = db.query(models.QueueSnapshot).order_by(models.QueueSnapshot.epoch).all()
+    assert [(snapshot.epoch, snapshot.batch_size) for snapshot in snapshots] == [(0, 4), (1, 4)]
+    assert snapshots[0].merkle_root == full_root.hex()
+    for snapshot in snapshots:
+        assert snapshot.merkle_root == MerkleTree(_queued_leaves(db, 16, snapshot.epoch)).get_root().hex()
+    last = db.get(models.Applicant, ids[8])
+    assert (last.queue_epoch, last.queue_position) == (2, 0)
+    assert merkle_queue.current_root(db, 16) == MerkleTree(_queued_leaves(db, 16, 2)).get_root()
+
+
+def test_freeze_seals_the_open_epoch(db):
+    add_applicants(db, {16: 5})
+    ids = [row.id for row in db.query(models.Applicant.id).order_by(models.Applicant.id)]
+    merkle_queue.mark_eligible_where(db, applicant_ids=ids[:3])
+    db.commit()
+
+    snapshot = merkle_queue.freeze(db, 16)
+    db.commit()
+
+    assert (snapshot.epoch, snapshot.batch_size) == (0, 3)
+    assert snapshot.merkle_root == MerkleTree(_queued_leaves(db, 16, 0)).get_root().hex()
+    assert merkle_queue.current_root(db, 16) is None
+    assert merkle_queue.freeze(db, 16) is None
+
+    merkle_queue.mark_eligible_where(db, applicant_ids=ids[3:])
+    db.commit()
+    slots = db.query(models.Applicant.queue_epoch, models.Applicant.queue_position).filter(models.Applicant.id.in_(ids[3:]))
+    assert [tuple(slot) for slot in slots.order_by(models.Applicant.id)] == [(1, 0), (1, 1)]
+
+
+def test_claim_snapshot(db):
+    add_applicants(db, {16: 2})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    merkle_queue.freeze(db, 16)
+    first, second = _job(db), _job(db)
+    db.commit()
+    assert [snapshot.epoch for snapshot in merkle_queue.uncommitted_snapshots(db, 16)] == [0]
+
+    assert merkle_queue.claim_snapshot(db, 16, 0, first, None)
+    # Already claimed: a second request gets nothing.
+    assert not merkle_queue.claim_snapshot(db, 16, 0, second, None)
+    db.commit()
+    assert merkle_queue.uncommitted_snapshots(db, 16) == []
+
+    # A job that failed before sending frees the snapshot for a replacement.
+    db.get(models.BatchJob, first).status = models.BatchJobStatus.FAILED
+    db.commit()
+    assert [snapshot.epoch for snapshot in merkle_queue.uncommitted_snapshots(db, 16)] == [0]
+    assert merkle_queue.claim_snapshot(db, 16, 0, second, first)
+    db.commit()
+    assert db.get(models.QueueSnapshot, (16, 0)).job_id == second
@@ -0,0 +1,40 @@
+import secrets
+
+import pytest
+
+from backend import models
+from backend.services import batch_service, merkle_queue
+from backend.services.merkle_service import IncrementalMerkleRoot, MerkleTree, applicant_leaves
+from backend.tests.factories import add_applicants
+
+
+def test_incremental_root_matches_the_tree():
+    leaves = [secrets.token_bytes(32) for _ in range(70)]
+    accumulator = IncrementalMerkleRoot()
+    for count, leaf in enumerate(leaves, start=1):
+        accumulator.append(leaf)
+        assert accumulator.get_root() == MerkleTree(leaves[:count]).get_root()
+        # Only the frontier is kept: at most one node per level.
+        assert len(accumulator.frontier) <= count.bit_length()
+        restored = IncrementalMerkleRoot.from_bytes(count, accumulator.to_bytes())
+        assert restored.get_root() == accumulator.get_root()
+
+
+def test_frontier_of_the_wrong_size_rejected():
+    with pytest.raises(ValueError):
+        IncrementalMerkleRoot.from_bytes(3, secrets.token_bytes(32))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+def test_unqueued_applicants_streamed_in_chunks(db, chunk_size):
+    add_applicants(db, {16: 7, 31: 2})
+    # Made eligible outside mark_eligible_where, so never appended to a queue.
+    db.query(models.Applicant).update({models.Applicant.status: models.ApplicantStatus.ELIGIBLE})
+    db.commit()
+    rows = batch_service.applicants_query(db).filter(models.Applicant.wilaya_code == 16).order_by(models.Applicant.id).all()
+
+    assert merkle_queue.append_unqueued(db, 16, chunk_size=chunk_size) == 7
+    db.commit()
+
+    assert merkle_queue.current_root(db, 16) == MerkleTree(list(applicant_leaves(rows))).get_root()
+    assert merkle_queue.current_root(db, 31) is None
@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from backend import main
+from backend.services import batch_jobs, batch_service, merkle_queue, metrics
+from backend.tests.factories import add_applicants, batch_event, national_id
+from indexer import listener
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _provider(result=None, error=None):
+    """A web3 provider answering every call with `result`, or with a JSON-RPC error."""
+    from web3.providers.base import BaseProvider
+
+    class Provider(BaseProvider):
+        def make_request(self, method, params):
+            if error is not None:
+                return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32000, "message": error}}
+            return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+    return Provider()
+
+
+def test_request_latency_and_queries_by_route_template(db):
+    add_applicants(db, {16: 1})
+    route = "/v1/applicants/{national_id}/status"
+    before = _sample("aadl_http_request_duration_seconds_count", method="GET", route=route, status="200")
+    queries_before = _sample("aadl_http_db_queries_per_request_sum", method="GET", route=route)
+    client = TestClient(main.app)
+
+    client.get(f"/v1/applicants/{national_id(16, 0)}/status")
+    scrape = client.get("/metrics")
+
+    assert _sample("aadl_http_request_duration_seconds_count", method="GET", route=route, status="200") == before + 1
+    assert _sample("aadl_http_db_queries_per_request_sum", method="GET", route=route) > queries_before
+    assert scrape.headers["content-type"] == metrics.CONTENT_TYPE_LATEST
+    # Identifiers never become label values.
+    assert national_id(16, 0) not in scrape.text
+    assert "aadl_status_cache_misses" in scrape.text
+
+
+def test_rpc_calls_timed_by_method():
+    from web3 import Web3
+
+    w3 = metrics.instrument_web3(Web3(_provider(result="0xaa36a7")))
+    before = _sample("aadl_rpc_request_duration_seconds_count", method="eth_chainId")
+    errors = _sample("aadl_rpc_errors_total", method="eth_blockNumber")
+
+    assert w3.eth.chain_id == 11155111
+    failing = metrics.instrument_web3(Web3(_provider(error="rate limited")))
+    with pytest.raises(Exception):
+        failing.eth.block_number
+
+    assert _sample("aadl_rpc_request_duration_seconds_count", method="eth_chainId") == before + 1
+    assert _sample("aadl_rpc_errors_total", method="eth_blockNumber") == errors + 1
+
+
+def test_indexer_lag_and_ingest(db):
+    metrics.set_indexer_position(head=120, cursor=100)
+    assert _sample("aadl_indexer_lag_blocks") == 20
+    metrics.set_indexer_position(cursor=125)
+    assert _sample("aadl_indexer_lag_blocks") == 0
+
+    indexed = _sample("aadl_indexer_batches_indexed_total")
+    builds = _sample("aadl_merkle_build_duration_seconds_count", source="indexer")
+    leaves = _sample("aadl_merkle_batch_size_leaves_sum", source="indexer")
+    add_applicants(db, {16: 5})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    job, = batch_jobs.create_jobs(db, batch_service.build_batches([16], workers=1))
+    listener.handle_event(batch_event(job, batch_id=1))
+
+    assert _sample("aadl_indexer_batches_indexed_total") == indexed + 1
+    assert _sample("aadl_merkle_build_duration_seconds_count", source="indexer") == builds + 1
+    assert _sample("aadl_merkle_batch_size_leaves_sum", source="indexer") == leaves + 5
+
+
+def test_commit_gas_recorded_from_the_receipt(db):
+    add_applicants(db, {16: 2})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    job, = batch_jobs.create_jobs(db, batch_service.build_batches([16], workers=1))
+    gas = _sample("aadl_commit_batch_gas_used_sum")
+
+    batch_jobs._record_receipt(job.id, {"status": 1, "gasUsed": 91_000})
+
+    assert _sample("aadl_commit_batch_gas_used_sum") == gas + 91_000
@@ -0,0 +1,61 @@
+import secrets
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, models
+from backend.services import proof_codec, proof_store
+from backend.services.merkle_service import MerkleTree
+
+
+@pytest.fixture
+def batch(db):
+    """A committed 6-leaf batch with its leaves but no stored tree yet."""
+    leaves = [secrets.token_bytes(32) for _ in range(6)]
+    tree = MerkleTree(leaves)
+    db.add(models.Batch(id=1, merkle_root=tree.get_root().hex(), batch_size=len(leaves)))
+    db.flush()
+    for offset, leaf in enumerate(leaves):
+        db.add(models.Leaf(applicant_hash="0x" + secrets.token_hex(32), leaf_hash=leaf.hex(), batch_id=1, offset=offset))
+    db.commit()
+    return tree
+
+
+def test_multiproof_from_read_session(db, batch):
+    proof_store.save_tree(db, 1, batch)
+    db.commit()
+    read_sessions = []
+
+    def counting_read_db():
+        yield from main.get_read_db()
+        read_sessions.append(True)
+
+    main.app.dependency_overrides[main.get_read_db] = counting_read_db
+    try:
+        response = TestClient(main.app).get("/v1/batches/1/multiproof", params={"offset": [1, 4]})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    body = response.json()
+    root = proof_codec.process_multiproof(
+        body["leaf_count"], body["offsets"], [bytes.fromhex(h) for h in body["leaves"]], [bytes.fromhex(h) for h in body["nodes"]]
+    )
+    assert root == batch.get_root()
+    assert read_sessions == [True]
+
+
+def test_missing_tree_is_backfilled_without_replica(db, batch):
+    response = TestClient(main.app).get("/v1/batches/1/multiproof", params={"offset": [0]})
+
+    assert response.status_code == 200
+    assert db.query(models.MerkleNode).filter(models.MerkleNode.batch_id == 1).count() > 0
+
+
+def test_missing_tree_not_written_through_replica(db, batch, monkeypatch):
+    monkeypatch.setattr(main, "has_read_replica", lambda: True)
+
+    response = TestClient(main.app).get("/v1/batches/1/multiproof", params={"offset": [0]})
+
+    assert response.status_code == 503
+    assert db.query(models.MerkleNode).count() == 0
@@ -0,0 +1,98 @@
+import secrets
+
+import pytest
+
+from backend.services import proof_codec
+from backend.services.merkle_service import MerkleTree
+
+
+def _tree(leaf_count: int):
+    leaves = [secrets.token_bytes(32) for _ in range(leaf_count)]
+    return leaves, MerkleTree(leaves)
+
+
+def _multiproof(leaves, tree, offsets):
+    nodes = [tree.node(level, position) for level, position in proof_codec.multiproof_positions(len(leaves), offsets)]
+    return proof_codec.encode_multiproof(len(leaves), offsets, [leaves[i] for i in offsets], nodes)
+
+
+@pytest.mark.parametrize("leaf_count", [1, 2, 5, 7, 37])
+def test_proof_round_trip(leaf_count):
+    leaves, tree = _tree(leaf_count)
+    for offset in range(leaf_count):
+        nodes, index = proof_codec.decode_proof(proof_codec.encode_proof(tree.get_proof_by_index(offset), offset))
+        assert index == offset
+        assert proof_codec.process_proof(leaves[offset], nodes, index) == tree.get_root()
+
+
+def test_proof_of_last_leaf_on_odd_level():
+    # 5 leaves: the last leaf has no right neighbour and is paired with itself.
+    leaves, tree = _tree(5)
+    nodes, index = proof_codec.decode_proof(proof_codec.encode_proof(tree.get_proof_by_index(4), 4))
+    assert nodes[0] == leaves[4]
+    assert proof_codec.process_proof(leaves[4], nodes, index) == tree.get_root()
+
+
+def test_single_leaf_proof():
+    leaves, tree = _tree(1)
+    data = proof_codec.encode_proof([], 0)
+    assert data == bytes((proof_codec.FORMAT_VERSION, 0))
+    assert proof_codec.decode_proof(data) == ([], 0)
+    assert proof_codec.process_proof(leaves[0], [], 0) == tree.get_root() == leaves[0]
+
+
+@pytest.mark.parametrize("leaf_count, offsets", [(1, [0]), (5, [4]), (5, [0, 4]), (7, [1, 2, 6]), (37, [0, 17, 18, 36])])
+def test_multiproof_round_trip(leaf_count, offsets):
+    leaves, tree = _tree(leaf_count)
+    decoded = proof_codec.decode_multiproof(_multiproof(leaves, tree, offsets))
+    assert decoded[:3] == (leaf_count, offsets, [leaves[i] for i in offsets])
+    assert proof_codec.process_multiproof(*decoded) == tree.get_root()
+
+
+def test_multiproof_positions_deduplicate():
+    # Siblings 0 and 1 prove each other; their parents share the node above.
+    assert proof_codec.multiproof_positions(8, [0, 1, 2, 3]) == [(2, 1)]
+    assert proof_codec.multiproof_positions(8, [3, 0, 3, 1]) == proof_codec.multiproof_positions(8, [0, 1, 3])
+    assert proof_codec.multiproof_positions(8, [0, 1, 3]) == [(0, 2), (2, 1)]
+    # The last node of an odd level is paired with itself and needs no sibling.
+    assert proof_codec.multiproof_positions(5, [4]) == [(2, 0)]
+    assert proof_codec.multiproof_positions(1, [0]) == []
+    with pytest.raises(ValueError):
+        proof_codec.multiproof_positions(5, [5])
+
+
+def test_truncated_or_garbled_proof_rejected():
+    leaves, tree = _tree(5)
+    data = proof_codec.encode_proof(tree.get_proof_by_index(2), 2)
+    for bad in (b"", data[:1], data[:-1], data + b"\x00", b"\x02" + data[1:]):
+        with pytest.raises(ValueError):
+            proof_codec.decode_proof(bad)
+
+    nodes, index = proof_codec.decode_proof(data)
+    garbled = [bytes(32)] + nodes[1:]
+    assert proof_codec.process_proof(leaves[2], garbled, index) != tree.get_root()
+
+
+def test_truncated_or_garbled_multiproof_rejected():
+    leaves, tree = _tree(7)
+    data = _multiproof(leaves, tree, [1, 2, 6])
+    bad_inputs = [
+        b"",
+        data[:8],                  # cut inside the header
+        data[:12],                 # cut inside the offsets
+        data[:-1],                 # cut inside a node
+        b"\x02" + data[1:],        # unknown version
+        data[:9] + (6).to_bytes(4, "big") + data[13:],        # offsets out of order
+        data[:17] + (7).to_bytes(4, "big") + data[21:],       # offset outside the tree
+    ]
+    for bad in bad_inputs:
+        with pytest.raises(ValueError):
+            proof_codec.process_multiproof(*proof_codec.decode_multiproof(bad))
+
+    leaf_count, offsets, proven, nodes = proof_codec.decode_multiproof(data)
+    with pytest.raises(ValueError):
+        proof_codec.process_multiproof(leaf_count, offsets, proven, nodes[:-1])
+    with pytest.raises(ValueError):
+        proof_codec.process_multiproof(leaf_count, offsets, proven, nodes + [bytes(32)])
+    with pytest.raises(ValueError):
+        proof_codec.process_multiproof(leaf_count, offsets, proven[:-1], nodes)
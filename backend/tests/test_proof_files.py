@@ -0,0 +1,111 @@
+import os
+import secrets
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, models
+from backend.services import batch_jobs, batch_service, merkle_queue, proof_codec, proof_files, proof_store
+from backend.services.merkle_service import MerkleTree
+from backend.services.status_cache import status_cache
+from backend.tests.factories import add_applicants, batch_event, national_id
+from indexer import listener
+
+
+def _part(leaf_count: int, position_base: int = 0, root_proof=None) -> dict:
+    return {
+        "position_base": position_base,
+        "tree": MerkleTree([secrets.token_bytes(32) for _ in range(leaf_count)]),
+        "root_proof": root_proof or [],
+        "applicant_hashes": [secrets.token_hex(32) for _ in range(leaf_count)],
+    }
+
+
+def _add_batch(db, batch_id: int, root: bytes, batch_size: int):
+    db.add(models.Batch(id=batch_id, merkle_root=root.hex(), batch_size=batch_size))
+    db.flush()
+
+
+@pytest.mark.parametrize("leaf_count", [1, 2, 7, 64])
+def test_plain_batch_matches_proof_store(db, leaf_count):
+    part = _part(leaf_count)
+    tree = part["tree"]
+    _add_batch(db, 1, tree.get_root(), leaf_count)
+    proof_store.save_tree(db, 1, tree)
+    db.commit()
+    proof_files.write(1, [part])
+
+    proof_file = proof_files.open_batch(1)
+    assert proof_file is not None and not proof_file.aggregated
+    for offset in range(leaf_count):
+        found = proof_file.proof(offset)
+        nodes = [bytes(node) for node in found["merkle_proof"]]
+        assert (found["part"], found["offset"], found["root_proof"]) == (0, offset, [])
+        assert nodes == proof_store.get_proof(db, 1, offset, leaf_count)
+        assert proof_codec.process_proof(tree.node(0, offset), nodes, offset) == tree.get_root()
+        assert proof_file.offset_of(part["applicant_hashes"][offset]) == offset
+    assert proof_file.offset_of(secrets.token_hex(32)) is None
+    with pytest.raises(ValueError):
+        proof_file.proof(leaf_count)
+
+
+def test_aggregated_batch_matches_proof_store(db):
+    sizes = [5, 3, 8]
+    bases = proof_store.part_bases(sizes)
+    parts = [_part(size, base) for size, base in zip(sizes, bases)]
+    top = MerkleTree([part["tree"].get_root() for part in parts])
+    for index, part in enumerate(parts):
+        part["root_proof"] = top.get_proof_by_index(index)
+    _add_batch(db, 1, top.get_root(), sum(sizes))
+    for part in parts:
+        proof_store.save_tree(db, 1, part["tree"], part["position_base"])
+    db.commit()
+    proof_files.write(1, parts, aggregated=True)
+
+    proof_file = proof_files.open_batch(1)
+    assert proof_file.aggregated and proof_file.bases == bases
+    assert bases[1] > 0
+    for index, part in enumerate(parts):
+        tree = part["tree"]
+        for offset in range(len(tree)):
+            found = proof_file.proof(part["position_base"] + offset)
+            nodes = [bytes(node) for node in found["merkle_proof"]]
+            root_proof = [bytes(node) for node in found["root_proof"]]
+            assert (found["part"], found["offset"], found["root"]) == (index, offset, tree.get_root())
+            assert nodes == proof_store.get_proof(db, 1, offset, len(tree), part["position_base"])
+            assert root_proof == part["root_proof"]
+            # Encoded as one path, the way the status endpoint serves it.
+            path = offset + (index << len(nodes))
+            assert proof_codec.process_proof(tree.node(0, offset), nodes + root_proof, path) == top.get_root()
+
+
+@pytest.mark.parametrize("damage", ["missing", "truncated", "empty"])
+def test_status_falls_back_to_the_database(db, damage):
+    add_applicants(db, {16: 5})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    job, = batch_jobs.create_jobs(db, batch_service.build_batches([16], workers=1))
+    listener.handle_event(batch_event(job, batch_id=1))
+    path = proof_files.path_for(1)
+    assert os.path.exists(path)
+    identifier = national_id(16, 3)
+
+    client = TestClient(main.app)
+    from_file = client.get(f"/v1/applicants/{identifier}/status").json()
+    assert from_file["merkle_proof"]
+
+    if damage == "missing":
+        os.remove(path)
+    else:
+        with open(path, "r+b") as f:
+            f.truncate(0 if damage == "empty" else os.path.getsize(path) - 1)
+    proof_files._open_files.clear()
+    status_cache.clear()
+
+    assert proof_files.open_batch(1) is None
+    from_db = client.get(f"/v1/applicants/{identifier}/status").json()
+    assert from_db == from_file
+
+    leaf = bytes.fromhex(db.query(models.Leaf).filter(models.Leaf.offset == from_db["offset"]).one().leaf_hash.removeprefix("0x"))
+    nodes = [bytes.fromhex(node) for node in from_db["merkle_proof"]]
+    assert proof_codec.process_proof(leaf, nodes, from_db["offset"]).hex() == from_db["merkle_root"].removeprefix("0x")
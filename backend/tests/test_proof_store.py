@@ -0,0 +1,72 @@
+import secrets
+
+import pytest
+from sqlalchemy import event
+
+from backend import models
+from backend.database import engine
+from backend.services import proof_store
+from backend.services.merkle_service import MerkleTree
+
+
+def _store_tree(db, batch_id: int, leaf_count: int, position_base: int = 0) -> MerkleTree:
+    tree = MerkleTree([secrets.token_bytes(32) for _ in range(leaf_count)])
+    if db.get(models.Batch, batch_id) is None:
+        db.add(models.Batch(id=batch_id, merkle_root="0x" + secrets.token_hex(32), batch_size=leaf_count))
+        db.flush()
+    proof_store.save_tree(db, batch_id, tree, position_base)
+    db.commit()
+    return tree
+
+
+@pytest.mark.parametrize("leaf_count", [1, 2, 5, 37, 64])
+def test_get_proof_matches_the_tree(db, leaf_count):
+    tree = _store_tree(db, 1, leaf_count)
+    for offset in range(leaf_count):
+        assert proof_store.get_proof(db, 1, offset, leaf_count) == tree.get_proof_by_index(offset)
+
+
+def test_get_proof_of_a_shifted_part(db):
+    # Two parts of an aggregated batch, the second starting at position 8.
+    first = _store_tree(db, 1, 7, position_base=0)
+    second = _store_tree(db, 1, 5, position_base=8)
+    for offset in range(7):
+        assert proof_store.get_proof(db, 1, offset, 7, 0) == first.get_proof_by_index(offset)
+    for offset in range(5):
+        assert proof_store.get_proof(db, 1, offset, 5, 8) == second.get_proof_by_index(offset)
+
+
+def test_get_nodes_and_get_proofs(db, monkeypatch):
+    tree = _store_tree(db, 1, 37)
+    positions = [(2, 9), (0, 36), (0, 37), (1, 0), (5, 0)]
+    assert proof_store.get_nodes(db, 1, positions) == [tree.node(level, min(p, tree.level_size(level) - 1)) for level, p in positions]
+    # Several lookup chunks give the same answer as one.
+    monkeypatch.setattr(proof_store, "NODE_LOOKUP_CHUNK_SIZE", 2)
+    offsets = [0, 3, 17, 36]
+    assert proof_store.get_proofs(db, 1, offsets, 37) == {offset: tree.get_proof_by_index(offset) for offset in offsets}
+
+
+def test_missing_tree_returns_none(db):
+    assert proof_store.get_proof(db, 42, 0, 8) is None
+    assert proof_store.get_nodes(db, 42, [(0, 1)]) is None
+
+
+def test_proof_read_is_a_full_key_lookup(db):
+    _store_tree(db, 1, 1000)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "merkle_nodes" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        proof_store.get_proof(db, 1, 123, 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    (statement, parameters), = statements
+    with engine.connect() as connection:
+        plan = " | ".join(row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+    assert "level=? AND position=?" in plan, plan
+    assert "(batch_id=?)" not in plan, plan
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import create_engine
+
+from backend import query_plans
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/plans.db")
+    yield engine
+    engine.dispose()
+
+
+def test_hot_queries_use_their_indexes(scratch_engine):
+    results = query_plans.check_plans(scratch_engine, 20_000)
+
+    assert "proof store: sibling nodes" in [name for name, _, _ in results]
+    assert [(name, problems) for name, _, problems in results if problems] == []
+
+
+def test_dropped_index_is_reported(scratch_engine):
+    query_plans.check_plans(scratch_engine, 5_000)
+    with scratch_engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_applicants_status_wilaya_id")
+        connection.exec_driver_sql("ANALYZE")
+        plan, problems = query_plans.sqlite_plan_problems(
+            connection, "SELECT id FROM applicants WHERE status = 'ELIGIBLE' AND wilaya_code = 16 ORDER BY id",
+            True, "applicants", ("status", "wilaya_code", "id")
+        )
+
+    assert problems
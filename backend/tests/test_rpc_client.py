@@ -0,0 +1,150 @@
+import json
+
+import pytest
+
+from backend.services import rpc_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    rpc_client.shutdown()
+    yield
+    rpc_client.shutdown()
+
+
+def test_default_url_read_when_client_is_built(monkeypatch):
+    # As if a .env setting it was loaded after this module was imported.
+    monkeypatch.setenv("SEPOLIA_RPC_URL", "http://127.0.0.1:8545")
+    client = rpc_client.get_client()
+
+    assert client.url == "http://127.0.0.1:8545"
+    assert rpc_client.get_client("http://127.0.0.1:8545") is client
+
+    monkeypatch.delenv("SEPOLIA_RPC_URL")
+    rpc_client.shutdown()
+    with pytest.raises(ConnectionError):
+        rpc_client.get_client()
+
+
+class _FakeNode:
+    """A `requests` transport answering JSON-RPC from `results`, recording each HTTP POST."""
+
+    def __init__(self, results: dict):
+        import requests
+
+        node = self
+        self.results = results
+        self.posts = []
+
+        class Adapter(requests.adapters.BaseAdapter):
+            def send(self, request, **kwargs):
+                body = json.loads(request.body)
+                node.posts.append(body)
+                answers = [node.answer(call) for call in body] if isinstance(body, list) else node.answer(body)
+                response = requests.Response()
+                response.status_code = 200
+                response._content = json.dumps(answers).encode()
+                response.headers["Content-Type"] = "application/json"
+                return response
+
+            def close(self):
+                pass
+
+        self.adapter = Adapter()
+
+    def answer(self, call: dict) -> dict:
+        result = self.results[call["method"]]
+        if isinstance(result, Exception):
+            return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32000, "message": str(result)}}
+        return {"jsonrpc": "2.0", "id": call["id"], "result": result}
+
+    def methods(self) -> list:
+        return [[call["method"] for call in post] if isinstance(post, list) else post["method"] for post in self.posts]
+
+
+def _client(results: dict):
+    node = _FakeNode(results)
+    client = rpc_client.get_client("http://node.test:8545")
+    client._session.mount("http://", node.adapter)
+    return client, node
+
+
+HISTORY = {
+    "oldestBlock": "0x1",
+    "baseFeePerGas": ["0x3b9aca00", "0x77359400"],  # 1 gwei, then 2 gwei for the next block
+    "gasUsedRatio": [0.5],
+    "reward": [["0x77359400"], ["0xb2d05e00"], ["0x3b9aca00"]],  # 2, 3 and 1 gwei tips
+}
+
+
+def test_independent_calls_share_one_round_trip():
+    client, node = _client({"eth_getBalance": "0x10", "eth_feeHistory": HISTORY})
+
+    balance, history = client.batch((client.w3.eth.get_balance, ("0x" + "11" * 20,)), client.fee_history_call())
+
+    assert balance == 16
+    assert history["baseFeePerGas"][-1] == 2 * rpc_client.GWEI
+    assert node.methods() == [["eth_getBalance", "eth_feeHistory"]]
+
+
+def test_raw_batch_keeps_null_and_failed_results_apart():
+    client, node = _client({"eth_getTransactionReceipt": None, "eth_chainId": ValueError("rate limited")})
+
+    results = client.raw_batch(("eth_getTransactionReceipt", ["0x" + "ab" * 32]), ("eth_chainId", []))
+
+    assert results == [None, None]
+    assert node.methods() == [["eth_getTransactionReceipt", "eth_chainId"]]
+
+
+def test_chain_id_and_fees_cached(monkeypatch):
+    client, node = _client({"eth_chainId": "0xaa36a7", "eth_feeHistory": HISTORY})
+
+    assert client.chain_id == client.chain_id == 11155111
+    fees = client.fees()
+    assert client.fees() == fees
+    assert node.methods() == ["eth_chainId", "eth_feeHistory"]
+
+    monkeypatch.setattr(rpc_client, "FEE_CACHE_SECONDS", -1)
+    client.fees()
+    assert node.methods()[-1] == "eth_feeHistory"
+
+
+def test_fees_from_history(monkeypatch):
+    history = {"baseFeePerGas": [1 * rpc_client.GWEI, 2 * rpc_client.GWEI], "reward": [[2 * rpc_client.GWEI], [3 * rpc_client.GWEI], [rpc_client.GWEI]]}
+    # Twice the next base fee plus the median tip.
+    assert rpc_client.fees_from_history(history) == {"maxFeePerGas": 6 * rpc_client.GWEI, "maxPriorityFeePerGas": 2 * rpc_client.GWEI}
+    # Empty blocks: the minimum tip.
+    assert rpc_client.fees_from_history({"baseFeePerGas": [rpc_client.GWEI], "reward": []})["maxPriorityFeePerGas"] == rpc_client.GWEI
+
+    monkeypatch.setattr(rpc_client, "FEE_MAX_GWEI", 5)
+    assert rpc_client.fees_from_history(history) == {"maxFeePerGas": 5 * rpc_client.GWEI, "maxPriorityFeePerGas": 2 * rpc_client.GWEI}
+
+
+def test_transport_errors_retried_rpc_errors_not(monkeypatch):
+    monkeypatch.setattr(rpc_client.time, "sleep", lambda seconds: None)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("connection reset")
+        return "ok"
+
+    assert rpc_client.with_retry(flaky, retries=5, backoff=0.01) == "ok"
+    assert len(attempts) == 3
+
+    def rejected():
+        attempts.append(1)
+        raise ValueError("execution reverted")
+
+    with pytest.raises(ValueError):
+        rpc_client.with_retry(rejected, retries=5, backoff=0.01)
+    assert len(attempts) == 4
+
+    def down():
+        attempts.append(1)
+        raise ConnectionError("connection refused")
+
+    with pytest.raises(ConnectionError):
+        rpc_client.with_retry(down, retries=2, backoff=0.01)
+    assert len(attempts) == 7
@@ -0,0 +1,72 @@
+import time
+
+from backend.services.status_cache import MemorySharedBackend, StatusCache
+
+
+def _pair():
+    shared = MemorySharedBackend()
+    return StatusCache(ttl=60, shared=shared), StatusCache(ttl=60, shared=shared)
+
+
+def test_invalidation_reaches_other_instances():
+    indexer, api = _pair()
+    api.set("0xabc", {"status": "ELIGIBLE"})
+    assert api.get("0xabc") == {"status": "ELIGIBLE"}
+
+    indexer.invalidate(["0xabc"])
+
+    assert api.get("0xabc") is None
+    api.set("0xabc", {"status": "BATCHED"})
+    assert api.get("0xabc") == {"status": "BATCHED"}
+    assert indexer.get("0xabc") == {"status": "BATCHED"}
+
+
+def test_local_entry_served_until_invalidated():
+    writer, reader = _pair()
+    writer.set("0xabc", {"status": "ELIGIBLE"})
+
+    assert reader.get("0xabc") == {"status": "ELIGIBLE"}
+    assert reader.get("0xabc") == {"status": "ELIGIBLE"}
+    assert (reader.shared_hits, reader.hits) == (1, 1)
+
+    writer.invalidate(["0xabc"])
+    writer.invalidate(["0xabc"])
+    assert reader.get("0xabc") is None
+
+
+def test_other_hashes_stay_cached():
+    indexer, api = _pair()
+    api.set("0xabc", {"status": "ELIGIBLE"})
+    api.set("0xdef", {"status": "ELIGIBLE"})
+
+    indexer.invalidate(["0xabc"])
+
+    assert api.get("0xabc") is None
+    assert api.get("0xdef") == {"status": "ELIGIBLE"}
+    assert api.hits == 1
+
+
+def test_local_only_cache_keeps_final_statuses_only():
+    cache = StatusCache(ttl=60)
+    cache.set("0xabc", {"status": "BATCHED"}, final=True)
+    cache.set("0xdef", {"status": "ELIGIBLE"})
+
+    assert cache.get("0xabc") == {"status": "BATCHED"}
+    # Another process may move it on without this one hearing about it.
+    assert cache.get("0xdef") is None
+    cache.invalidate(["0xabc"])
+    assert cache.get("0xabc") is None
+
+
+def test_memory_backend_expires_keys(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    backend = MemorySharedBackend()
+    backend.set("kept", "1", ttl=100)
+    backend.set_many({"a": "1", "b": "2"}, ttl=10)
+
+    now[0] += 20
+    assert backend.get_many(["kept", "a"]) == ["1", None]
+    # Expired keys nobody reads are swept on later writes.
+    backend.set_many({f"k{i}": "x" for i in range(MemorySharedBackend.SWEEP_INTERVAL)}, ttl=10)
+    assert len(backend) == 1 + MemorySharedBackend.SWEEP_INTERVAL
@@ -0,0 +1,85 @@
+import os
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, models
+from backend.services import batch_jobs, blockchain_service, merkle_queue, tracing
+from backend.tests.factories import add_applicants, batch_event, national_id
+from indexer import listener
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Finished spans, recorded in memory instead of exported."""
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "_tracer", provider.get_tracer("tests"))
+    yield exporter
+    provider.shutdown()
+
+
+def test_batch_lifecycle_is_one_trace_joined_by_the_indexer(db, spans, monkeypatch):
+    add_applicants(db, {16: 3})
+    merkle_queue.mark_eligible_where(db, wilaya_code=16)
+    db.commit()
+    receipts = []
+
+    def fake_submit(merkle_root, wilaya_code, batch_size, metadata, nonce_floor, on_signed):
+        on_signed("ab" * 32, "f8" * 40, nonce_floor)
+        return "ab" * 32
+
+    # Jobs are submitted on the request's thread, still inside its trace.
+    monkeypatch.setattr(batch_jobs, "_submitter", types.SimpleNamespace(submit=lambda call, *args: call(*args)))
+    monkeypatch.setattr(blockchain_service, "submit_batch_root", fake_submit)
+    monkeypatch.setattr(blockchain_service.receipt_watcher, "watch", lambda tx_hash, callback: receipts.append(callback))
+
+    job_id, = [job["job_id"] for job in TestClient(main.app).post("/v1/batches/", params={"aggregate": False}).json()["jobs"]]
+    receipts[0]({"status": 1, "gasUsed": 80_000})
+    listener.handle_event(batch_event(db.get(models.BatchJob, job_id), batch_id=7))
+
+    by_name = {span.name: span for span in spans.get_finished_spans()}
+    trigger = by_name["batch.trigger"]
+    for name in ("batch.find_wilayas", "batch.build", "batch.freeze", "batch.create_jobs", "batch.submit"):
+        assert by_name[name].context.trace_id == trigger.context.trace_id, name
+    assert by_name["batch.submit"].attributes["batch.job_id"] == job_id
+    wait = by_name["batch.receipt_wait"]
+    assert (wait.attributes["tx.hash"], wait.attributes["tx.gas_used"]) == ("ab" * 32, 80_000)
+
+    ingest = by_name["indexer.ingest"]
+    assert ingest.attributes["batch.id"] == 7
+    for name in ("indexer.build_tree", "indexer.write_leaves", "indexer.commit"):
+        assert by_name[name].parent.span_id == ingest.context.span_id, name
+
+
+def test_requests_profiled_on_demand(db, monkeypatch, tmp_path):
+    add_applicants(db, {16: 1})
+    monkeypatch.setattr(tracing, "REQUEST_PROFILING", "header")
+    monkeypatch.setattr(tracing, "PROFILE_DIR", str(tmp_path))
+    client = TestClient(main.app)
+    url = f"/v1/applicants/{national_id(16, 0)}/status"
+
+    assert "X-Profile-File" not in client.get(url).headers
+    profiled = client.get(url, headers={tracing.PROFILE_HEADER: "1"})
+
+    assert profiled.json()["national_id"] == national_id(16, 0)
+    assert os.listdir(tmp_path) == [profiled.headers["X-Profile-File"]]
+    assert profiled.headers["X-Profile-File"].endswith(".speedscope.json")
+
+
+def test_only_slow_requests_kept_when_always_profiling(db, monkeypatch, tmp_path):
+    add_applicants(db, {16: 1})
+    monkeypatch.setattr(tracing, "REQUEST_PROFILING", "always")
+    monkeypatch.setattr(tracing, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "PROFILE_SLOW_MS", 60_000)
+
+    response = TestClient(main.app).get(f"/v1/applicants/{national_id(16, 0)}/status")
+
+    assert "X-Profile-File" not in response.headers
+    assert os.listdir(tmp_path) == []
@@ -1,9 +1,10 @@
 import os
 import sys
-import json
+import time
 import asyncio
 import logging
-from web3 import Web3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 
@@ -18,147 +19,535 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 # Now we can import from the backend
-from backend.database import SessionLocal
+from backend.database import SessionLocal, bulk_insert
 from backend import models
+from backend.services import batch_service, metrics, proof_files, proof_store, rpc_client, tracing
+from backend.services.merkle_service import MerkleTree, applicant_leaves
+from backend.services.status_cache import status_cache
 
 # --- CONFIGURATION ---
 load_dotenv()
-WEBSOCKET_RPC_URL = os.getenv("SEPOLIA_WEBSOCKET_RPC_URL")
+# The indexer only polls, so the pooled, retrying HTTP endpoint is preferred when set.
+RPC_URL = os.getenv("SEPOLIA_RPC_URL") or os.getenv("SEPOLIA_WEBSOCKET_RPC_URL")
 CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS")
 ABI_PATH = os.getenv("ABI_PATH", "out/BatchRegistry.sol/BatchRegistry.json")
+# First block to scan on a cold start (usually the contract's deployment block).
+START_BLOCK = int(os.getenv("INDEXER_START_BLOCK", "0"))
+# Initial and maximum eth_getLogs block ranges; the range adapts between 1 and the max.
+LOG_CHUNK_SIZE = int(os.getenv("INDEXER_LOG_CHUNK_SIZE", "2000"))
+MAX_LOG_CHUNK_SIZE = int(os.getenv("INDEXER_MAX_LOG_CHUNK_SIZE", "100000"))
+# Blocks to stay behind head, to avoid indexing logs that a reorg could drop.
+CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", "0"))
+CURSOR_NAME = "batch_registry"
+# Threads preparing events in parallel, and the most pipeline items held at once.
+INDEXER_WORKERS = int(os.getenv("INDEXER_WORKERS", "4"))
+INDEXER_MAX_IN_FLIGHT = int(os.getenv("INDEXER_MAX_IN_FLIGHT", "64"))
+# Applicant hashes per `UPDATE ... WHERE applicant_hash IN (...)` statement.
+STATUS_UPDATE_CHUNK_SIZE = int(os.getenv("INDEXER_STATUS_UPDATE_CHUNK_SIZE", "5000"))
+# Port serving Prometheus metrics (lag behind head, RPC latency, tree builds); 0 disables it.
+METRICS_PORT = int(os.getenv("INDEXER_METRICS_PORT", "9101"))
+# Longest wait (seconds) between retries of an event that failed to index.
+RETRY_MAX_DELAY = float(os.getenv("INDEXER_RETRY_MAX_DELAY", "300"))
 
-if not WEBSOCKET_RPC_URL:
-    raise ValueError("SEPOLIA_WEBSOCKET_RPC_URL must be set in .env file.")
+if not RPC_URL:
+    raise ValueError("SEPOLIA_RPC_URL or SEPOLIA_WEBSOCKET_RPC_URL must be set in .env file.")
 
 # --- WEB3 SETUP ---
-w3 = Web3(Web3.LegacyWebSocketProvider(WEBSOCKET_RPC_URL))
-with open(ABI_PATH, "r") as f:
-    contract_abi = json.load(f)["abi"]
-batch_registry_contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=contract_abi)
+rpc = rpc_client.get_client(RPC_URL)
+w3 = rpc.w3
+batch_registry_contract = rpc.contract(CONTRACT_ADDRESS, ABI_PATH)
+
+
+def event_attributes(event) -> dict:
+    """Span attributes tying indexer work to the API side of the same batch."""
+    return {
+        "batch.id": event.args.batchId,
+        "batch.wilaya": event.args.wilaya,
+        "batch.size": event.args.batchSize,
+        "tx.hash": event.transactionHash.hex(),
+        "block.number": event.blockNumber,
+    }
+
+
+def prepare_tree(batch_id: int, query, expected_root: bytes, expected_size: int = None) -> Optional[dict]:
+    """
+    Loads the applicants of one tree with their leaves (stored when they entered
+    the queue; only older rows are hashed here) and checks the rebuilt root (and
+    size, if given) against what was committed, so we never store proofs that
+    would not verify. Returns None, after logging why, if they do not match.
+    """
+    with tracing.span("indexer.load_applicants"):
+        applicants = query.all()
+
+    if not applicants:
+        logging.warning(f"Received batch event for batch {batch_id}, but found no eligible applicants in DB to process.")
+        return None
+
+    started = time.perf_counter()
+    with tracing.span("indexer.build_tree", **{"batch.leaves": len(applicants)}):
+        leaf_hashes = [leaf.hex() for leaf in applicant_leaves(applicants)]
+        tree = MerkleTree(leaf_hashes)
+    metrics.MERKLE_BUILD_SECONDS.labels("indexer").observe(time.perf_counter() - started)
+    metrics.MERKLE_BATCH_SIZE.labels("indexer").observe(len(leaf_hashes))
+    if tree.get_root() != expected_root or (expected_size is not None and len(leaf_hashes) != expected_size):
+        logging.error(
+            f"Batch {batch_id}: root rebuilt from {len(leaf_hashes)} applicants "
+            f"({tree.get_root().hex()}) does not match the committed root {expected_root.hex()}. Skipping."
+        )
+        return None
+
+    return {
+        "applicant_hashes": [applicant.applicant_hash for applicant in applicants],
+        "leaf_hashes": leaf_hashes,
+        "tree": tree,
+    }
+
+
+def prepare_batch(db: Session, event) -> Optional[dict]:
+    """
+    The read-only half of ingesting a BatchCommitted event: finds the batch's
+    applicants, hashes their leaves and checks the rebuilt root against the event.
+
+    An aggregated batch is rebuilt one wilaya tree at a time; each must match the
+    root its metadata lists, and the top tree over those roots must match the event.
+
+    Returns:
+        The data `save_batch` needs, or None if there is nothing to write.
+    """
+    event_args = event.args
+
+    # Step 1: Check if we've already processed this batch to prevent duplicates.
+    existing_batch = db.query(models.Batch).filter(models.Batch.id == event_args.batchId).first()
+    if existing_batch:
+        logging.warning(f"Batch ID {event_args.batchId} has already been processed. Skipping.")
+        return None
+
+    # Step 2: Fetch the applicants that were supposed to be in this batch and
+    # recompute the real leaves. This is the "verification" step. We find the
+    # applicants who were marked 'eligible' and are now being included in this
+    # on-chain batch.
+    span = batch_service.parse_batch_metadata(event_args.metadata)
+    if not (span and "aggregate" in span):
+        part = prepare_tree(event_args.batchId, batch_service.batch_applicants_query(db, event_args), bytes(event_args.merkleRoot))
+        if part is None:
+            return None
+        return {"event": event, "parts": [{**part, "position_base": 0}], "top": None}
+
+    # Step 3 (aggregated batches): check the wilaya roots against the on-chain root
+    # before reading any applicant.
+    listed = span["aggregate"]
+    top = MerkleTree([bytes.fromhex(root) for _, _, root, _ in listed])
+    if top.get_root() != bytes(event_args.merkleRoot) or sum(size for *_, size in listed) != event_args.batchSize:
+        logging.error(f"Batch {event_args.batchId}: the wilaya roots in its metadata do not match the on-chain root. Skipping.")
+        return None
+
+    parts = []
+    bases = proof_store.part_bases([size for *_, size in listed])
+    for (wilaya_code, epoch, root, size), position_base in zip(listed, bases):
+        part = prepare_tree(
+            event_args.batchId, batch_service.queue_epoch_query(db, wilaya_code, epoch, size), bytes.fromhex(root), size
+        )
+        if part is None:
+            return None
+        parts.append({
+            **part,
+            "wilaya_code": wilaya_code,
+            "epoch": epoch,
+            "merkle_root": root,
+            "position_base": position_base,
+        })
+    return {"event": event, "parts": parts, "top": top}
+
+
+def save_batch(db: Session, prepared: dict):
+    """
+    The write half of ingesting a BatchCommitted event. Everything is committed
+    in a single atomic transaction.
+    """
+    event = prepared["event"]
+    parts = prepared["parts"]
+    applicant_hashes = [applicant_hash for part in parts for applicant_hash in part["applicant_hashes"]]
+
+    # Step 4: Create the new Batch database object.
+    new_batch = models.Batch(
+        id=event.args.batchId,
+        merkle_root=event.args.merkleRoot.hex(),
+        tx_hash=event.transactionHash.hex(),
+        batch_size=len(applicant_hashes)
+    )
+    db.add(new_batch)
+    db.flush()
+
+    # Step 5: Bulk-insert the leaves (COPY on PostgreSQL, multi-row INSERTs elsewhere).
+    # The leaves of an aggregated batch's wilaya trees start at their part's base.
+    with tracing.span("indexer.write_leaves"):
+        bulk_insert(db, models.Leaf, [
+            {
+                "applicant_hash": applicant_hash,
+                "leaf_hash": leaf_hash,
+                "batch_id": new_batch.id,
+                "offset": part["position_base"] + offset
+            }
+            for part in parts
+            for offset, (applicant_hash, leaf_hash) in enumerate(zip(part["applicant_hashes"], part["leaf_hashes"]))
+        ])
+
+    # Step 6: Move the applicants to BATCHED with set-based UPDATEs.
+    with tracing.span("indexer.update_status"):
+        for start in range(0, len(applicant_hashes), STATUS_UPDATE_CHUNK_SIZE):
+            db.query(models.Applicant).filter(
+                models.Applicant.applicant_hash.in_(applicant_hashes[start:start + STATUS_UPDATE_CHUNK_SIZE])
+            ).update({models.Applicant.status: models.ApplicantStatus.BATCHED}, synchronize_session=False)
+
+    # Step 7: Persist the tree levels so the status endpoint can serve proofs
+    # without rebuilding it, and, for an aggregated batch, each wilaya root's
+    # path to the batch root.
+    with tracing.span("indexer.save_tree"):
+        node_count = sum(
+            proof_store.save_tree(db, new_batch.id, part["tree"], part["position_base"]) for part in parts
+        )
+        if prepared["top"] is not None:
+            db.add_all([
+                models.AggregatePart(
+                    batch_id=new_batch.id,
+                    part_index=index,
+                    wilaya_code=part["wilaya_code"],
+                    epoch=part["epoch"],
+                    merkle_root=part["merkle_root"],
+                    batch_size=len(part["leaf_hashes"]),
+                    position_base=part["position_base"],
+                    root_proof=proof_store.encode_path(prepared["top"].get_proof_by_index(index)),
+                )
+                for index, part in enumerate(parts)
+            ])
+    logging.info(f"Stored {node_count} Merkle nodes for batch {new_batch.id}.")
+
+    # Step 8: Commit the transaction.
+    # All the above changes are committed to the DB in one atomic operation.
+    with tracing.span("indexer.commit"):
+        db.commit()
+    metrics.INDEXER_BATCHES.inc()
+    logging.info(f"Successfully processed and saved batch {new_batch.id} with {len(applicant_hashes)} applicants.")
+
+    # Step 9: These applicants now have a leaf and a proof; drop their cached status.
+    status_cache.invalidate(applicant_hashes)
+
+    # Step 10: Export the batch's immutable proof file for the API to map. The
+    # database already has everything, so a failure here only costs speed.
+    try:
+        with tracing.span("indexer.write_proof_file"):
+            proof_files.write(new_batch.id, [
+                {
+                    "position_base": part["position_base"],
+                    "tree": part["tree"],
+                    "root_proof": prepared["top"].get_proof_by_index(index) if prepared["top"] is not None else [],
+                    "applicant_hashes": part["applicant_hashes"],
+                }
+                for index, part in enumerate(parts)
+            ], aggregated=prepared["top"] is not None)
+    except OSError as e:
+        logging.warning(f"Could not write the proof file of batch {new_batch.id}: {e}")
 
 
 def process_and_save_batch(db: Session, event: dict):
     """
     Processes a BatchCommitted event and saves the relevant data to the database
     in a single atomic transaction.
+
+    Events that are deliberately skipped (already indexed, root mismatch) return
+    normally. Any other failure is rolled back and re-raised, so the caller keeps
+    the block cursor before this event and retries it instead of losing it.
     """
-    event_args = event.args
     tx_hash = event.transactionHash.hex()
-    
     logging.info(f"Processing event from transaction: {tx_hash}")
 
     try:
-        # Step 1: Check if we've already processed this batch to prevent duplicates.
-        existing_batch = db.query(models.Batch).filter(models.Batch.id == event_args.batchId).first()
-        if existing_batch:
-            logging.warning(f"Batch ID {event_args.batchId} has already been processed. Skipping.")
-            return
-
-        # Step 2: Fetch the applicants that were supposed to be in this batch.
-        # This is the "verification" step. We find the applicants who were marked
-        # 'eligible' and are now being included in this on-chain batch.
-
-        #111revise: batch to applicant linking
-        applicants_to_batch = db.query(models.Applicant).filter(
-            models.Applicant.status == models.ApplicantStatus.ELIGIBLE
-        ).all()
-
-        if not applicants_to_batch:
-            logging.warning(f"Received batch event for batch {event_args.batchId}, but found no eligible applicants in DB to process.")
-            return
-
-        # Step 3: Create the new Batch database object.
-        new_batch = models.Batch(
-            id=event_args.batchId,
-            merkle_root=event_args.merkleRoot.hex(),
-            tx_hash=tx_hash
-        )
-        db.add(new_batch)
-
-        # Step 4: Create a Leaf for each applicant and update their status.
-        for offset, applicant in enumerate(applicants_to_batch):
-            # 111revise: re-calculat leaf_hash against the Merkle root
-            new_leaf = models.Leaf(
-                applicant_hash=applicant.applicant_hash,
-                # 111revise: re-calculate leaf_hash from applicant data. Placeholder for now.
-                leaf_hash=Web3.keccak(text=f"leaf_{applicant.applicant_hash}").hex(),
-                batch_id=new_batch.id,
-                offset=offset
-            )
-            db.add(new_leaf)
-            
-            # Update the applicant's status to BATCHED
-            applicant.status = models.ApplicantStatus.BATCHED
-
-        # Step 5: Commit the transaction.
-        # All the above changes are committed to the DB in one atomic operation.
-        db.commit()
-        logging.info(f"Successfully processed and saved batch {new_batch.id} with {len(applicants_to_batch)} applicants.")
-
+        prepared = prepare_batch(db, event)
+        if prepared is not None:
+            save_batch(db, prepared)
     except Exception as e:
         logging.error(f"Error processing event for tx {tx_hash}: {e}")
         db.rollback() # If anything fails, undo all changes for this event.
+        raise
 
 
-def handle_event(event: dict):
-
+def log_event(event):
     print("\n---////// ---")
     
     # The event data is in a dictionary-like object
-    batch_id = event.args.batchId
-    merkle_root = event.args.merkleRoot.hex()
-    operator = event.args.operator
-    wilaya = event.args.wilaya
-    
-    print(f"  - Batch ID: {batch_id}")
-    print(f"  - Merkle Root: {merkle_root}")
-    print(f"  - Operator: {operator}")
-    print(f"  - Wilaya: {wilaya}")
+    print(f"  - Batch ID: {event.args.batchId}")
+    print(f"  - Merkle Root: {event.args.merkleRoot.hex()}")
+    print(f"  - Operator: {event.args.operator}")
+    print(f"  - Wilaya: {event.args.wilaya}")
     print(f"  - Transaction Hash: {event.transactionHash.hex()}")
 
+    logging.info(f"--- New BatchCommitted Event Detected! Tx: {event.transactionHash.hex()} ---")
+
+
+def handle_event(event: dict):
     """
     This function is called when a new event is detected.
     It creates a new database session for each event to ensure thread safety.
+    Errors propagate (see `process_and_save_batch`).
     """
-    logging.info(f"--- New BatchCommitted Event Detected! Tx: {event.transactionHash.hex()} ---")
+    log_event(event)
     
     db = SessionLocal()
     try:
-        process_and_save_batch(db, event)
+        with tracing.span("indexer.ingest", **event_attributes(event)):
+            process_and_save_batch(db, event)
     finally:
         db.close()
 
 
-async def log_loop(event_filter, poll_interval):
-    logging.info("Indexer started. Listening for BatchCommitted events...")
+def load_cursor() -> int:
+    """The last fully indexed block, or the block before START_BLOCK on a cold start."""
+    db = SessionLocal()
+    try:
+        cursor = db.query(models.IndexerCursor).filter(models.IndexerCursor.name == CURSOR_NAME).first()
+        return cursor.last_block if cursor else START_BLOCK - 1
+    finally:
+        db.close()
+
+
+def save_cursor(block_number: int):
+    db = SessionLocal()
+    try:
+        cursor = db.query(models.IndexerCursor).filter(models.IndexerCursor.name == CURSOR_NAME).first()
+        if cursor is None:
+            cursor = models.IndexerCursor(name=CURSOR_NAME, last_block=block_number)
+            db.add(cursor)
+        else:
+            cursor.last_block = block_number
+        db.commit()
+    finally:
+        db.close()
+
+
+def fetch_events(from_block: int, to_block: int, chunk_size: int):
+    """
+    Fetches the BatchCommitted events of [from_block, to_block] with one eth_getLogs
+    range query, halving the range whenever the node rejects it (result or range limits).
+
+    Returns:
+        A `(events, last_block, chunk_size)` tuple; `last_block` may be below `to_block`
+        if the range had to shrink.
+    """
     while True:
+        end = min(from_block + chunk_size - 1, to_block)
         try:
-            for event in event_filter.get_new_entries():
-                handle_event(event)
-            await asyncio.sleep(poll_interval)
+            events = batch_registry_contract.events.BatchCommitted().get_logs(from_block=from_block, to_block=end)
         except Exception as e:
-            logging.error(f"Error in main event loop: {e}. Retrying...")
-            # A simple sleep is a basic retry mechanism.
-            await asyncio.sleep(poll_interval * 5)
+            if chunk_size == 1:
+                raise
+            chunk_size = max(1, chunk_size // 2)
+            logging.warning(f"eth_getLogs rejected blocks {from_block}-{end} ({e}); retrying with {chunk_size} blocks.")
+            continue
+        return sorted(events, key=lambda ev: (ev.blockNumber, ev.logIndex)), end, chunk_size
+
+
+class CursorMark:
+    """Pipeline item saying every event up to `block_number` has been fetched."""
+
+    def __init__(self, block_number: int):
+        self.block_number = block_number
+
+
+class PreparationError:
+    """Pipeline item for an event whose preparation failed; the committer retries it."""
+
+    def __init__(self, event, error: Exception):
+        self.event = event
+        self.error = error
+
+
+class IndexerPipeline:
+    """
+    Overlaps fetching, preparing and writing batches:
+
+    - one producer pulls event logs (backfill, then tail) into a bounded queue;
+    - `INDEXER_WORKERS` workers prepare events (applicant reads, leaf hashing,
+      tree build) on a thread pool, in any order;
+    - one committer writes prepared batches in exactly the order the events were
+      emitted (i.e. by batchId), and advances the block cursor behind them. An
+      event that fails to prepare or save is retried, with backoff, before
+      anything after it, so the cursor never moves past an event that was
+      neither applied nor deliberately skipped.
+
+    At most `INDEXER_MAX_IN_FLIGHT` items exist between producer and committer, so
+    fetching pauses when the database falls behind.
+    """
+
+    def __init__(self, poll_interval: float, workers: int = INDEXER_WORKERS, max_in_flight: int = INDEXER_MAX_IN_FLIGHT):
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self.queue = asyncio.Queue()
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.ready = {}
+        self.ready_changed = asyncio.Condition()
+        self.prepare_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="indexer-prepare")
+        # Writes go through one thread so they never interleave.
+        self.commit_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indexer-commit")
+
+    async def run(self):
+        logging.info("Indexer started. Listening for BatchCommitted events...")
+        tasks = [asyncio.create_task(self.produce()), asyncio.create_task(self.commit())]
+        tasks += [asyncio.create_task(self.work()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.prepare_pool.shutdown(wait=False)
+            self.commit_pool.shutdown(wait=False)
+
+    async def _emit(self, seq: int, item) -> int:
+        await self.in_flight.acquire()
+        await self.queue.put((seq, item))
+        return seq + 1
+
+    async def produce(self):
+        loop = asyncio.get_running_loop()
+        seq = 0
+        chunk_size = LOG_CHUNK_SIZE
+        fetched = await loop.run_in_executor(None, load_cursor)
+        metrics.set_indexer_position(cursor=fetched)
+        while True:
+            try:
+                chain_head = await loop.run_in_executor(None, lambda: w3.eth.block_number)
+                metrics.set_indexer_position(head=chain_head)
+                head = chain_head - CONFIRMATIONS
+                if head <= fetched:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                events, end, chunk_size = await loop.run_in_executor(
+                    None, fetch_events, fetched + 1, head, chunk_size
+                )
+                for event in events:
+                    seq = await self._emit(seq, event)
+                seq = await self._emit(seq, CursorMark(end))
+
+                if end < head:
+                    logging.info(f"Fetched blocks {fetched + 1}-{end} ({len(events)} events), {head - end} blocks left.")
+                fetched = end
+                chunk_size = min(chunk_size * 2, MAX_LOG_CHUNK_SIZE)
+            except Exception as e:
+                logging.error(f"Error in main event loop: {e}. Retrying...")
+                # A simple sleep is a basic retry mechanism.
+                await asyncio.sleep(self.poll_interval * 5)
+
+    async def work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            seq, item = await self.queue.get()
+            if isinstance(item, CursorMark) or not self._is_independent(item):
+                result = item
+            else:
+                try:
+                    result = await loop.run_in_executor(self.prepare_pool, prepare_in_session, item)
+                except Exception as e:
+                    logging.error(f"Error preparing event for tx {item.transactionHash.hex()}: {e}")
+                    result = PreparationError(item, e)
+            async with self.ready_changed:
+                self.ready[seq] = result
+                self.ready_changed.notify_all()
+
+    @staticmethod
+    def _is_independent(event) -> bool:
+        # Events carrying a queue epoch (or several, aggregated) or an applicant id
+        # range can be prepared ahead of earlier batches. Legacy events select "the eligible applicants",
+        # which depends on every earlier batch being written first, so the
+        # committer prepares them.
+        span = batch_service.parse_batch_metadata(event.args.metadata)
+        return bool(span and ("epoch" in span or "aggregate" in span or "first_applicant_id" in span))
+
+    async def commit(self):
+        loop = asyncio.get_running_loop()
+        next_seq = 0
+        while True:
+            async with self.ready_changed:
+                await self.ready_changed.wait_for(lambda: next_seq in self.ready)
+                item = self.ready.pop(next_seq)
+            attempt = 0
+            while True:
+                try:
+                    await loop.run_in_executor(self.commit_pool, apply_in_session, item)
+                    break
+                except Exception as e:
+                    # Nothing after this item is applied, so the cursor stays before it.
+                    attempt += 1
+                    delay = min(self.poll_interval * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+                    logging.error(f"Error applying pipeline item {next_seq} (attempt {attempt}): {e}. Retrying in {delay:g}s.")
+                    await asyncio.sleep(delay)
+                    # A failed event is prepared again from scratch, in the committer.
+                    if isinstance(item, dict):
+                        item = item["event"]
+                    elif isinstance(item, PreparationError):
+                        item = item.event
+            next_seq += 1
+            self.in_flight.release()
+
+
+def prepare_in_session(event) -> Optional[dict]:
+    log_event(event)
+    db = SessionLocal()
+    try:
+        with tracing.span("indexer.prepare", **event_attributes(event)):
+            return prepare_batch(db, event)
+    finally:
+        db.close()
+
+
+def apply_in_session(item):
+    """
+    Committer step for one pipeline item (prepared batch, raw event, failed
+    preparation or cursor mark). Raises if the item was not applied; a `None`
+    item is an event that was deliberately skipped.
+    """
+    if item is None:
+        return
+    if isinstance(item, CursorMark):
+        save_cursor(item.block_number)
+        metrics.set_indexer_position(cursor=item.block_number)
+        return
+    if isinstance(item, PreparationError):
+        raise item.error
+    if isinstance(item, dict):
+        db = SessionLocal()
+        try:
+            with tracing.span("indexer.save", **event_attributes(item["event"])):
+                save_batch(db, item)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return
+    handle_event(item)
 
 
 def main():
     """
-    Sets up the event filter and starts the listening loop.
+    Starts the indexing pipeline from the stored block cursor.
     """
-    event_filter = batch_registry_contract.events.BatchCommitted.create_filter(from_block='latest')
-    
+    if METRICS_PORT:
+        from prometheus_client import start_http_server
+
+        start_http_server(METRICS_PORT)
+        logging.info(f"Serving metrics on port {METRICS_PORT}.")
+    tracing.configure("aadl-indexer")
+
     loop = asyncio.get_event_loop()
     try:
         loop.run_until_complete(
-            asyncio.gather(
-                log_loop(event_filter, 5) # Poll every 5 seconds
-            )
+            IndexerPipeline(poll_interval=5).run() # Poll every 5 seconds
         )
     except KeyboardInterrupt:
         logging.info("Indexer shutting down.")
     finally:
         loop.close()
+        tracing.shutdown()
 
 
 if __name__ == "__main__":